@@ -5,94 +5,52 @@ from gradio_rangeslider import RangeSlider
 import calendar
 import datetime
 import numpy as np
-from huggingface_hub import HfApi
-from apscheduler.schedulers.background import BackgroundScheduler
+import uvicorn
 
-from src.filter_utils import filter, filter_cols
-from src.process_data import merge_data
+from src.api import create_api
+
+from src.cost import WORKLOAD_COLUMNS, workload_cost_matrix
+from src.filter_utils import get_rows
+from src.history import get_trends, update_history
+from src.metrics import instrument
+from src.leaderboard import build_state, publish_state, get_state, facet_counts, filter_leaderboard, filter_with_counts, pareto_leaderboard, ranked_leaderboard, refresh_leaderboard
+from src.snapshot import load_leaderboard
 import assets.text_content as tc
 
 """ 
 CONSTANTS
 """
-# For restarting the gradio application every 24 Hrs
-TIME = 86400  # in seconds # Reload will not work locally - requires HFToken # The app launches locally as expected - only without the reload utility
-
-"""
-AUTO RESTART HF SPACE
-"""
-HF_TOKEN = os.environ.get("H4_TOKEN", None)
-api = HfApi()
-
-def restart_space():
-    api.restart_space(repo_id=tc.HF_REPO, token=HF_TOKEN)
-
-
+# The leaderboard is rebuilt in the background every REFRESH_INTERVAL and swapped into the running app
+TIME = tc.REFRESH_INTERVAL  # in seconds
 
 # Main Leaderboard containing everything
-# text_leaderboard = pd.read_csv(os.path.join('assets', 'merged_data.csv'))
-text_leaderboard = merge_data()
-text_leaderboard = text_leaderboard.sort_values(by=tc.CLEMSCORE, ascending=False)  
-
-# When displaying latency values
-text_leaderboard[tc.LATENCY] = text_leaderboard[tc.LATENCY].round(1)
-text_leaderboard[tc.CLEMSCORE] = text_leaderboard[tc.CLEMSCORE].round(1)
-
-open_weight_df = text_leaderboard[text_leaderboard[tc.OPEN_WEIGHT] == True]
-if not open_weight_df.empty:  # Check if filtered df is non-empty
-    # Get max parameter size, ignoring NaN values
-    params = open_weight_df[tc.PARAMS].dropna()
-    max_parameter_size = params.max() if not params.empty else 0
+# Loaded from the local snapshot without waiting on the remote sources, the first scheduled refresh
+# checks them - Built from the sources if there is no snapshot, set LLM_CALC_REBUILD=1 to force a rebuild
+publish_state(build_state(load_leaderboard(rebuild=os.environ.get("LLM_CALC_REBUILD") == "1", check_remote=False)))
+state = get_state()
 
 # Short leaderboard containing fixed columns
-short_leaderboard = filter_cols(text_leaderboard)
+short_leaderboard = get_rows(state.index, slice(None))
 # html_table = short_leaderboard.to_html(escape=False, index=False)
 
 ## Extract data
-langs = []
-licenses = []
-ip_prices = []
-op_prices = []
-latencies = []
-parameters = []
-contexts = []
-dates = []
-
-for i in range(len(text_leaderboard)):
-    lang_splits = text_leaderboard.iloc[i][tc.LANGS].split(',')
-    lang_splits = [s.strip() for s in lang_splits]
-    langs += lang_splits
-    license_name = text_leaderboard.iloc[i][tc.LICENSE_NAME]
-
-    licenses.append(license_name)
-    ip_prices.append(text_leaderboard.iloc[i][tc.INPUT])
-    op_prices.append(text_leaderboard.iloc[i][tc.OUTPUT])
-    latencies.append(text_leaderboard.iloc[i][tc.LATENCY])
-    parameters.append(text_leaderboard.iloc[i][tc.PARAMS])
-    contexts.append(text_leaderboard.iloc[i][tc.CONTEXT])
-    dates.append(text_leaderboard.iloc[i][tc.RELEASE_DATE])
-
-
-langs = list(set(langs))
-langs.sort()
-
-licenses = list(set(licenses))
-licenses.sort()
-
-max_input_price = max(ip_prices)
-max_output_price = max(op_prices)
-max_latency = text_leaderboard[tc.LATENCY].max().round(3)
-
-min_parameters = 0 if pd.isna(min(parameters)) else min(parameters)
-max_parameter = max_parameter_size
+langs = state.facets['langs']
+licenses = state.facets['licenses']
+
+max_input_price = state.facets['max_input_price']
+max_output_price = state.facets['max_output_price']
+max_latency = state.facets['max_latency']
+
+min_parameters = state.facets['min_parameters']
+max_parameter = state.facets['max_parameter']
 parameter_step = 1
 
-min_context = min(contexts)
-max_context = max(contexts)
+min_context = state.facets['min_context']
+max_context = state.facets['max_context']
 context_step = 8
 
-min_date = min(dates)
-max_date = max(dates)
+min_date = state.facets['min_date']
+max_date = state.facets['max_date']
 
 # Date settings
 today = datetime.date.today()
@@ -103,6 +61,36 @@ YEARS = list(range(int(start_year), int(end_year)+1))
 YEARS = [str(y) for y in YEARS] 
 MONTHS = list(calendar.month_name[1:])
 
+MODALITY_CHOICES = [tc.TEXT, tc.SINGLE_IMG, tc.MULT_IMG, tc.AUDIO, tc.VIDEO]
+MODEL_TYPE_CHOICES = [tc.OPEN, tc.COMM]
+
+# Initial selection of the filter controls, in the argument order of `filter_utils.filter`
+default_filters = [[], (0, max_parameter), (0, max_input_price), (0, max_output_price), [], (0, max_context),
+                   MODEL_TYPE_CHOICES, [], [], [], [], licenses]
+
+
+def facet_choices(facets: dict, counts: dict) -> list:
+    """
+    Label the choices of the language, license, modality and model type filters with the number
+    of models each would leave, see `leaderboard.facet_counts`.
+
+    Returns:
+        list: (label, value) choices of the four filters, in that order
+    """
+    def counted(choices, value_counts):
+        return [(f"{label} ({value_counts.get(value, 0)})", value) for label, value in choices]
+
+    return [
+        counted(facets['langs'], counts['languages']),
+        counted([(l, l) for l in facets['licenses']], counts['licenses']),
+        counted([(m, m) for m in MODALITY_CHOICES], counts['modalities']),
+        counted([(t, t) for t in MODEL_TYPE_CHOICES], counts['model_types']),
+    ]
+
+
+lang_choices, license_choices, modality_choices, model_type_choices = facet_choices(
+    state.facets, facet_counts(state.snapshot_id, *default_filters))
+
 TITLE = tc.TITLE
 
 llm_calc_app = gr.Blocks()
@@ -120,7 +108,7 @@ with llm_calc_app:
 
             with gr.Row():
                 lang_dropdown = gr.Dropdown(
-                    choices=langs,
+                    choices=lang_choices,
                     value=[],
                     multiselect=True,
                     label="Languages 🗣️"
@@ -174,7 +162,7 @@ with llm_calc_app:
             # License selection
             with gr.Row():
                 license_checkbox = gr.CheckboxGroup(
-                    choices=licenses,
+                    choices=license_choices,
                     value=licenses,
                     label="License 🛡️",
                 )    
@@ -209,7 +197,7 @@ with llm_calc_app:
             ############# Modality selection checkbox ###############
             with gr.Row():
                 multimodal_checkbox = gr.CheckboxGroup(
-                    choices=[tc.TEXT, tc.SINGLE_IMG, tc.MULT_IMG, tc.AUDIO, tc.VIDEO],
+                    choices=modality_choices,
                     value=[],
                     label="Modalities 📝📷🎧🎬",
                 )
@@ -218,8 +206,8 @@ with llm_calc_app:
             # ############### Model Type Checkbox ###############
             with gr.Row():
                 open_weight_checkbox = gr.CheckboxGroup(
-                    choices=[tc.OPEN, tc.COMM],
-                    value=[tc.OPEN, tc.COMM],
+                    choices=model_type_choices,
+                    value=MODEL_TYPE_CHOICES,
                     label="Model Type 🔓 💼",
                 )    
                 
@@ -237,132 +225,321 @@ with llm_calc_app:
                                 visible=True,
                                 datatype=['str', 'number', 'number', 'date', 'number', 'number', 'number', 'number', 'markdown']
                             )
-        
-        dummy_leaderboard_table = gr.Dataframe(
-                                value=text_leaderboard,
-                                elem_id="dummy-leaderboard-table",
-                                interactive=False,
-                                visible=False
-                            )
-        
-        lang_dropdown.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],   
-            queue=True
-        )
 
-        parameter_slider.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
-            queue=True
-        )
+        # Snapshot rendered by this session - The full leaderboard stays on the server, shared read-only
+        # by all sessions, and events only carry the snapshot id and the filter selection
+        session_snapshot = gr.State(state.snapshot_id)
 
-        input_pricing_slider.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
-            queue=True
-        )
+        # One pipeline for every filter control - While a run is in flight, further changes of the
+        # session collapse into a single pending run with the latest state (trigger_mode="always_last")
+        filter_inputs = [session_snapshot, lang_dropdown, parameter_slider,
+                         input_pricing_slider, output_pricing_slider, multimodal_checkbox,
+                         context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox]
 
-        output_pricing_slider.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
-            queue=True
-        )
+        # Changes of the filter controls - The Pareto frontier and the ranking follow them as well
+        FILTER_TRIGGERS = [lang_dropdown.change, parameter_slider.change, input_pricing_slider.change,
+                           output_pricing_slider.change, multimodal_checkbox.change, open_weight_checkbox.change,
+                           context_slider.change, start_year_dropdown.change, start_month_dropdown.change,
+                           end_year_dropdown.change, end_month_dropdown.change, license_checkbox.change]
 
-        multimodal_checkbox.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
+        """
+        Facet Counts
+        The number of models each language, license, modality and model type would leave, given the
+        other filters, shown next to the choice - Updated with the table by the same event
+        """
+        @instrument('ui.filter')
+        def update_leaderboard(snapshot_id, *filters):
+            table, counts = filter_with_counts(snapshot_id, *filters)
+            choices = facet_choices(get_state(snapshot_id).facets, counts)
+            return [table, *[gr.update(choices=c) for c in choices]]
+
+        gr.on(
+            triggers=FILTER_TRIGGERS,
+            fn=update_leaderboard,
+            inputs=filter_inputs,
+            outputs=[leaderboard_table, lang_dropdown, license_checkbox, multimodal_checkbox, open_weight_checkbox],
+            trigger_mode="always_last",
+            concurrency_limit=tc.FILTER_CONCURRENCY,
+            concurrency_id="filter",
+            show_progress="hidden",
             queue=True
         )
 
-        open_weight_checkbox.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
-            queue=True
-        )
+        """
+        Leaderboard Sync
+        Every session remembers the snapshot it renders, and switches to a newly published
+        leaderboard on page load or on the next poll, keeping the current filter selection
+        """
+        refresh_timer = gr.Timer(tc.REFRESH_POLL)
+
+        @instrument('ui.sync')
+        def sync_leaderboard(snapshot_id, language_list, parameters, input_price, output_price, multimodal,
+                             context, open_weight, start_year, start_month, end_year, end_month, license):
+            new_state = get_state()
+            if new_state.snapshot_id == snapshot_id:
+                return [gr.skip()] * 10
+
+            old_facets = get_state(snapshot_id).facets
+            new_facets = new_state.facets
+
+            # Keep the selected licenses, newly added licenses are selected by default
+            license = [l for l in license if l in new_facets['licenses']] + \
+                      [l for l in new_facets['licenses'] if l not in old_facets['licenses']]
+            lang_codes = [code for _, code in new_facets['langs']]
+            language_list = [l for l in language_list if l in lang_codes]
+
+            # Price sliders left at their maximum follow the new maximum
+            if input_price[1] >= old_facets['max_input_price']:
+                input_price = (input_price[0], new_facets['max_input_price'])
+            if output_price[1] >= old_facets['max_output_price']:
+                output_price = (output_price[0], new_facets['max_output_price'])
+
+            filters = [language_list, parameters, input_price, output_price, multimodal, context, open_weight,
+                       start_year, start_month, end_year, end_month, license]
+            table, counts = filter_with_counts(new_state.snapshot_id, *filters)
+            lang_choices, license_choices, modality_choices, model_type_choices = facet_choices(new_facets, counts)
+
+            return [
+                new_state.snapshot_id,
+                table,
+                gr.update(choices=lang_choices, value=language_list),
+                gr.update(choices=license_choices, value=license),
+                gr.update(maximum=new_facets['max_input_price'], value=input_price),
+                gr.update(maximum=new_facets['max_output_price'], value=output_price),
+                gr.update(maximum=new_facets['max_parameter'],
+                          label=f"Parameters 🔍 {int(new_facets['min_parameters'])}B - {int(new_facets['max_parameter'])}B+"),
+                gr.update(maximum=new_facets['max_context']),
+                gr.update(choices=modality_choices),
+                gr.update(choices=model_type_choices),
+            ]
+
+        sync_outputs = [session_snapshot, leaderboard_table, lang_dropdown, license_checkbox,
+                        input_pricing_slider, output_pricing_slider, parameter_slider, context_slider,
+                        multimodal_checkbox, open_weight_checkbox]
+
+        refresh_timer.tick(sync_leaderboard, filter_inputs, sync_outputs, show_progress="hidden")
+        llm_calc_app.load(sync_leaderboard, filter_inputs, sync_outputs, show_progress="hidden")
+
+    #############################################################
+    # Workload Cost Tab
+    #############################################################
+    with gr.Tab("Workload Cost 💰"):
+        """
+        Cost of every model in the filtered leaderboard for each workload profile
+        """
+        with gr.Row():
+            workload_table = gr.Dataframe(
+                                value=pd.DataFrame(tc.DEFAULT_WORKLOADS, columns=WORKLOAD_COLUMNS),
+                                headers=WORKLOAD_COLUMNS,
+                                datatype=['str', 'number', 'number', 'number'],
+                                col_count=(len(WORKLOAD_COLUMNS), "fixed"),
+                                interactive=True,
+                                label="Workloads - tokens per request 📝"
+                            )
 
-        context_slider.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
-            queue=True
-        )
+        with gr.Row():
+            cost_button = gr.Button("Compute cost 💲")
 
-        start_year_dropdown.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
-            queue=True
-        )
+        with gr.Row():
+            cost_table = gr.Dataframe(
+                                elem_id="workload-cost-table",
+                                interactive=False,
+                                label="Cost in 💲 per workload"
+                            )
+
+        @instrument('ui.cost')
+        def compute_costs(workloads, snapshot_id, *filters):
+            table = filter_leaderboard(snapshot_id, *filters)
+            costs = workload_cost_matrix(table, workloads)
+            return costs.round(2).reset_index()
 
-        start_month_dropdown.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
+        cost_button.click(
+            compute_costs,
+            [workload_table, *filter_inputs],
+            [cost_table],
             queue=True
         )
 
-        end_year_dropdown.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
+    #############################################################
+    # Pareto Frontier Tab
+    #############################################################
+    with gr.Tab("Pareto Frontier ⚖️"):
+        """
+        Models of the filtered leaderboard that no other model beats in every selected objective
+        """
+        with gr.Row():
+            pareto_objectives = gr.CheckboxGroup(
+                                    choices=list(tc.PARETO_OBJECTIVES),
+                                    value=tc.DEFAULT_PARETO_OBJECTIVES,
+                                    label="Objectives - select 2 or 3 ⚖️",
+                                    elem_id="pareto-objectives",
+                                    interactive=True
+                                )
+
+        with gr.Row():
+            pareto_table = gr.Dataframe(
+                                value=pareto_leaderboard(state.snapshot_id, tc.DEFAULT_PARETO_OBJECTIVES,
+                                                         *default_filters),
+                                elem_id="pareto-table",
+                                interactive=False,
+                                label="Pareto-optimal models"
+                            )
+
+        @instrument('ui.pareto')
+        def compute_frontier(objectives, snapshot_id, *filters):
+            if len(objectives) not in (2, 3):
+                gr.Warning("Select 2 or 3 objectives for the Pareto frontier")
+                return gr.skip()
+            return pareto_leaderboard(snapshot_id, objectives, *filters)
+
+        gr.on(
+            triggers=[pareto_objectives.change, *FILTER_TRIGGERS, session_snapshot.change],
+            fn=compute_frontier,
+            inputs=[pareto_objectives, *filter_inputs],
+            outputs=[pareto_table],
+            trigger_mode="always_last",
+            concurrency_limit=tc.FILTER_CONCURRENCY,
+            concurrency_id="filter",
+            show_progress="hidden",
             queue=True
         )
 
-        end_month_dropdown.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
+    #############################################################
+    # Ranking Tab
+    #############################################################
+    with gr.Tab("Ranking 🏅"):
+        """
+        Top k models of the filtered leaderboard by a weighted score over score, price, latency and context
+        """
+        with gr.Row():
+            ranking_weights = [
+                gr.Slider(
+                    minimum=0,
+                    maximum=tc.MAX_RANKING_WEIGHT,
+                    value=tc.DEFAULT_RANKING_WEIGHTS[criterion],
+                    step=0.5,
+                    label=f"{criterion} - {'higher' if direction == 'max' else 'lower'} is better",
+                    interactive=True
+                )
+                for criterion, direction in tc.RANKING_CRITERIA.items()
+            ]
+
+        with gr.Row():
+            ranking_k = gr.Number(
+                            value=tc.DEFAULT_TOP_K,
+                            minimum=1,
+                            maximum=tc.API_MAX_LIMIT,
+                            precision=0,
+                            label="Top k 🔢",
+                            interactive=True
+                        )
+
+        with gr.Row():
+            ranking_table = gr.Dataframe(
+                                value=ranked_leaderboard(state.snapshot_id, tc.DEFAULT_RANKING_WEIGHTS,
+                                                         tc.DEFAULT_TOP_K, *default_filters),
+                                elem_id="ranking-table",
+                                interactive=False,
+                                label="Top models by weighted score"
+                            )
+
+        @instrument('ui.ranking')
+        def compute_ranking(k, *args):
+            weights = dict(zip(tc.RANKING_CRITERIA, args[:len(tc.RANKING_CRITERIA)]))
+            snapshot_id, *filters = args[len(tc.RANKING_CRITERIA):]
+            if not k or k < 1:
+                gr.Warning("Top k must be at least 1")
+                return gr.skip()
+            try:
+                return ranked_leaderboard(snapshot_id, weights, int(k), *filters)
+            except ValueError as e:
+                gr.Warning(str(e))
+                return gr.skip()
+
+        gr.on(
+            triggers=[ranking_k.change, *[w.change for w in ranking_weights], *FILTER_TRIGGERS,
+                      session_snapshot.change],
+            fn=compute_ranking,
+            inputs=[ranking_k, *ranking_weights, *filter_inputs],
+            outputs=[ranking_table],
+            trigger_mode="always_last",
+            concurrency_limit=tc.FILTER_CONCURRENCY,
+            concurrency_id="filter",
+            show_progress="hidden",
             queue=True
         )
 
-        license_checkbox.change(
-            filter,
-            [dummy_leaderboard_table, lang_dropdown, parameter_slider,
-             input_pricing_slider, output_pricing_slider, multimodal_checkbox,
-             context_slider, open_weight_checkbox, start_year_dropdown, start_month_dropdown, end_year_dropdown, end_month_dropdown, license_checkbox],
-            [leaderboard_table],
+    #############################################################
+    # Trends Tab
+    #############################################################
+    with gr.Tab("Trends 📈"):
+        """
+        Score and latency of selected models across all clembench versions
+        """
+        model_names = list(state.leaderboard[tc.MODEL_NAME])
+        with gr.Row():
+            trend_models = gr.Dropdown(
+                                choices=model_names,
+                                value=model_names[:5],
+                                multiselect=True,
+                                label="Models 🤖",
+                                elem_id="trend-models",
+                                interactive=True
+                            )
+            trend_metric = gr.Radio(
+                                choices=[(tc.CLEMSCORE, 'clemscore'), (tc.LATENCY, 'latency')],
+                                value='clemscore',
+                                label="Metric 📊",
+                                interactive=True
+                            )
+
+        with gr.Row():
+            trend_plot = gr.LinePlot(
+                                x="Version",
+                                y=tc.CLEMSCORE,
+                                color=tc.MODEL_NAME,
+                                elem_id="trend-plot",
+                                label="Across clembench versions"
+                            )
+
+        @instrument('ui.trends')
+        def plot_trends(models, metric):
+            label = tc.CLEMSCORE if metric == 'clemscore' else tc.LATENCY
+            df, versions = get_trends(models, metric)
+            df = df.rename(columns={'version': "Version", 'model': tc.MODEL_NAME, metric: label})
+            return gr.update(value=df, y=label, sort=versions)
+
+        gr.on(
+            triggers=[trend_models.change, trend_metric.change, llm_calc_app.load],
+            fn=plot_trends,
+            inputs=[trend_models, trend_metric],
+            outputs=[trend_plot],
+            trigger_mode="always_last",
+            show_progress="hidden",
             queue=True
         )
 
-    llm_calc_app.load()
 llm_calc_app.queue()
 
-# Add scheduler to auto-restart the HF space at every TIME interval and update every component each time
-scheduler = BackgroundScheduler()
-scheduler.add_job(restart_space, 'interval', seconds=TIME)
-scheduler.start()
+def start_scheduler():
+    # Imported on server startup, the scheduler is not needed to build the UI
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    # Add scheduler to rebuild the leaderboard at every TIME interval, off the request path
+    # The first run checks the remote sources right away, the app starts from the local snapshot
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(refresh_leaderboard, 'interval', seconds=TIME, next_run_time=datetime.datetime.now())
+    # Extend the version history in the background, the first run downloads every version not stored yet
+    scheduler.add_job(update_history, 'interval', seconds=TIME, next_run_time=datetime.datetime.now())
+    scheduler.start()
+
+    # Log current start time and scheduled refresh time
+    print(datetime.datetime.now())
+    print(f"Scheduled refresh at {datetime.datetime.now() + datetime.timedelta(seconds=TIME)}")
 
-# Log current start time and scheduled restart time
-print(datetime.datetime.now())
-print(f"Scheduled restart at {datetime.datetime.now() + datetime.timedelta(seconds=TIME)}")
 
-llm_calc_app.launch()
+# Serve the query API and mount the UI at the root of the same app
+app = gr.mount_gradio_app(create_api(), llm_calc_app, path="/")
+app.add_event_handler("startup", start_scheduler)
+uvicorn.run(app, host=os.environ.get("GRADIO_SERVER_NAME", "127.0.0.1"),
+            port=int(os.environ.get("GRADIO_SERVER_PORT", 7860)))
@@ -9,6 +9,43 @@ LATENCY_FOLDER = os.path.join("Addenda", "Latency")
 RESULT_FILE = "results.csv"
 LATENCY_SUFFIX = "_latency.csv"
 
+# Source backend - "remote" (GitHub raw), "local" (a mirror directory) or "fixture" (the mirror served over local HTTP)
+# Sync the mirror with `python -m src.collect_data sync`, the registry is stored as REGISTRY_FILE in it
+SOURCE_BACKEND = os.environ.get("LLM_CALC_SOURCE", "remote")
+MIRROR_DIR = os.environ.get("LLM_CALC_MIRROR_DIR", os.path.join("assets", "mirror"))
+REGISTRY_FILE = "model_registry.json"
+
+# Local snapshot of the merged leaderboard - Rebuilt only when a source fingerprint changes
+# Bump SNAPSHOT_VERSION whenever the output of `merge_data` changes shape
+SNAPSHOT_DIR = os.environ.get("LLM_CALC_SNAPSHOT_DIR", os.path.join("assets", "snapshots"))
+SNAPSHOT_FILE = "leaderboard.parquet"
+SNAPSHOT_VERSION = "3"
+FINGERPRINT_TIMEOUT = 5  # in seconds
+
+# Score and latency history of every clembench version, stored next to the snapshot and extended incrementally
+HISTORY_FILE = "history.parquet"
+PARSE_WORKERS = 4  # Processes parsing newly published versions
+
+# Hot refresh - The leaderboard is rebuilt in the background and swapped into the running app
+REFRESH_INTERVAL = 86400  # in seconds
+REFRESH_POLL = 60  # in seconds, how often open sessions check for a new leaderboard
+MAX_LIVE_SNAPSHOTS = 2  # Snapshots kept in memory for sessions that have not synced yet
+
+# Multi-worker API - The leaderboard and its filter index are published once as memory-mapped Arrow files,
+# every worker process maps them read-only. A refresh writes a new segment and swaps the pointer file
+SHARED_DIR = os.environ.get("LLM_CALC_SHARED_DIR", os.path.join(SNAPSHOT_DIR, "shared"))
+SHARED_POINTER = "CURRENT"
+SHARED_POLL = 1  # in seconds, how often workers check the pointer for a new segment
+API_WORKERS = int(os.environ.get("LLM_CALC_API_WORKERS", os.cpu_count() or 1))
+
+# Filter result cache
+FILTER_CACHE_SIZE = 256  # Number of cached filter results
+FILTER_CONCURRENCY = 8  # Filter events processed in parallel across all sessions
+
+# Fetching - All downloads share one keep-alive session and run on a thread pool
+REQUEST_TIMEOUT = 30  # in seconds, per request
+FETCH_WORKERS = 16
+
 # Setup Column Names
 # Note - Changing this does not affect the already generated csv `merged_data.csv`
 # Run `src/process_data.py` for this
@@ -36,6 +73,66 @@ INPUT = "Input $/1M tokens"
 OUTPUT = "Output $/1M tokens"
 LICENSE = "License"
 TEMP_DATE = "Temp Date"
+MODALITIES = "Modalities"  # Bitfield of the modality flags in the compact leaderboard
+
+# Workload cost - Token counts are per request, prices are per 1M tokens
+WORKLOAD_NAME = "Workload"
+WORKLOAD_INPUT = "Input tokens / request"
+WORKLOAD_OUTPUT = "Output tokens / request"
+WORKLOAD_REQUESTS = "Requests"
+DEFAULT_WORKLOADS = [
+    ["Chat", 1000, 500, 100000],
+    ["RAG", 8000, 400, 100000],
+    ["Summarization", 20000, 1000, 10000],
+    ["Batch extraction", 2000, 200, 1000000],
+]
+
+# Pareto frontier - Objectives and whether they are maximized or minimized
+PARETO_OBJECTIVES = {
+    CLEMSCORE: 'max',
+    INPUT: 'min',
+    OUTPUT: 'min',
+    LATENCY: 'min',
+}
+DEFAULT_PARETO_OBJECTIVES = [CLEMSCORE, INPUT]
+
+# Ranking - Criteria of the weighted composite score, whether they are maximized or minimized,
+# and the name of their weight in the query API
+RANKING_CRITERIA = {
+    CLEMSCORE: 'max',
+    INPUT: 'min',
+    OUTPUT: 'min',
+    LATENCY: 'min',
+    CONTEXT: 'max',
+}
+RANKING_WEIGHT_NAMES = {
+    CLEMSCORE: 'score_weight',
+    INPUT: 'input_price_weight',
+    OUTPUT: 'output_price_weight',
+    LATENCY: 'latency_weight',
+    CONTEXT: 'context_weight',
+}
+DEFAULT_RANKING_WEIGHTS = {CLEMSCORE: 3, INPUT: 1, OUTPUT: 1, LATENCY: 1, CONTEXT: 0}
+MAX_RANKING_WEIGHT = 10
+DEFAULT_TOP_K = 10
+RANK_SCORE = "Rank Score (0-100)"
+
+# Changelog - Models added and removed by a refresh and the changes of these columns, appended as JSON lines
+# to CHANGELOG_FILE next to the snapshot
+CHANGELOG_FILE = "changelog.jsonl"
+CHANGELOG_COLUMNS = [CLEMSCORE, INPUT, OUTPUT, LATENCY]
+CHANGELOG_LIMIT = 20  # Entries returned by the query API by default
+
+# Instrumentation - Per-stage timings, served at /metrics and logged as JSON lines (stdout if no log file is set)
+METRICS_ENABLED = os.environ.get("LLM_CALC_METRICS") == "1"
+METRICS_LOG = os.environ.get("LLM_CALC_METRICS_LOG")
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Query API - Served next to the UI, rows per page
+API_PREFIX = "/api"
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
 
 # UI - HF Sapce
 OPEN = "Open-Weight"
@@ -0,0 +1,167 @@
+"""
+Benchmarks of the data pipeline at synthetic scale
+
+Generates inputs for 100 to 100k models (see benchmarks/synthetic.py), serves them through the
+fixture source backend in place of the clembench-runs repository and the registry, and times:
+    - merge_data: fetching and merging all sources
+    - get_facets: the filter choices and slider bounds the app extracts
+    - build_state: compact leaderboard, facets, filter and Pareto index
+    - filter_cold: `filter_utils.filter` on a merged frame, building its index
+    - filter: `filter_utils.filter` through the prebuilt index of a snapshot
+    - filter_by_date: `filter_utils.filter_by_date` on the merged frame, sorting its dates
+    - filter_by_date_index: `filter_utils.filter_by_date` through the presorted dates of a snapshot
+
+Usage:
+    python -m benchmarks.run                      # Run and compare against benchmarks/baseline.json
+    python -m benchmarks.run --sizes 100 1000     # Only some sizes
+    python -m benchmarks.run --update             # Record the results as the new baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_fixtures
+import src.process_data as process_data
+from src.filter_utils import filter, filter_by_date
+from src.facets import get_facets
+from src.leaderboard import build_state
+from src.sources import FixtureSource, get_source, set_source
+import assets.text_content as tc
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+SIZES = [100, 1000, 10000, 100000]
+FILTER_STATES = 50
+
+# Slower than the baseline by more than this factor is reported as a regression
+REGRESSION_FACTOR = 1.5
+
+
+@contextlib.contextmanager
+def fixture_sources(runs_dir: str, pricing_path: str):
+    """Serve the fixtures through the fixture source backend and use the fixture pricing file."""
+    saved = get_source(), process_data.PRICING_PATH
+    source = FixtureSource(runs_dir)
+    set_source(source)
+    process_data.PRICING_PATH = pricing_path
+    try:
+        yield
+    finally:
+        source.close()
+        set_source(saved[0])
+        process_data.PRICING_PATH = saved[1]
+
+
+def measure(fn, repeat: int) -> float:
+    """Return the median wall time of `fn` in seconds over `repeat` runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def random_filter_states(facets: dict, n: int, seed: int = 0) -> list:
+    """Generate filter selections as the UI sends them, from defaults to narrow selections."""
+    rng = random.Random(seed)
+    codes = [code for _, code in facets['langs']]
+    modalities = [tc.TEXT, tc.SINGLE_IMG, tc.MULT_IMG, tc.AUDIO, tc.VIDEO]
+    years = [str(y) for y in range(int(tc.START_YEAR), 2026)]
+
+    states = []
+    for _ in range(n):
+        states.append((
+            rng.sample(codes, rng.choice([0, 0, 1, 2])),
+            (0, rng.choice([facets['max_parameter'], 8, 70])),
+            (0, rng.uniform(0, facets['max_input_price'])),
+            (0, facets['max_output_price']),
+            rng.sample(modalities, rng.choice([0, 0, 1])),
+            (0, facets['max_context']),
+            rng.choice([[tc.OPEN, tc.COMM], [tc.OPEN], [tc.COMM]]),
+            rng.choice([[], rng.choice(years)]), [], [], [],
+            rng.sample(facets['licenses'], max(1, len(facets['licenses']) - rng.choice([0, 1]))),
+        ))
+    return states
+
+
+def run_size(n_models: int, repeat: int) -> dict:
+    """Time every stage for `n_models` models, returns the median seconds per stage."""
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        paths = generate_fixtures(root, n_models)
+        with fixture_sources(paths['runs'], paths['pricing']):
+            results['merge_data'] = measure(process_data.merge_data, repeat)
+            with contextlib.redirect_stdout(io.StringIO()):
+                df = process_data.merge_data()
+
+    results['get_facets'] = measure(lambda: get_facets(df), repeat)
+    results['build_state'] = measure(lambda: build_state(df.copy()), repeat)
+
+    state = build_state(df.copy())
+    states = random_filter_states(state.facets, FILTER_STATES)
+
+    results['filter_cold'] = measure(lambda: filter(df, *states[0]), repeat)
+    results['filter'] = measure(lambda: [filter(None, *s, index=state.index) for s in states], repeat) / len(states)
+    results['filter_by_date'] = measure(lambda: filter_by_date(df, '2023', 'March', '2024', 'October'), repeat)
+    results['filter_by_date_index'] = measure(
+        lambda: filter_by_date(state.leaderboard, '2023', 'March', '2024', 'October', index=state.index), repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Print every timing next to its baseline, flagging regressions."""
+    for size, stages in results.items():
+        for stage, seconds in stages.items():
+            reference = baseline.get('results', {}).get(size, {}).get(stage)
+            line = f"{size:>7} models  {stage:<20} {seconds * 1000:>10.2f} ms"
+            if reference:
+                ratio = seconds / reference
+                flag = '  REGRESSION' if ratio > REGRESSION_FACTOR else ''
+                line += f"  (baseline {reference * 1000:.2f} ms, x{ratio:.2f}){flag}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merge_data, filtering and facet extraction")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="Numbers of models to benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage, the median is reported")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline file to compare against")
+    parser.add_argument('--update', action='store_true', help="Write the results to the baseline file")
+    args = parser.parse_args()
+
+    results = {}
+    for n_models in args.sizes:
+        print(f"Benchmarking {n_models} models...")
+        results[str(n_models)] = run_size(n_models, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    compare(results, baseline)
+
+    if args.update:
+        record = {
+            'machine': platform.platform(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'results': {**baseline.get('results', {}), **results},
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(record, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Synthetic inputs for the benchmarks
+
+Generates a clembench-runs tree (version index, results and latency CSVs), a model registry
+and a pricing file for any number of models. Distributions follow the real sources: most
+models support English and a few other major languages with a long tail of rare ones, open
+licenses dominate, most models are text-only, and commercial models are priced on a heavy
+tailed scale while most open models have no price.
+"""
+
+import json
+import os
+import random
+
+import assets.text_content as tc
+
+TEXT_VERSIONS = ['v2.0', 'v1.6', 'v1.5']
+MULTIMODAL_VERSIONS = ['v2.0_multimodal', 'v1.6_multimodal']
+
+GAMES = ['taboo', 'wordle', 'wordle_withclue', 'wordle_withcritic', 'imagegame', 'referencegame',
+         'privateshared', 'codenames', 'guesstheword', 'textmapworld', 'matchit', 'adventuregame']
+
+# Common languages with their share of models, rare ones are drawn from a long tail
+COMMON_LANGUAGES = {'en': 0.97, 'de': 0.45, 'fr': 0.45, 'es': 0.42, 'it': 0.35, 'pt': 0.33,
+                    'zh': 0.35, 'ja': 0.25, 'ko': 0.2, 'ru': 0.25, 'ar': 0.18, 'hi': 0.18}
+RARE_LANGUAGES = ['nl', 'pl', 'sv', 'tr', 'vi', 'th', 'id', 'cs', 'el', 'he', 'hu', 'fi', 'da',
+                  'no', 'ro', 'uk', 'bg', 'fa', 'bn', 'ta', 'te', 'ur', 'sw', 'ms', 'ca', 'hr',
+                  'sk', 'sl', 'lt', 'lv', 'et', 'is', 'ga', 'cy', 'eu', 'gl', 'af', 'am', 'yo']
+
+# Registry entries sometimes list language names instead of codes
+LANGUAGE_NAMES = {'de': 'German', 'fr': 'French', 'es': 'Spanish', 'it': 'Italian'}
+
+LICENSES = [
+    (('Apache 2.0', 'https://www.apache.org/licenses/LICENSE-2.0'), 0.3),
+    (('MIT', 'https://opensource.org/licenses/MIT'), 0.1),
+    (('Llama 3.1 Community License', 'https://www.llama.com/llama3_1/license/'), 0.15),
+    (('Gemma Terms of Use', 'https://ai.google.dev/gemma/terms'), 0.05),
+    (('CC BY-NC 4.0', 'https://creativecommons.org/licenses/by-nc/4.0/'), 0.05),
+    (('Proprietary', 'https://example.com/terms'), 0.35),
+]
+
+# Share of models with each modality
+MODALITIES = {'single_image': 0.2, 'multiple_images': 0.1, 'audio': 0.03, 'video': 0.02}
+
+OPEN_PARAMETERS = ['0.5B', '1B', '1.5B', '3B', '7B', '8B', '9B', '13B', '14B', '27B', '32B',
+                   '70B', '72B', '123B', '405B', '']
+CONTEXT_SIZES = ['4k', '8k', '32k', '128k', '200k', '1000k']
+
+
+def generate_registry_entry(name: str, rng: random.Random) -> dict:
+    """Generate the registry entry of one model."""
+    open_weight = rng.random() < 0.6
+
+    languages = [code for code, share in COMMON_LANGUAGES.items() if rng.random() < share]
+    languages += rng.sample(RARE_LANGUAGES, rng.choice([0, 0, 0, 1, 3, 10]))
+    languages = [LANGUAGE_NAMES.get(code, code) if rng.random() < 0.1 else code for code in languages]
+
+    if open_weight:
+        license = rng.choices([l for l, _ in LICENSES[:-1]], [w for _, w in LICENSES[:-1]])[0]
+    else:
+        license = LICENSES[-1][0]
+
+    entry = {
+        'model_name': name,
+        'parameters': rng.choice(OPEN_PARAMETERS) if open_weight else '',
+        'release_date': f"{rng.randint(2022, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'open_weight': open_weight,
+        'languages': languages,
+        'context_size': rng.choice(CONTEXT_SIZES),
+        'license': {'name': license[0], 'url': license[1]},
+    }
+
+    multimodality = {field: rng.random() < share for field, share in MODALITIES.items()}
+    if any(multimodality.values()) or rng.random() < 0.5:
+        entry['model_config'] = {'multimodality': multimodality}
+    return entry
+
+
+def generate_price(open_weight: bool, rng: random.Random):
+    """Generate (input, output) prices per 1M tokens as in pricing.json, None for unpriced models."""
+    if open_weight and rng.random() < 0.7:
+        return None
+    input_price = round(rng.lognormvariate(0, 1.2), 2)
+    return f"${input_price}", f"${round(input_price * rng.choice([1, 2, 3, 4, 5]), 2)}"
+
+
+def write_results(path: str, names: list, rng: random.Random) -> None:
+    """Write a results CSV in the clembench-runs layout, with one row per model and temperature."""
+    header = ['', tc.DEFAULT_CLEMSCORE, '-, % Played', '-, Quality Score']
+    header += [f"{game}, {metric}" for game in GAMES for metric in ['% Played', 'Quality Score', 'Quality Score (std)']]
+
+    with open(path, 'w') as f:
+        f.write(','.join(f'"{h}"' for h in header) + '\n')
+        for name in names:
+            temperature = rng.choice(['0.0', '0.7', '1.0'])
+            scores = [f"{rng.uniform(0, 100):.2f}" for _ in header[1:]]
+            f.write(f"{name}-t{temperature}--{name}-t{temperature}," + ','.join(scores) + '\n')
+
+
+def write_latency(path: str, names: list, rng: random.Random) -> None:
+    """Write a latency CSV with the average latency in seconds per model."""
+    with open(path, 'w') as f:
+        f.write('model,latency\n')
+        for name in names:
+            f.write(f"{name},{rng.lognormvariate(1, 0.8):.3f}\n")
+
+
+def generate_fixtures(root: str, n_models: int, seed: int = 0) -> dict:
+    """
+    Generate all inputs of `merge_data` for `n_models` models under `root`.
+
+    Args:
+        root (str): Output directory, the generated 'runs' directory is laid out as a source mirror
+        n_models (int): Number of models in the registry
+        seed (int): Seed of the generator
+
+    Returns:
+        dict: Paths of the generated files - 'runs' (the served directory), 'registry'
+        (within runs) and 'pricing'
+    """
+    rng = random.Random(seed)
+    runs = os.path.join(root, 'runs')
+    os.makedirs(os.path.join(runs, tc.LATENCY_FOLDER), exist_ok=True)
+
+    names = [f"model-{i}" for i in range(n_models)]
+    registry = [generate_registry_entry(name, rng) for name in names]
+
+    pricing = []
+    for entry in registry:
+        price = generate_price(entry['open_weight'], rng)
+        if price is not None:
+            pricing.append({'model_id': entry['model_name'], 'input': price[0], 'output': price[1]})
+
+    with open(os.path.join(runs, tc.REGISTRY_FILE), 'w') as f:
+        json.dump(registry, f)
+    pricing_path = os.path.join(root, 'pricing.json')
+    with open(pricing_path, 'w') as f:
+        json.dump(pricing, f)
+
+    versions = TEXT_VERSIONS + MULTIMODAL_VERSIONS
+    with open(os.path.join(runs, tc.BENCHMARK_FILE), 'w') as f:
+        json.dump({'versions': [{'version': v} for v in versions]}, f)
+
+    # Each version covers most of the registry plus a few models missing from it
+    for version in versions:
+        covered = rng.sample(names, int(n_models * 0.8)) + [f"unregistered-{i}" for i in range(5)]
+        os.makedirs(os.path.join(runs, version), exist_ok=True)
+        write_results(os.path.join(runs, version, tc.RESULT_FILE), covered, rng)
+        write_latency(os.path.join(runs, tc.LATENCY_FOLDER, version + tc.LATENCY_SUFFIX), covered, rng)
+
+    return {'runs': runs, 'registry': os.path.join(runs, tc.REGISTRY_FILE), 'pricing': pricing_path}
@@ -0,0 +1,356 @@
+"""
+Headless query API over the leaderboard
+
+Serves the filtered leaderboard as compact JSON or as an Arrow IPC stream, its top k models by
+a weighted composite score, the facet counts of the filter choices and the changelog of the
+refreshes, for clients that poll the data instead of rendering the UI. Queries go
+through the same filter index and result cache as the UI, and support column projection, sort
+keys and limit/offset paging. Every response carries the snapshot id, and an ETag so unchanged
+results can be revalidated with a 304 instead of being sent again.
+"""
+
+import hashlib
+import json
+import math
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+
+from src.changelog import read_changelog
+from src.compact import leaderboard_columns, render
+from src.filter_cache import filter_cache, normalize_filter_state
+from src.filter_utils import DISPLAY_COLUMNS, current_year
+from src.leaderboard import LeaderboardState, facet_counts, filter_leaderboard, get_state, ranked_leaderboard
+from src.metrics import format_metric, render_prometheus, timed
+import assets.text_content as tc
+
+
+def default_filters(state: LeaderboardState) -> dict:
+    """
+    Return the widest filter selection of a snapshot.
+
+    The ranges cover every model, the release date falls back to the defaults of the date
+    dropdowns (tc.START_YEAR to the current year).
+
+    Returns:
+        dict: Arguments of `filter_utils.filter` by name, without the DataFrame
+    """
+    def bounds(column):
+        values = state.index.ranges[column].values
+        return (values[0], values[-1]) if len(values) else (0, 0)
+
+    return {
+        'language_list': [],
+        'parameters': bounds(tc.DUMMY_PARAMS),
+        'input_price': bounds(tc.INPUT),
+        'output_price': bounds(tc.OUTPUT),
+        'multimodal': [],
+        'context': bounds(tc.CONTEXT),
+        'open_weight': [tc.OPEN, tc.COMM],
+        'start_year': None,
+        'start_month': None,
+        'end_year': None,
+        'end_month': None,
+        'license': list(state.facets['licenses']),
+    }
+
+
+def parse_sort(sort, columns) -> tuple:
+    """
+    Parse sort keys given as column names, prefixed with '-' for descending order.
+
+    Returns:
+        tuple[list, list]: Column names and their ascending flags
+    """
+    by, ascending = [], []
+    for key in sort:
+        name = key[1:] if key.startswith('-') else key
+        if name not in columns:
+            raise ValueError(f"Unknown sort column: {name}")
+        by.append(name)
+        ascending.append(not key.startswith('-'))
+    return by, ascending
+
+
+def query_leaderboard(snapshot_id: str = None, filters: dict = None, columns: list = None,
+                      sort: list = None, limit: int = tc.API_DEFAULT_LIMIT, offset: int = 0) -> tuple:
+    """
+    Filter, project, sort and page a snapshot of the leaderboard.
+
+    Args:
+        snapshot_id (str): Snapshot to query, the current one if not given or unknown
+        filters (dict): Filter arguments by name, see `default_filters`. Missing ones match everything
+        columns (list): Columns to return, the display columns of the UI if not given. Language
+            lists are sorted by language code, see `compact.render`
+        sort (list): Sort keys, e.g. ['-Score (0-100)', 'Model Name']. By score if not given
+        limit (int): Maximum number of rows, at most tc.API_MAX_LIMIT
+        offset (int): Number of rows to skip
+
+    Returns:
+        tuple[LeaderboardState, int, pd.DataFrame]: The queried state, the number of matching
+        rows and the requested page
+    """
+    state = get_state(snapshot_id)
+    args = default_filters(state)
+    args.update({k: v for k, v in (filters or {}).items() if v is not None})
+
+    all_columns = leaderboard_columns(state.leaderboard)
+    columns = columns or DISPLAY_COLUMNS
+    unknown = [c for c in columns if c not in all_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {unknown}, available columns: {all_columns}")
+
+    # The cached display table is sorted by score, its index labels locate the rows of the full leaderboard
+    table = filter_leaderboard(state.snapshot_id, *args.values())
+    if sort:
+        by, ascending = parse_sort(sort, all_columns)
+        labels = render(state.leaderboard.loc[table.index], by).sort_values(
+            by=by, ascending=ascending, kind='stable', na_position='last').index
+    else:
+        labels = table.index
+
+    limit = max(0, min(limit, tc.API_MAX_LIMIT))
+    page = render(state.leaderboard.loc[labels[offset:offset + limit]], columns)
+    return state, len(labels), page
+
+
+def to_json(page: pd.DataFrame, meta: dict) -> str:
+    """Serialize a page as {**meta, "columns": [...], "data": [[...], ...]}."""
+    body = page.to_json(orient='split', index=False, date_format='iso')
+    return json.dumps(meta, separators=(',', ':'))[:-1] + ',' + body[1:]
+
+
+def to_arrow(page: pd.DataFrame, meta: dict) -> bytes:
+    """Serialize a page as Arrow IPC stream, with `meta` in the schema metadata."""
+    table = pa.Table.from_pandas(page, preserve_index=False)
+    table = table.replace_schema_metadata({'llm_calculator': json.dumps(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def filter_params(
+    snapshot_id: Optional[str] = None,
+    languages: List[str] = Query(default=[]),
+    parameters_min: Optional[float] = None,
+    parameters_max: Optional[float] = None,
+    input_price_min: Optional[float] = None,
+    input_price_max: Optional[float] = None,
+    output_price_min: Optional[float] = None,
+    output_price_max: Optional[float] = None,
+    modalities: List[str] = Query(default=[]),
+    context_min: Optional[float] = None,
+    context_max: Optional[float] = None,
+    model_types: Optional[List[str]] = Query(default=None),
+    start_year: Optional[str] = None,
+    start_month: Optional[str] = None,
+    end_year: Optional[str] = None,
+    end_month: Optional[str] = None,
+    licenses: Optional[List[str]] = Query(default=None),
+) -> tuple:
+    """
+    Read the filter selection from the query parameters, shared by the query routes.
+
+    Returns:
+        tuple[LeaderboardState, dict, dict]: The queried state, its `default_filters`, and the
+        given filters by name - None where a parameter is missing
+
+    Raises:
+        HTTPException: 400 if a year is not one of the date dropdowns (tc.START_YEAR to the
+        current year), a month is not a month name or a range bound is not a finite number
+    """
+    # Invalid dates are rejected here, `normalize_filter_state` would drop the date filter instead
+    for name, year in [('start_year', start_year), ('end_year', end_year)]:
+        if year and not (year.strip().isdigit() and int(tc.START_YEAR) <= int(year) <= int(current_year)):
+            raise HTTPException(status_code=400, detail=f"Invalid {name}: {year}")
+    for name, month in [('start_month', start_month), ('end_month', end_month)]:
+        if month and month not in tc.MONTH_MAP:
+            raise HTTPException(status_code=400, detail=f"Unknown {name}: {month}")
+
+    bounds = {
+        'parameters_min': parameters_min, 'parameters_max': parameters_max,
+        'input_price_min': input_price_min, 'input_price_max': input_price_max,
+        'output_price_min': output_price_min, 'output_price_max': output_price_max,
+        'context_min': context_min, 'context_max': context_max,
+    }
+    for name, bound in bounds.items():
+        if bound is not None and not math.isfinite(bound):
+            raise HTTPException(status_code=400, detail=f"Invalid {name}: {bound}")
+
+    state = get_state(snapshot_id)
+    defaults = default_filters(state)
+
+    def value_range(name, low, high):
+        return (defaults[name][0] if low is None else low, defaults[name][1] if high is None else high)
+
+    filters = {
+        'language_list': languages,
+        'parameters': value_range('parameters', parameters_min, parameters_max),
+        'input_price': value_range('input_price', input_price_min, input_price_max),
+        'output_price': value_range('output_price', output_price_min, output_price_max),
+        'multimodal': modalities,
+        'context': value_range('context', context_min, context_max),
+        'open_weight': model_types,
+        'start_year': start_year,
+        'start_month': start_month,
+        'end_year': end_year,
+        'end_month': end_month,
+        'license': licenses,
+    }
+    return state, defaults, filters
+
+
+def ranking_weights(
+    score_weight: Optional[float] = Query(default=None, ge=0),
+    input_price_weight: Optional[float] = Query(default=None, ge=0),
+    output_price_weight: Optional[float] = Query(default=None, ge=0),
+    latency_weight: Optional[float] = Query(default=None, ge=0),
+    context_weight: Optional[float] = Query(default=None, ge=0),
+) -> dict:
+    """
+    Read the ranking weights from the query parameters, named as in tc.RANKING_WEIGHT_NAMES.
+
+    Returns:
+        dict: Weight per criterion - tc.DEFAULT_RANKING_WEIGHTS if no weight is given, otherwise
+        the given weights with 0 for the missing ones
+    """
+    given = dict(zip(tc.RANKING_WEIGHT_NAMES.values(), [score_weight, input_price_weight, output_price_weight,
+                                                        latency_weight, context_weight]))
+    if all(weight is None for weight in given.values()):
+        return dict(tc.DEFAULT_RANKING_WEIGHTS)
+    return {criterion: given[name] or 0 for criterion, name in tc.RANKING_WEIGHT_NAMES.items()}
+
+
+def conditional_query(request: Request, params: tuple, *options) -> tuple:
+    """
+    Resolve the filter selection of a query route and the ETag of its response.
+
+    Same snapshot, canonical filter state and options - same response, so the ETag is derived
+    from them before anything is filtered.
+
+    Args:
+        request (Request): The request, checked for If-None-Match
+        params (tuple): Output of `filter_params`
+        *options: Further arguments the response depends on, e.g. columns, paging and format
+
+    Returns:
+        tuple[dict, str]: Filter arguments by name with the defaults filled in, and the ETag
+
+    Raises:
+        HTTPException: 304 if the client holds the response already
+    """
+    state, defaults, filters = params
+    query = {**defaults, **{name: value for name, value in filters.items() if value is not None}}
+    key = repr((normalize_filter_state(*query.values()), *options))
+    etag = f'"{state.snapshot_id}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"'
+    if request.headers.get('if-none-match') == etag:
+        raise HTTPException(status_code=304, headers={'ETag': etag})
+    return query, etag
+
+
+def create_api() -> FastAPI:
+    """Create the FastAPI app serving the query routes under tc.API_PREFIX."""
+    api = FastAPI()
+
+    @api.get(f"{tc.API_PREFIX}/snapshot")
+    def snapshot_info():
+        state = get_state()
+        return {
+            'snapshot_id': state.snapshot_id,
+            'rows': len(state.leaderboard),
+            'columns': leaderboard_columns(state.leaderboard),
+        }
+
+    @api.get(f"{tc.API_PREFIX}/leaderboard")
+    def leaderboard(
+        request: Request,
+        params: tuple = Depends(filter_params),
+        columns: Optional[List[str]] = Query(default=None),
+        sort: Optional[List[str]] = Query(default=None),
+        limit: int = Query(default=tc.API_DEFAULT_LIMIT, ge=0, le=tc.API_MAX_LIMIT),
+        offset: int = Query(default=0, ge=0),
+        format: str = Query(default='json', pattern='^(json|arrow)$'),
+    ):
+        state = params[0]
+        query, etag = conditional_query(request, params, columns, sort, limit, offset, format)
+
+        with timed('api.leaderboard', format=format) as sizes:
+            try:
+                state, total, page = query_leaderboard(state.snapshot_id, query, columns, sort, limit, offset)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            meta = {'snapshot_id': state.snapshot_id, 'total': total, 'offset': offset, 'limit': limit}
+            if format == 'arrow':
+                body, media_type = to_arrow(page, meta), tc.ARROW_MEDIA_TYPE
+            else:
+                body, media_type = to_json(page, meta), 'application/json'
+            sizes['rows'] = len(page)
+            sizes['bytes'] = len(body)
+
+        headers = {'ETag': etag, 'X-Snapshot-Id': state.snapshot_id, 'X-Total-Count': str(total)}
+        return Response(body, media_type=media_type, headers=headers)
+
+    @api.get(f"{tc.API_PREFIX}/ranking")
+    def ranking(
+        request: Request,
+        params: tuple = Depends(filter_params),
+        weights: dict = Depends(ranking_weights),
+        k: int = Query(default=tc.DEFAULT_TOP_K, ge=1, le=tc.API_MAX_LIMIT),
+        format: str = Query(default='json', pattern='^(json|arrow)$'),
+    ):
+        """Top k models of the filtered leaderboard by the weighted composite score, best first."""
+        state = params[0]
+        query, etag = conditional_query(request, params, sorted(weights.items()), k, format)
+
+        with timed('api.ranking', format=format) as sizes:
+            try:
+                page = ranked_leaderboard(state.snapshot_id, weights, k, *query.values())
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            meta = {'snapshot_id': state.snapshot_id, 'k': k,
+                    'weights': {tc.RANKING_WEIGHT_NAMES[c]: w for c, w in weights.items()}}
+            if format == 'arrow':
+                body, media_type = to_arrow(page, meta), tc.ARROW_MEDIA_TYPE
+            else:
+                body, media_type = to_json(page, meta), 'application/json'
+            sizes['rows'] = len(page)
+            sizes['bytes'] = len(body)
+
+        headers = {'ETag': etag, 'X-Snapshot-Id': state.snapshot_id}
+        return Response(body, media_type=media_type, headers=headers)
+
+    @api.get(f"{tc.API_PREFIX}/facets")
+    def facets(request: Request, params: tuple = Depends(filter_params)):
+        """Number of models each language, modality, license and model type would leave."""
+        state = params[0]
+        query, etag = conditional_query(request, params)
+
+        counts = facet_counts(state.snapshot_id, *query.values())
+        body = json.dumps({'snapshot_id': state.snapshot_id, 'counts': counts}, separators=(',', ':'))
+        headers = {'ETag': etag, 'X-Snapshot-Id': state.snapshot_id}
+        return Response(body, media_type='application/json', headers=headers)
+
+    @api.get(f"{tc.API_PREFIX}/changelog")
+    def changelog(limit: int = Query(default=tc.CHANGELOG_LIMIT, ge=0, le=tc.API_MAX_LIMIT)):
+        """Models added and removed by the last refreshes and their changed scores, prices and latencies, oldest first."""
+        return {'snapshot_id': get_state().snapshot_id, 'entries': read_changelog(limit)}
+
+    @api.get("/metrics")
+    def metrics():
+        """Stage timings and filter cache statistics in the Prometheus text format."""
+        stats = filter_cache.stats()
+        lines = []
+        for name in ['hits', 'misses', 'evictions']:
+            lines += format_metric(f'llm_calc_filter_cache_{name}_total', 'counter', f"Filter cache {name}",
+                                   [({}, stats[name])])
+        lines += format_metric('llm_calc_filter_cache_entries', 'gauge', "Filtered results held in the cache",
+                               [({}, stats['size'])])
+        text = render_prometheus() + '\n'.join(lines) + '\n'
+        return Response(text, media_type=tc.METRICS_MEDIA_TYPE)
+
+    return api
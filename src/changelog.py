@@ -0,0 +1,133 @@
+"""
+Changes between leaderboard refreshes
+
+`diff_leaderboards` compares two leaderboards keyed on the model name and lists the models that
+were added or removed and the changed values of tc.CHANGELOG_COLUMNS (score, prices, latency).
+Every refresh that changes something appends one entry to tc.CHANGELOG_FILE, so price changes
+can be followed without comparing snapshots downstream.
+"""
+
+import datetime
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import assets.text_content as tc
+
+_lock = threading.Lock()
+
+
+def get_changelog_path() -> str:
+    return os.path.join(tc.SNAPSHOT_DIR, tc.CHANGELOG_FILE)
+
+
+def to_value(value):
+    """Convert a cell to a JSON value, None for missing values."""
+    if pd.isna(value):
+        return None
+    # The shortest decimal of the float, e.g. 9.15 for the float32 of a compact leaderboard and not 9.1499996
+    if isinstance(value, np.floating):
+        return float(str(value))
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def diff_leaderboards(old: pd.DataFrame, new: pd.DataFrame, columns: list = None) -> dict:
+    """
+    Compare two leaderboards keyed on tc.MODEL_NAME.
+
+    Args:
+        old (pd.DataFrame): Previous leaderboard, merged or compact
+        new (pd.DataFrame): Refreshed leaderboard, merged or compact
+        columns (list): Columns to compare, tc.CHANGELOG_COLUMNS if not given
+
+    Returns:
+        dict: Sorted model names under 'added' and 'removed', and under 'changed' one
+        {'model', 'column', 'old', 'new'} record per changed value. A model listed twice
+        is compared by its first row
+    """
+    columns = columns or tc.CHANGELOG_COLUMNS
+
+    # Model names as objects, a leaderboard mapped from a shared segment holds Arrow strings
+    def by_model(df):
+        df = df.drop_duplicates(tc.MODEL_NAME)
+        return df[columns].set_axis(pd.Index(df[tc.MODEL_NAME].to_numpy(dtype=object), name=tc.MODEL_NAME))
+
+    old, new = by_model(old), by_model(new)
+    common = old.index.intersection(new.index)
+    before, after = old.loc[common], new.loc[common]
+
+    changed = []
+    for column in columns:
+        a, b = before[column].to_numpy(), after[column].to_numpy()
+        for i in np.flatnonzero((a != b) & ~(pd.isna(a) & pd.isna(b))):
+            changed.append({'model': common[i], 'column': column,
+                            'old': to_value(a[i]), 'new': to_value(b[i])})
+
+    return {
+        'added': sorted(new.index.difference(old.index)),
+        'removed': sorted(old.index.difference(new.index)),
+        'changed': sorted(changed, key=lambda change: (change['model'], columns.index(change['column']))),
+    }
+
+
+def is_empty(changes: dict) -> bool:
+    return not (changes['added'] or changes['removed'] or changes['changed'])
+
+
+def append_changelog(old_id: str, new_id: str, changes: dict, path: str = None) -> dict:
+    """
+    Append the changes of a refresh to the changelog.
+
+    Args:
+        old_id (str): Snapshot id before the refresh
+        new_id (str): Snapshot id after the refresh
+        changes (dict): Output of `diff_leaderboards`
+        path (str): Path of the changelog, defaults to the configured one
+
+    Returns:
+        dict: The appended entry
+    """
+    path = path or get_changelog_path()
+    entry = {
+        'from_snapshot': old_id,
+        'to_snapshot': new_id,
+        'created_at': datetime.datetime.now().isoformat(),
+        **changes,
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with _lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+    return entry
+
+
+def read_changelog(limit: int = None, path: str = None) -> list:
+    """
+    Read the changelog.
+
+    Args:
+        limit (int): Number of entries to return, the most recent ones. All entries if not given
+        path (str): Path of the changelog, defaults to the configured one
+
+    Returns:
+        list: Entries, oldest first. Empty if there is no changelog yet
+    """
+    path = path or get_changelog_path()
+    if not os.path.exists(path):
+        return []
+
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    if limit is not None:
+        lines = lines[-limit:] if limit > 0 else []
+
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # A line cut off by an interrupted write
+            continue
+    return entries
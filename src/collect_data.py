@@ -3,150 +3,354 @@ Collect data from the multiple sources and create a base datafranme for the LLMC
 Latency - https://github.com/clembench/clembench-runs/tree/main/Addenda/Latency
 Pricing - pricing.json
 Model info - https://github.com/kushal-10/clembench/blob/feat/registry/backends/model_registry_updated.json
+
+Files are read through the configured source backend (see src/sources.py) and independent
+downloads run concurrently on a thread pool, so a full fetch takes as long as its slowest download.
 """
 
 import pandas as pd
+import argparse
 import json
-import requests
-from assets.text_content import CLEMBENCH_RUNS_REPO, REGISTRY_URL, BENCHMARK_FILE, LATENCY_FOLDER, RESULT_FILE, LATENCY_SUFFIX
 import os
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from concurrent.futures import ThreadPoolExecutor
+from assets.text_content import BENCHMARK_FILE, LATENCY_FOLDER, RESULT_FILE, LATENCY_SUFFIX, REGISTRY_FILE, MIRROR_DIR, FETCH_WORKERS, DEFAULT_MODEL_NAME, DEFAULT_CLEMSCORE
+from src.metrics import timed
+from src.sources import HTTPSource, get_source
+
+# Columns of the results and latency files used by `merge_data`, all other columns are skipped while parsing
+# The model column of the results has an empty header, pandas names it DEFAULT_MODEL_NAME
+RESULT_COLUMNS = {'': pa.string(), DEFAULT_CLEMSCORE: pa.float64()}
+LATENCY_COLUMNS = {'model': pa.string(), 'latency': pa.float64()}
+
+def get_version_paths(version: str) -> tuple:
+    """Return the source paths of the results and latency files of a version."""
+    return os.path.join(version, RESULT_FILE), os.path.join(LATENCY_FOLDER, version + LATENCY_SUFFIX)
+
+def read_source(path: str, stage: str) -> bytes:
+    """Read a source file through the configured backend, timed as `stage`."""
+    with timed(stage, path=path) as sizes:
+        content = get_source().read(path)
+        sizes['bytes'] = len(content) if content is not None else 0
+    return content
+
+def read_csv_columns(content: bytes, columns: dict) -> pd.DataFrame:
+    """
+    Parse selected columns of a CSV file straight from its raw bytes.
+
+    Args:
+        content (bytes): The CSV file
+        columns (dict): Column name -> pyarrow type of the columns to read
+
+    Returns:
+        pd.DataFrame: The selected columns, in the order of `columns`
+
+    Raises:
+        pa.ArrowInvalid: If the file is empty or can not be parsed
+        pa.ArrowKeyError: If the file misses one of the columns
+    """
+    table = pa_csv.read_csv(
+        pa.BufferReader(content),
+        convert_options=pa_csv.ConvertOptions(include_columns=list(columns), column_types=columns)
+    )
+    return table.to_pandas()
 
-def validate_request(url: str, response) -> bool:
+def fetch_version_files(version: str) -> tuple:
     """
-    Validate if an HTTP request was successful.
-    
+    Fetch the raw results and latency CSV files of a single benchmark version.
+
     Args:
-        url (str): The URL that was requested
-        response (requests.Response): The response object from the request
-        
+        version (str): Version name as listed in BENCHMARK_FILE
+
+    Returns:
+        tuple[bytes, bytes]: (results, latency), or (None, None) if a request fails
+    """
+    results_path, latency_path = get_version_paths(version)
+
+    results = read_source(results_path, 'fetch.results')
+    if results is None:
+        return None, None
+
+    latency = read_source(latency_path, 'fetch.latency')
+    if latency is None:
+        return None, None
+
+    return results, latency
+
+def parse_version_files(version: str, results: bytes, latency: bytes) -> tuple:
+    """
+    Parse the raw results and latency CSV files of a benchmark version.
+
     Returns:
-        bool: True if request was successful (status code 200), False otherwise
+        tuple[pd.DataFrame, pd.DataFrame]: (results_df, latency_df), or (None, None) if parsing fails
     """
+    try:
+        # Parse only the model, score and latency columns
+        with timed('parse.results', version=version) as sizes:
+            results_df = read_csv_columns(results, RESULT_COLUMNS).rename(columns={'': DEFAULT_MODEL_NAME})
+            sizes['rows'] = len(results_df)
+        with timed('parse.latency', version=version) as sizes:
+            latency_df = read_csv_columns(latency, LATENCY_COLUMNS)
+            sizes['rows'] = len(latency_df)
+        return results_df, latency_df
 
-    if response.status_code != 200:
-        print(f"Failed to read file - {url}. Status Code: {response.status_code}")
-        return False
-    return True
+    except (pa.ArrowInvalid, pa.ArrowKeyError) as e:
+        print(f"Error: Unable to parse CSV data for version {version}: {e}")
 
-def fetch_benchmark_data(benchmark: str = "text", version_names: list = []) -> tuple:
+    return None, None
+
+def fetch_version_data(version: str) -> tuple:
+    """
+    Fetch and parse the results and latency CSV files of a single benchmark version.
+
+    Args:
+        version (str): Version name as listed in BENCHMARK_FILE
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: A tuple containing:
+            - results_df: DataFrame with benchmark results
+            - latency_df: DataFrame with latency measurements
+            Returns (None, None) if a request or parsing fails
+    """
+    results, latency = fetch_version_files(version)
+    if results is None:
+        return None, None
+
+    return parse_version_files(version, results, latency)
+
+def select_benchmark_versions(benchmark: str, version_names: list) -> list:
+    """Return the versions of `version_names` that belong to the given benchmark type."""
+    return [v for v in version_names if (benchmark == "multimodal") == ('multimodal' in v)]
+
+def resolve_first_version(futures: list) -> tuple:
+    """
+    Return the data of the first successful version probe.
+
+    Probes are resolved in priority order, so this returns as soon as the latest
+    available version is downloaded, even while older versions are still in flight.
+
+    Args:
+        futures (list): Futures of `fetch_version_data`, sorted by latest version first
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: (results_df, latency_df) or (None, None)
+    """
+    for future in futures:
+        results_df, latency_df = future.result()
+        if results_df is not None:
+            for pending in futures:
+                pending.cancel()
+            return results_df, latency_df
+    return None, None
+
+def fetch_benchmark_data(benchmark: str = "text", version_names: list = [], executor: ThreadPoolExecutor = None) -> tuple:
     """
     Fetch and parse benchmark results and latency data from CSV files.
-    
+
+    All candidate versions are probed concurrently, the latest version that succeeds is used.
+
     Args:
         benchmark (str): Type of benchmark to fetch ('text' or 'multimodal')
         version_names (list): List of version names to search through, sorted by latest first
-        
+        executor (ThreadPoolExecutor): Pool to run the probes on, a new one is used if not given
+
     Returns:
         tuple[pd.DataFrame, pd.DataFrame]: A tuple containing:
             - results_df: DataFrame with benchmark results
             - latency_df: DataFrame with latency measurements
             Returns (None, None) if no matching version is found or requests fail
-            
-    Raises:
-        requests.RequestException: If there's an error fetching the data
-        pd.errors.EmptyDataError: If CSV file is empty
-        pd.errors.ParserError: If CSV parsing fails
-    """
-    for v in version_names:
-        # Check if version matches benchmark type
-        is_multimodal = 'multimodal' in v
-        if (benchmark == "multimodal") != is_multimodal:
-            continue
-            
-        # Construct URLs
-        results_url = os.path.join(CLEMBENCH_RUNS_REPO, v, RESULT_FILE)
-        latency_url = os.path.join(CLEMBENCH_RUNS_REPO, LATENCY_FOLDER, v + LATENCY_SUFFIX)
-        
-        try:
-            results = requests.get(results_url)
-            latency = requests.get(latency_url)
-            
-            if validate_request(results_url, results) and validate_request(latency_url, latency):
-                # Convert the CSV content to pandas DataFrames
-                results_df = pd.read_csv(pd.io.common.StringIO(results.text))
-                latency_df = pd.read_csv(pd.io.common.StringIO(latency.text))
-                return results_df, latency_df
-                
-        except requests.RequestException as e:
-            print(f"Error fetching data for version {v}: {e}")
-        except pd.errors.EmptyDataError:
-            print(f"Error: Empty CSV file found for version {v}")
-        except pd.errors.ParserError:
-            print(f"Error: Unable to parse CSV data for version {v}")
-            
-    return None, None
+    """
+    versions = select_benchmark_versions(benchmark, version_names)
+    if executor is not None:
+        return resolve_first_version([executor.submit(fetch_version_data, v) for v in versions])
 
-def fetch_version_metadata() -> tuple:
+    executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    try:
+        return resolve_first_version([executor.submit(fetch_version_data, v) for v in versions])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def sort_versions(version_names: list) -> list:
+    """Sort version names (v1.6, v2.0_multimodal, etc.) by latest first."""
+    return sorted(
+        version_names,
+        key=lambda v: list(map(int, v[1:].split('_')[0].split('.'))),
+        reverse=True
+    )
+
+def fetch_version_names() -> list:
+    """
+    Fetch the version index of the Clembench runs repository.
+
+    Returns:
+        list: Version names sorted by latest first.
+        Returns None if the request fails.
+    """
+    content = read_source(BENCHMARK_FILE, 'fetch.index')
+    if content is None:
+        return None
+
+    json_data = json.loads(content)
+    versions = json_data['versions']
+
+    return sort_versions([ver['version'] for ver in versions])
+
+def fetch_version_metadata(executor: ThreadPoolExecutor = None) -> tuple:
     """
     Fetch and process benchmark metadata from the Clembench GitHub repository.
-    
+
     The data is sourced from: https://github.com/clembench/clembench-runs
-    Configure the repository path in src/assets/text_content/CLEMBENCH_RUNS_REPO
-    
+    Configure the repository path in src/assets/text_content/CLEMBENCH_RUNS_REPO, or read
+    from a mirror with SOURCE_BACKEND
+
+    Args:
+        executor (ThreadPoolExecutor): Pool to run the downloads on, a new one is used if not given
+
     Returns:
         tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]: A tuple containing:
-            - mm_result: Multimodal benchmark results
             - mm_latency: Multimodal latency data
-            - text_result: Text benchmark results
+            - mm_result: Multimodal benchmark results
             - text_latency: Text latency data
+            - text_result: Text benchmark results
             Returns (None, None, None, None) if the request fails
     """
-    json_url = CLEMBENCH_RUNS_REPO + BENCHMARK_FILE
-    response = requests.get(json_url)
-
-    # Check if the JSON file request was successful
-    if not validate_request(json_url, response):
+    version_names = fetch_version_names()
+    if version_names is None:
         return None, None, None, None
 
-    json_data = response.json()
-    versions = json_data['versions']
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
 
-    # Sort the versions in benchmark by latest first
-    version_names = sorted(
-        [ver['version'] for ver in versions],
-        key=lambda v: list(map(int, v[1:].split('_')[0].split('.'))),  
-        reverse=True
-    )
+    try:
+        # Probe both benchmark types at once, then pick the latest available version of each
+        mm_futures = [executor.submit(fetch_version_data, v) for v in select_benchmark_versions("multimodal", version_names)]
+        text_futures = [executor.submit(fetch_version_data, v) for v in select_benchmark_versions("text", version_names)]
 
-    # Latency is in  seconds
-    mm_result, mm_latency = fetch_benchmark_data("multimodal", version_names)
-    text_result, text_latency = fetch_benchmark_data("text", version_names)
+        # Latency is in  seconds
+        mm_result, mm_latency = resolve_first_version(mm_futures)
+        text_result, text_latency = resolve_first_version(text_futures)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     return mm_latency, mm_result, text_latency, text_result
 
 def fetch_registry_data() -> dict:
     """
-    Fetch and parse model registry data from the Clembench registry URL.
-    
-    The data is sourced from the model registry defined in REGISTRY_URL.
+    Fetch and parse model registry data from the Clembench registry.
+
+    The data is sourced from the model registry defined in REGISTRY_URL, or its mirror.
     Contains information about various LLM models including their specifications
     and capabilities.
-    
+
     Returns:
         dict: Dictionary containing model registry data.
         Returns None if the request fails or the JSON is invalid.
-        
-    Raises:
-        requests.RequestException: If there's an error fetching the data
-        json.JSONDecodeError: If the response cannot be parsed as JSON
     """
+    content = read_source(REGISTRY_FILE, 'fetch.registry')
+    if content is None:
+        return None
+
     try:
-        response = requests.get(REGISTRY_URL)
-        if not validate_request(REGISTRY_URL, response):
-            return None
-            
-        return response.json()
-        
-    except requests.RequestException as e:
-        print(f"Error fetching registry data: {e}")
+        return json.loads(content)
     except json.JSONDecodeError as e:
         print(f"Error parsing registry JSON: {e}")
-    
+
     return None
 
+def fetch_all_data() -> tuple:
+    """
+    Fetch the benchmark data and the model registry concurrently.
+
+    Returns:
+        tuple: The four frames of `fetch_version_metadata` followed by the registry data
+    """
+    executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    try:
+        registry_future = executor.submit(fetch_registry_data)
+        metadata = fetch_version_metadata(executor)
+        return (*metadata, registry_future.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_source_fingerprints() -> dict:
+    """
+    Fetch fingerprints of the sources used by `merge_data`.
+
+    The version index and the model registry are fingerprinted. Results and latency
+    files of a published clembench version are not rewritten, new runs are added as
+    new versions to the index instead.
+
+    Returns:
+        dict: Mapping of source location (URL or mirror path) to its fingerprint.
+        Returns None if any of the sources can not be reached.
+    """
+    source = get_source()
+    paths = [BENCHMARK_FILE, REGISTRY_FILE]
+    with timed('fetch.fingerprints'), ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        fingerprints = dict(zip(map(source.location, paths), executor.map(source.fingerprint, paths)))
+
+    if any(fp is None for fp in fingerprints.values()):
+        return None
+    return fingerprints
+
+def write_mirror_file(directory: str, path: str, content: bytes) -> None:
+    """Write a source file into the mirror, replacing the previous version atomically."""
+    target = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(target + '.tmp', target)
+
+def sync_mirror(directory: str = MIRROR_DIR, source=None) -> list:
+    """
+    Mirror the files `fetch_version_metadata` and `fetch_registry_data` read.
+
+    These are the version index, the registry, and for each benchmark type the results
+    and latency files of the latest version that has both - the version the loader picks.
+    Newer versions without complete files are skipped, exactly as the loader skips them.
+
+    Args:
+        directory (str): Root of the mirror
+        source: Backend to mirror from, the remote sources if not given
+
+    Returns:
+        list: Paths of the mirrored files, relative to `directory`.
+        Returns None if the version index or the registry can not be fetched.
+    """
+    source = source or HTTPSource()
+    index = source.read(BENCHMARK_FILE)
+    registry = source.read(REGISTRY_FILE)
+    if index is None or registry is None:
+        return None
+
+    files = {BENCHMARK_FILE: index, REGISTRY_FILE: registry}
+    version_names = sort_versions([ver['version'] for ver in json.loads(index)['versions']])
+    for benchmark in ["multimodal", "text"]:
+        for version in select_benchmark_versions(benchmark, version_names):
+            paths = get_version_paths(version)
+            contents = [source.read(path) for path in paths]
+            if all(content is not None for content in contents):
+                files.update(zip(paths, contents))
+                break
+
+    for path, content in files.items():
+        write_mirror_file(directory, path, content)
+    return list(files)
+
 if __name__=="__main__":
-    fetch_version_metadata()
-    registry_data = fetch_registry_data()
-    print(registry_data[0])
+    parser = argparse.ArgumentParser(description="Fetch the source data, or mirror it for the local backend")
+    parser.add_argument('command', nargs='?', choices=['sync'], help="sync: mirror the remote sources into --mirror")
+    parser.add_argument('--mirror', default=MIRROR_DIR, help="Mirror directory")
+    args = parser.parse_args()
 
-    
\ No newline at end of file
+    if args.command == 'sync':
+        synced = sync_mirror(args.mirror)
+        if synced is None:
+            raise SystemExit("Sync failed, the version index or the registry could not be fetched")
+        print(f"Mirrored {len(synced)} files to {args.mirror}")
+    else:
+        *_, registry_data = fetch_all_data()
+        print(registry_data[0])
@@ -0,0 +1,191 @@
+"""
+Compact columnar representation of the merged leaderboard
+
+`merge_data` returns an object-heavy frame. The live leaderboard keeps a compact version of it:
+    - licenses as categoricals, the markdown license link is not stored
+    - the four modality flags packed into one uint8 bitfield
+    - the language list of a model as a packed bitset over the language codes of the snapshot,
+      rows with the same languages share one bytes object
+    - float32/int32 numerics and datetime64 release dates, the TEMP_DATE epochs are not stored
+
+`render` turns selected rows back into the columns of `merge_data`, so display values are only
+built for the rows being shown. A bitset does not keep the order of a language list, rendered
+languages are sorted by code - the same list of a model always renders the same way, whatever
+the order of its registry entry.
+"""
+
+import numpy as np
+import pandas as pd
+
+import assets.text_content as tc
+
+MODALITY_COLUMNS = [tc.SINGLE_IMG, tc.MULT_IMG, tc.AUDIO, tc.VIDEO]
+
+# df.attrs key holding the column order of `merge_data` and the language codes of the bitsets
+COMPACT_ATTR = 'compact'
+
+FLOAT_COLUMNS = [tc.LATENCY, tc.CLEMSCORE, tc.PARAMS, tc.INPUT, tc.OUTPUT, tc.DUMMY_PARAMS]
+CATEGORY_COLUMNS = [tc.LICENSE_NAME, tc.LICENSE_URL]
+DERIVED_COLUMNS = [tc.LICENSE, tc.TEMP_DATE] + MODALITY_COLUMNS
+
+
+def release_epochs(dates: pd.Series) -> pd.Series:
+    """
+    Convert release dates to epoch seconds (UTC midnight), as stored in TEMP_DATE.
+
+    Args:
+        dates (pd.Series): Date strings or datetime64 values, integer values are taken as epochs already
+
+    Returns:
+        pd.Series: Nullable Int64 epochs, <NA> where a date is missing or can not be parsed
+    """
+    if pd.api.types.is_integer_dtype(dates):
+        return dates.astype('Int64')
+    seconds = pd.to_datetime(dates, errors='coerce').to_numpy().astype('datetime64[s]')
+    epochs = pd.Series(seconds.astype(np.int64), index=dates.index, dtype='Int64')
+    epochs[np.isnat(seconds)] = pd.NA
+    return epochs
+
+
+def is_compact(df: pd.DataFrame) -> bool:
+    return COMPACT_ATTR in df.attrs
+
+
+def pack_languages(langs: pd.Series) -> tuple:
+    """
+    Pack per-model language lists into bitsets.
+
+    Args:
+        langs (pd.Series): Lists (or arrays) of language codes, None for unknown languages
+
+    Returns:
+        tuple[list, np.ndarray]: Sorted language codes, and an object array with one packed
+        bitset (bytes) per row - None where the languages are unknown
+    """
+    values = pd.Series(langs.to_numpy(), dtype=object)
+    exploded = values.explode().dropna()
+    codes = sorted(exploded.unique())
+    position = {code: i for i, code in enumerate(codes)}
+
+    matrix = np.zeros((len(values), len(codes)), dtype=bool)
+    matrix[exploded.index.to_numpy(), exploded.map(position).to_numpy(dtype=int)] = True
+    packed = np.packbits(matrix, axis=1)
+
+    # One bytes object per distinct language combination
+    combinations, inverse = np.unique(packed, axis=0, return_inverse=True)
+    bitsets = np.array([row.tobytes() for row in combinations] + [None], dtype=object)
+    inverse = inverse.reshape(-1)
+    inverse[values.isna().to_numpy()] = len(combinations)
+    return codes, bitsets[inverse]
+
+
+def language_matrix(df: pd.DataFrame, codes: list = None) -> tuple:
+    """
+    Unpack the language bitsets of a compact leaderboard.
+
+    Args:
+        df (pd.DataFrame): Rows of a compact leaderboard
+        codes (list): Language codes of the matrix columns, e.g. to compare two snapshots.
+            The codes of `df` if not given, codes `df` does not know are all False
+
+    Returns:
+        tuple[list, np.ndarray]: Language codes, and a rows x codes boolean matrix
+    """
+    own_codes = df.attrs[COMPACT_ATTR]['languages']
+    bitsets = df[tc.LANGS].to_numpy()
+    known = np.array([b is not None for b in bitsets], dtype=bool)
+
+    matrix = np.zeros((len(df), len(own_codes)), dtype=bool)
+    if known.any() and own_codes:
+        packed = np.frombuffer(b''.join(bitsets[known]), dtype=np.uint8).reshape(int(known.sum()), -1)
+        matrix[known] = np.unpackbits(packed, axis=1, count=len(own_codes)).astype(bool)
+
+    if codes is None or list(codes) == own_codes:
+        return own_codes, matrix
+    position = {code: i for i, code in enumerate(own_codes)}
+    recoded = np.zeros((len(df), len(codes)), dtype=bool)
+    for i, code in enumerate(codes):
+        if code in position:
+            recoded[:, i] = matrix[:, position[code]]
+    return list(codes), recoded
+
+
+def compact_leaderboard(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a merged leaderboard to its compact representation.
+
+    Args:
+        df (pd.DataFrame): Output of `merge_data` or `load_leaderboard`
+
+    Returns:
+        pd.DataFrame: Compact leaderboard with the same index and row order
+    """
+    columns = list(df.columns)
+    codes, bitsets = pack_languages(df[tc.LANGS])
+
+    modalities = np.zeros(len(df), dtype=np.uint8)
+    for bit, column in enumerate(MODALITY_COLUMNS):
+        modalities |= (df[column].to_numpy() == True).astype(np.uint8) << bit
+
+    compact = pd.DataFrame({
+        tc.MODEL_NAME: df[tc.MODEL_NAME],
+        **{col: df[col].astype(np.float32) for col in FLOAT_COLUMNS},
+        tc.RELEASE_DATE: pd.to_datetime(df[tc.RELEASE_DATE], errors='coerce'),
+        tc.OPEN_WEIGHT: df[tc.OPEN_WEIGHT].astype(bool),
+        tc.LANGS: pd.Series(bitsets, index=df.index, dtype=object),
+        tc.CONTEXT: df[tc.CONTEXT].astype(np.int32),
+        **{col: df[col].astype('category') for col in CATEGORY_COLUMNS},
+        tc.MODALITIES: pd.Series(modalities, index=df.index),
+    }, index=df.index)
+
+    compact.attrs = {**df.attrs, COMPACT_ATTR: {'columns': columns, 'languages': codes}}
+    return compact
+
+
+def leaderboard_columns(df: pd.DataFrame) -> list:
+    """Columns `render` can produce for a compact leaderboard, in the order of `merge_data`."""
+    return list(df.attrs[COMPACT_ATTR]['columns'])
+
+
+def widen(values: pd.Series) -> pd.Series:
+    """Convert float32 values to the float64 with the same shortest decimal, e.g. 9.15 and not 9.1499996."""
+    return values.astype(str).astype(np.float64)
+
+
+def render(df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    Build the display columns of selected rows of a compact leaderboard.
+
+    Args:
+        df (pd.DataFrame): Rows of a compact leaderboard
+        columns (list): Columns of `merge_data` to build, all of them if not given
+
+    Returns:
+        pd.DataFrame: The rows with the requested columns, values as `merge_data` returns them -
+        except for the language lists, which are sorted by language code
+    """
+    columns = columns or leaderboard_columns(df)
+    rendered = {}
+
+    for column in columns:
+        if column in FLOAT_COLUMNS:
+            rendered[column] = widen(df[column])
+        elif column in CATEGORY_COLUMNS:
+            rendered[column] = df[column].astype(object)
+        elif column == tc.RELEASE_DATE:
+            rendered[column] = df[tc.RELEASE_DATE].dt.strftime('%Y-%m-%d')
+        elif column == tc.TEMP_DATE:
+            rendered[column] = release_epochs(df[tc.RELEASE_DATE])
+        elif column == tc.LICENSE:
+            rendered[column] = '[' + df[tc.LICENSE_NAME].astype(str) + '](' + df[tc.LICENSE_URL].astype(str) + ')'
+        elif column in MODALITY_COLUMNS:
+            bit = MODALITY_COLUMNS.index(column)
+            rendered[column] = (df[tc.MODALITIES].to_numpy() >> bit) & 1 == 1
+        elif column == tc.LANGS:
+            codes, matrix = language_matrix(df)
+            langs = [[codes[i] for i in np.flatnonzero(row)] for row in matrix]
+            rendered[column] = [l if b is not None else None for l, b in zip(langs, df[tc.LANGS])]
+        else:
+            rendered[column] = df[column]
+
+    return pd.DataFrame(rendered, index=df.index, columns=columns)
@@ -0,0 +1,87 @@
+"""
+Workload cost engine
+
+Prices from pricing.json are given per 1M input/output tokens. For a set of workload
+profiles (input tokens and output tokens per request, number of requests) the cost of
+every model is computed as one broadcasted models x workloads matrix.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.process_data import PRICING_PATH, clean_price
+import assets.text_content as tc
+
+WORKLOAD_COLUMNS = [tc.WORKLOAD_NAME, tc.WORKLOAD_INPUT, tc.WORKLOAD_OUTPUT, tc.WORKLOAD_REQUESTS]
+
+
+def load_priced_models(path: str = PRICING_PATH) -> set:
+    """Return the model ids that have an input and an output price in pricing.json."""
+    with open(path, 'r') as f:
+        pricing_df = pd.DataFrame(json.load(f))
+    priced = clean_price(pricing_df['input']).notna() & clean_price(pricing_df['output']).notna()
+    return set(pricing_df.loc[priced, 'model_id'])
+
+
+def to_workloads(workloads) -> pd.DataFrame:
+    """
+    Convert workload profiles to a DataFrame with WORKLOAD_COLUMNS.
+
+    Args:
+        workloads: DataFrame with WORKLOAD_COLUMNS, or a list of dicts/tuples in that order
+
+    Returns:
+        pd.DataFrame: One row per workload, token and request counts as floats.
+        Rows without a name or with missing counts are dropped.
+    """
+    if not isinstance(workloads, pd.DataFrame):
+        rows = list(workloads)
+        if rows and isinstance(rows[0], dict):
+            workloads = pd.DataFrame(rows)
+        else:
+            workloads = pd.DataFrame(rows, columns=WORKLOAD_COLUMNS)
+    workloads = workloads.reindex(columns=WORKLOAD_COLUMNS)
+
+    counts = WORKLOAD_COLUMNS[1:]
+    workloads[counts] = workloads[counts].apply(pd.to_numeric, errors='coerce')
+    workloads[tc.WORKLOAD_NAME] = workloads[tc.WORKLOAD_NAME].fillna('').astype(str).str.strip()
+    valid = workloads[counts].notna().all(axis=1) & (workloads[tc.WORKLOAD_NAME] != '')
+    return workloads[valid].reset_index(drop=True)
+
+
+def workload_cost_matrix(df: pd.DataFrame, workloads, priced_models: set = None) -> pd.DataFrame:
+    """
+    Compute the cost of every model for every workload in one broadcasted operation.
+
+    cost = requests * (input_tokens * input_price + output_tokens * output_price) / 1M
+
+    Args:
+        df (pd.DataFrame): Leaderboard with MODEL_NAME, INPUT and OUTPUT columns
+        workloads: Workload profiles, see `to_workloads`
+        priced_models (set): Models with a known price, others get NaN instead of a
+            cost of 0. Defaults to the models listed in pricing.json
+
+    Returns:
+        pd.DataFrame: Cost in $ with one row per model (indexed by MODEL_NAME) and
+        one column per workload
+    """
+    workloads = to_workloads(workloads)
+    if priced_models is None:
+        priced_models = load_priced_models()
+
+    # (models, 1) prices against (1, workloads) token counts
+    input_prices = df[tc.INPUT].to_numpy(dtype=float)[:, None]
+    output_prices = df[tc.OUTPUT].to_numpy(dtype=float)[:, None]
+    input_tokens = workloads[tc.WORKLOAD_INPUT].to_numpy(dtype=float)[None, :]
+    output_tokens = workloads[tc.WORKLOAD_OUTPUT].to_numpy(dtype=float)[None, :]
+    requests = workloads[tc.WORKLOAD_REQUESTS].to_numpy(dtype=float)[None, :]
+
+    costs = requests * (input_tokens * input_prices + output_tokens * output_prices) / 1e6
+
+    unpriced = ~df[tc.MODEL_NAME].isin(priced_models).to_numpy()
+    costs[unpriced, :] = np.nan
+
+    return pd.DataFrame(costs, index=pd.Index(df[tc.MODEL_NAME], name=tc.MODEL_NAME),
+                        columns=workloads[tc.WORKLOAD_NAME])
@@ -0,0 +1,145 @@
+"""
+Export and import of the merged leaderboard for other consumers
+
+    python -m src.export leaderboard.arrow
+    python -m src.export leaderboard.parquet --rebuild
+    python -m src.export leaderboard.arrow --info
+
+An export holds every column of `merge_data`, derived columns included, with the snapshot
+metadata (snapshot id, format version, source fingerprints and facets) in the schema metadata
+under the same key as the snapshot. Arrow IPC files are written uncompressed, so readers
+memory-map them and use the columns in place. Parquet files are smaller but are decoded on
+read, the file itself is still memory-mapped instead of read into a buffer.
+"""
+
+import argparse
+import datetime
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.facets import get_facets
+from src.snapshot import SNAPSHOT_META_KEY, load_leaderboard
+import assets.text_content as tc
+
+EXPORT_FORMATS = {'.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow', '.parquet': 'parquet'}
+
+
+def export_format(path: str, format: str = None) -> str:
+    """
+    Resolve the format of an export, 'arrow' or 'parquet', from `format` or the file extension.
+
+    Raises:
+        ValueError: If neither names a known format
+    """
+    format = format or EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if format not in ('arrow', 'parquet'):
+        raise ValueError(f"Unknown export format for {path}, use one of {sorted(EXPORT_FORMATS)} or pass the format")
+    return format
+
+
+def export_leaderboard(df: pd.DataFrame, path: str, format: str = None) -> dict:
+    """
+    Write the merged leaderboard and its metadata as Arrow IPC or Parquet file.
+
+    The file is written next to the target and moved into place, like `snapshot.save_snapshot`.
+
+    Args:
+        df (pd.DataFrame): Output of `merge_data` or `load_leaderboard`
+        path (str): Target file
+        format (str): 'arrow' or 'parquet', taken from the extension of `path` if not given
+
+    Returns:
+        dict: Metadata stored with the export
+    """
+    format = export_format(path, format)
+    snapshot = df.attrs.get('snapshot') or {}
+    meta = {
+        **snapshot,
+        'version': snapshot.get('version', tc.SNAPSHOT_VERSION),
+        'rows': len(df),
+        'facets': snapshot.get('facets') or get_facets(df),
+        'exported_at': datetime.datetime.now().isoformat(),
+        'format': format,
+    }
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[SNAPSHOT_META_KEY] = json.dumps(meta, default=str).encode()
+    table = table.replace_schema_metadata(schema_metadata)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if format == 'arrow':
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+    return meta
+
+
+def read_export(path: str, format: str = None) -> pa.Table:
+    """
+    Open an export as Arrow table, memory-mapped.
+
+    The buffers of an Arrow IPC export point into the mapped file, nothing is copied until
+    a column is converted.
+
+    Args:
+        path (str): File written by `export_leaderboard`, or a snapshot
+        format (str): 'arrow' or 'parquet', taken from the extension of `path` if not given
+    """
+    if export_format(path, format) == 'arrow':
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return pq.read_table(path, memory_map=True)
+
+
+def read_export_meta(path: str, format: str = None) -> dict:
+    """Read the metadata of an export without loading the table."""
+    if export_format(path, format) == 'arrow':
+        schema = pa.ipc.open_file(pa.memory_map(path, 'r')).schema
+    else:
+        schema = pq.read_schema(path, memory_map=True)
+    return json.loads((schema.metadata or {})[SNAPSHOT_META_KEY])
+
+
+def import_leaderboard(path: str, format: str = None) -> pd.DataFrame:
+    """
+    Load an export as merged leaderboard.
+
+    Returns:
+        pd.DataFrame: The leaderboard as `merge_data` returns it, with the export metadata in
+        `df.attrs['snapshot']` - ready for `leaderboard.build_state`
+    """
+    table = read_export(path, format)
+    df = table.to_pandas()
+    # Arrow list columns come back as numpy arrays, `merge_data` holds lists
+    df[tc.LANGS] = df[tc.LANGS].map(lambda langs: list(langs) if langs is not None else None)
+    df.attrs['snapshot'] = json.loads(table.schema.metadata[SNAPSHOT_META_KEY])
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the merged leaderboard as Arrow IPC or Parquet file")
+    parser.add_argument('path', help="Target file, .arrow/.feather/.ipc or .parquet")
+    parser.add_argument('--format', choices=['arrow', 'parquet'], help="Overrides the format of the file extension")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the snapshot from the sources first")
+    parser.add_argument('--check-remote', action='store_true', help="Rebuild if a remote source changed")
+    parser.add_argument('--info', action='store_true', help="Print the metadata of an existing export instead")
+    args = parser.parse_args()
+
+    try:
+        if args.info:
+            meta = read_export_meta(args.path, args.format)
+            print(json.dumps({k: v for k, v in meta.items() if k != 'facets'}, indent=2))
+        else:
+            df = load_leaderboard(rebuild=args.rebuild, check_remote=args.check_remote)
+            meta = export_leaderboard(df, args.path, args.format)
+            print(f"Exported {meta['rows']} models of snapshot {meta.get('snapshot_id')} to {args.path}")
+    except (ValueError, OSError, KeyError, pa.ArrowException) as e:
+        raise SystemExit(f"Error: {e}")
@@ -0,0 +1,61 @@
+"""
+Filter choices and slider bounds of a leaderboard
+
+Extracted in one vectorized pass over the merged leaderboard. The facets are stored in the
+snapshot metadata when a snapshot is written, so a start from the local snapshot reads them
+back instead of scanning the leaderboard again.
+"""
+
+import pandas as pd
+
+from src.languages import language_name
+import assets.text_content as tc
+
+
+def get_facets(df: pd.DataFrame) -> dict:
+    """
+    Extract the filter choices and slider bounds of a leaderboard.
+
+    Args:
+        df (pd.DataFrame): Output of `merge_data` or `load_leaderboard`
+
+    Returns:
+        dict: Language choices as (name, code) pairs, license choices, and the bounds of
+        the price, latency, parameter, context and release date ranges
+    """
+    codes = df[tc.LANGS].dropna().explode().dropna().unique()
+
+    # Commercial models have no parameter count, the lower bound is then 0
+    min_parameters = df[tc.PARAMS].min(skipna=False)
+
+    # Get max parameter size of the open models, ignoring NaN values
+    open_params = df.loc[df[tc.OPEN_WEIGHT] == True, tc.PARAMS].dropna()
+
+    return {
+        'langs': sorted((language_name(code), code) for code in codes),
+        'licenses': sorted(df[tc.LICENSE_NAME].unique()),
+        'max_input_price': float(df[tc.INPUT].max()),
+        'max_output_price': float(df[tc.OUTPUT].max()),
+        # At the precision of the displayed latencies
+        'max_latency': round(float(df[tc.LATENCY].max()), 1),
+        'min_parameters': 0 if pd.isna(min_parameters) else float(min_parameters),
+        'max_parameter': float(open_params.max()) if not open_params.empty else 0,
+        'min_context': int(df[tc.CONTEXT].min()),
+        'max_context': int(df[tc.CONTEXT].max()),
+        'min_date': df[tc.RELEASE_DATE].min(),
+        'max_date': df[tc.RELEASE_DATE].max(),
+    }
+
+
+def load_facets(meta: dict) -> dict:
+    """
+    Read the facets stored in snapshot metadata.
+
+    Returns:
+        dict: The facets as returned by `get_facets`.
+        Returns None if the snapshot was written without them.
+    """
+    facets = (meta or {}).get('facets')
+    if facets is None:
+        return None
+    return {**facets, 'langs': [tuple(lang) for lang in facets['langs']]}
@@ -0,0 +1,132 @@
+"""
+Bounded LRU cache of filter results
+
+Many sessions filter with the same default or near-default selection. Results are cached
+per snapshot under a canonical form of the filter state, so equivalent selections (same
+languages in a different order, empty date dropdowns vs. their defaults) share one entry.
+The canonical state is also what gets filtered, so it keeps the exact slider bounds.
+"""
+
+import threading
+from collections import OrderedDict
+
+from src.filter_utils import get_date_range
+import assets.text_content as tc
+
+
+def range_bounds(value_range) -> tuple:
+    """Return a slider range as (low, high) floats, the bounds are kept exactly as selected."""
+    low, high = value_range
+    return float(low), float(high)
+
+
+def normalize_filter_state(language_list, parameters, input_price, output_price, multimodal,
+                           context, open_weight, start_year, start_month, end_year, end_month,
+                           license) -> tuple:
+    """
+    Canonicalize the arguments of `filter_utils.filter`.
+
+    Returns:
+        tuple: Hashable filter state in the argument order of `FilterIndex.select`
+    """
+    try:
+        date_range = get_date_range(start_year, start_month, end_year, end_month)
+    except (ValueError, TypeError) as e:
+        print(f"Error processing dates: {e}")
+        date_range = None
+
+    return (
+        tuple(sorted(set(language_list))),
+        range_bounds(parameters),
+        range_bounds(input_price),
+        range_bounds(output_price),
+        tuple(sorted(set(multimodal))),
+        range_bounds(context),
+        tuple(sorted(set(open_weight))),
+        date_range,
+        tuple(sorted(set(license))),
+    )
+
+
+class FilterCache:
+    """
+    Thread-safe LRU cache of filter results, keyed on (snapshot id, canonical filter state).
+
+    Args:
+        maxsize (int): Number of results kept before the least recently used one is evicted
+    """
+
+    def __init__(self, maxsize: int = tc.FILTER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, snapshot_id: str = None) -> None:
+        """Drop the entries of a snapshot, or every entry if no snapshot is given."""
+        with self._lock:
+            if snapshot_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == snapshot_id]:
+                del self._entries[key]
+
+    def carry_over(self, old_id: str, new_id: str, keep, convert=None) -> int:
+        """
+        Reuse the entries of a snapshot for its successor.
+
+        Args:
+            old_id (str): Snapshot the entries were computed for
+            new_id (str): Snapshot they are copied to
+            keep (Callable): Called with the key of an entry without the snapshot id - the canonical
+                filter state, then the rest of the key. True if the result is the same in both snapshots
+            convert (Callable): Applied to every carried result, e.g. to relabel its rows.
+                Results are carried as they are if not given
+
+        Returns:
+            int: Number of entries carried over
+        """
+        with self._lock:
+            entries = [(key, value) for key, value in self._entries.items() if key[0] == old_id]
+
+        carried = 0
+        for key, value in entries:
+            if keep(*key[1:]):
+                self.put((new_id, *key[1:]), convert(value) if convert else value)
+                carried += 1
+        return carried
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+filter_cache = FilterCache()
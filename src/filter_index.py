@@ -0,0 +1,420 @@
+"""
+Precomputed filter index over a leaderboard snapshot
+
+Built once per snapshot, the index holds a packed bitset (np.packbits) per value of the
+categorical filters and a sorted array per range filter. Any combination of filters then
+resolves to a few bitwise ANDs and binary searches instead of a chain of DataFrame masks, and
+the number of models behind each filter choice to a popcount of the same bitsets.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.compact import MODALITY_COLUMNS, language_matrix, release_epochs, widen
+from src.metrics import timed
+import assets.text_content as tc
+
+
+# Number of set bits of every byte value
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def to_bitset(mask) -> np.ndarray:
+    """Pack a boolean row mask into a bitset."""
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+def bits_at(bitset: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Return the bits of a bitset at the given row positions, as booleans."""
+    return (bitset[rows >> 3] >> (7 - (rows & 7))) & 1 == 1
+
+
+def count_each(bitsets: dict, within: np.ndarray) -> dict:
+    """Count the rows of the bitset `within` in each of `bitsets`."""
+    if not bitsets:
+        return {}
+    counts = POPCOUNT[np.stack(list(bitsets.values())) & within].sum(axis=1)
+    return dict(zip(bitsets, counts.tolist()))
+
+
+def moved_rows(old_rows: np.ndarray, stale: np.ndarray, n_old: int) -> np.ndarray:
+    """
+    Invert a row matching, see `FilterIndex.splice`.
+
+    Args:
+        old_rows (np.ndarray): Old position of every new row, -1 for rows without one
+        stale (np.ndarray): Boolean mask over the new rows that are indexed again
+        n_old (int): Number of old rows
+
+    Returns:
+        np.ndarray: New position of every old row, -1 for rows that were removed or are indexed again
+    """
+    new_rows = np.full(n_old, -1, dtype=np.int64)
+    kept = np.flatnonzero(~stale & (old_rows >= 0))
+    new_rows[old_rows[kept]] = kept
+    return new_rows
+
+
+def insert_sorted(keys: list, fresh: list) -> list:
+    """
+    Insert entries into arrays sorted lexicographically, without sorting the arrays again.
+
+    Args:
+        keys (list): Arrays of equal length without NaN, sorted by the first, ties by the second and so on
+        fresh (list): Arrays of the entries to insert, one per key
+
+    Returns:
+        list: The arrays with the entries inserted, sorted the same way
+    """
+    dtype = np.dtype([(f'k{i}', key.dtype) for i, key in enumerate(keys)])
+
+    def records(arrays):
+        rows = np.empty(len(arrays[0]), dtype=dtype)
+        for i, values in enumerate(arrays):
+            rows[f'k{i}'] = values
+        return rows
+
+    # Structured arrays compare field by field, the positions come from one binary search per entry
+    entries = np.sort(records(fresh))
+    positions = np.searchsorted(records(keys), entries)
+    return [np.insert(key, positions, entries[f'k{i}']) for i, key in enumerate(keys)]
+
+
+class SortedColumn:
+    """Sorted values of a numeric column, with the row position of each value. NaN rows are left out."""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        rows = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[rows], kind='stable')
+        self.values = values[rows][order]
+        self.rows = rows[order]
+
+    @classmethod
+    def from_sorted(cls, values: np.ndarray, rows: np.ndarray) -> 'SortedColumn':
+        """Wrap values and row positions that are already sorted, e.g. arrays of a shared segment."""
+        column = cls.__new__(cls)
+        column.values = values
+        column.rows = rows
+        return column
+
+    def splice(self, new_rows: np.ndarray, fresh: np.ndarray, values: np.ndarray) -> 'SortedColumn':
+        """
+        Move the rows of the column to new positions and insert new values.
+
+        Args:
+            new_rows (np.ndarray): New position of every old row, -1 for rows to drop, see `moved_rows`
+            fresh (np.ndarray): New positions of the rows to insert
+            values (np.ndarray): Values of the inserted rows, NaN values are left out
+
+        Returns:
+            SortedColumn: The column over the new rows, sorted like a newly built one
+        """
+        rows = new_rows[self.rows]
+        keep = rows >= 0
+        present = ~np.isnan(values)
+        merged_values, merged_rows = insert_sorted([self.values[keep], rows[keep]],
+                                                   [values[present].astype(float), fresh[present]])
+        return SortedColumn.from_sorted(merged_values, merged_rows)
+
+    def between(self, low, high, n_rows: int) -> np.ndarray:
+        """Return the bitset of rows with low <= value <= high."""
+        start = np.searchsorted(self.values, low, side='left')
+        end = np.searchsorted(self.values, high, side='right')
+        mask = np.zeros(n_rows, dtype=bool)
+        mask[self.rows[start:end]] = True
+        return to_bitset(mask)
+
+
+# Columns of the range filters, in the argument order of `select`
+RANGE_COLUMNS = [tc.DUMMY_PARAMS, tc.INPUT, tc.OUTPUT, tc.CONTEXT]
+
+
+def range_column(df: pd.DataFrame, column: str) -> SortedColumn:
+    """
+    Sort the values of a range filter column.
+
+    Prices and parameters are compared with the decimals the sliders show, not the float32 approximations.
+    """
+    return SortedColumn(df[column] if column == tc.CONTEXT else widen(df[column]))
+
+
+class FilterIndex:
+    """
+    Bitsets and sorted arrays over the rows of a leaderboard, in the row order of `df`.
+
+    Args:
+        df (pd.DataFrame): The compact leaderboard, see `compact_leaderboard`
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.n_rows = len(df)
+        self.all_rows = to_bitset(np.ones(self.n_rows, dtype=bool))
+        self.no_rows = to_bitset(np.zeros(self.n_rows, dtype=bool))
+
+        # The language bitsets of the rows, transposed to one bitset per language code
+        codes, matrix = language_matrix(df)
+        self.languages = {code: to_bitset(matrix[:, i]) for i, code in enumerate(codes)}
+
+        self.licenses = self._value_bitsets(df[tc.LICENSE_NAME].to_numpy(), np.arange(self.n_rows))
+
+        modalities = df[tc.MODALITIES].to_numpy()
+        self.modalities = {col: to_bitset((modalities >> bit) & 1 == 1) for bit, col in enumerate(MODALITY_COLUMNS)}
+        self.modalities[tc.TEXT] = to_bitset(modalities == 0)
+
+        open_weight = df[tc.OPEN_WEIGHT].to_numpy()
+        self.model_types = {
+            tc.OPEN: to_bitset(open_weight == True),
+            tc.COMM: to_bitset(open_weight == False),
+        }
+
+        self.ranges = {column: range_column(df, column) for column in RANGE_COLUMNS}
+
+        # Release dates as epoch seconds - Dates that can not be converted disable the date filter
+        epochs = release_epochs(df[tc.RELEASE_DATE])
+        if epochs.isna().any():
+            print("Error processing dates: Missing release date")
+            self.dates = None
+        else:
+            self.dates = SortedColumn(epochs.to_numpy(dtype=np.int64))
+
+    @classmethod
+    def restore(cls, df: pd.DataFrame, bitsets: dict, ranges: dict, dates: SortedColumn = None) -> 'FilterIndex':
+        """
+        Rebuild an index from its arrays without scanning `df`, see `shared.read_segment`.
+
+        Args:
+            df (pd.DataFrame): The compact leaderboard the arrays were built from
+            bitsets (dict): Bitsets by value for 'languages', 'licenses', 'modalities' and 'model_types'
+            ranges (dict): SortedColumn per range column
+            dates (SortedColumn): Release date epochs, None if the date filter is disabled
+
+        Returns:
+            FilterIndex: The index, sharing the given arrays
+        """
+        index = cls.__new__(cls)
+        index.df = df
+        index.n_rows = len(df)
+        index.all_rows = to_bitset(np.ones(index.n_rows, dtype=bool))
+        index.no_rows = to_bitset(np.zeros(index.n_rows, dtype=bool))
+        index.languages = bitsets['languages']
+        index.licenses = bitsets['licenses']
+        index.modalities = bitsets['modalities']
+        index.model_types = bitsets['model_types']
+        index.ranges = ranges
+        index.dates = dates
+        return index
+
+    def splice(self, df: pd.DataFrame, old_rows: np.ndarray, changed: dict) -> 'FilterIndex':
+        """
+        Index a refreshed leaderboard that shares rows with the indexed one.
+
+        Bits and sorted values of the shared rows are moved to their new positions, only added
+        rows and the changed values of shared rows are indexed again. Arrays that no row
+        changed are shared with this index.
+
+        Args:
+            df (pd.DataFrame): The compact leaderboard
+            old_rows (np.ndarray): Position in `self.df` of every row of `df`, -1 for rows to index
+                as a whole. Matched rows must be in the same relative order as in `self.df`
+            changed (dict): Boolean mask over the rows of `df` per column, True where the value
+                differs from the matched row
+
+        Returns:
+            FilterIndex: The index of `df`, equal to `FilterIndex(df)`
+        """
+        n_rows = len(df)
+        added = old_rows < 0
+        unmoved = n_rows == self.n_rows and not added.any() and np.array_equal(old_rows, np.arange(n_rows))
+
+        def stale(*columns):
+            return np.logical_or.reduce([added, *[changed[column] for column in columns]])
+
+        # Bitsets - every bitset is rebuilt from the moved bits and the bits of the stale rows
+        rows = stale(tc.LANGS, tc.LICENSE_NAME, tc.MODALITIES, tc.OPEN_WEIGHT)
+        if unmoved and not rows.any():
+            bitsets = {'languages': self.languages, 'licenses': self.licenses,
+                       'modalities': self.modalities, 'model_types': self.model_types}
+        else:
+            kept, fresh = np.flatnonzero(~rows), np.flatnonzero(rows)
+            source = old_rows[kept]
+            fresh_df = df.iloc[fresh]
+
+            def spliced(bitset, fresh_bits):
+                bits = np.zeros(n_rows, dtype=bool)
+                if bitset is not None:
+                    bits[kept] = np.unpackbits(bitset, count=self.n_rows).astype(bool)[source]
+                bits[fresh] = fresh_bits
+                return to_bitset(bits)
+
+            codes, matrix = language_matrix(fresh_df)
+            licenses = fresh_df[tc.LICENSE_NAME].to_numpy()
+            modalities = fresh_df[tc.MODALITIES].to_numpy()
+            open_weight = fresh_df[tc.OPEN_WEIGHT].to_numpy()
+            bitsets = {
+                'languages': {code: spliced(self.languages.get(code), matrix[:, i]) for i, code in enumerate(codes)},
+                'licenses': {value: spliced(self.licenses.get(value), licenses == value)
+                             for value in pd.unique(df[tc.LICENSE_NAME].to_numpy()) if not pd.isna(value)},
+                'modalities': {
+                    **{col: spliced(self.modalities[col], (modalities >> bit) & 1 == 1)
+                       for bit, col in enumerate(MODALITY_COLUMNS)},
+                    tc.TEXT: spliced(self.modalities[tc.TEXT], modalities == 0),
+                },
+                'model_types': {
+                    tc.OPEN: spliced(self.model_types[tc.OPEN], open_weight == True),
+                    tc.COMM: spliced(self.model_types[tc.COMM], open_weight == False),
+                },
+            }
+
+        ranges = {}
+        for column, sorted_column in self.ranges.items():
+            rows = stale(column)
+            if unmoved and not rows.any():
+                ranges[column] = sorted_column
+                continue
+            fresh = np.flatnonzero(rows)
+            values = df[column].iloc[fresh]
+            values = values if column == tc.CONTEXT else widen(values)
+            ranges[column] = sorted_column.splice(moved_rows(old_rows, rows, self.n_rows), fresh,
+                                                  values.to_numpy(dtype=float))
+
+        rows = stale(tc.RELEASE_DATE)
+        if unmoved and not rows.any():
+            dates = self.dates
+        elif df[tc.RELEASE_DATE].isna().any():
+            print("Error processing dates: Missing release date")
+            dates = None
+        elif self.dates is None:
+            dates = SortedColumn(release_epochs(df[tc.RELEASE_DATE]).to_numpy(dtype=np.int64))
+        else:
+            fresh = np.flatnonzero(rows)
+            epochs = release_epochs(df[tc.RELEASE_DATE].iloc[fresh]).to_numpy(dtype=np.int64)
+            dates = self.dates.splice(moved_rows(old_rows, rows, self.n_rows), fresh, epochs.astype(float))
+
+        return FilterIndex.restore(df, bitsets, ranges, dates)
+
+    def _value_bitsets(self, values: np.ndarray, positions: np.ndarray) -> dict:
+        """Build one bitset per distinct value, `positions` gives the row of each value."""
+        bitsets = {}
+        for value in pd.unique(values):
+            if pd.isna(value):
+                continue
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[positions[values == value]] = True
+            bitsets[value] = to_bitset(mask)
+        return bitsets
+
+    def all_of(self, bitsets: dict, values) -> np.ndarray:
+        """Rows that have every one of `values`."""
+        bits = self.all_rows
+        for value in values:
+            bits = bits & bitsets.get(value, self.no_rows)
+        return bits
+
+    def any_of(self, bitsets: dict, values) -> np.ndarray:
+        """Rows that have at least one of `values`."""
+        bits = self.no_rows
+        for value in values:
+            bits = bits | bitsets.get(value, self.no_rows)
+        return bits
+
+    def masks(self, language_list, parameters, input_price, output_price, multimodal,
+              context, open_weight, date_range, license) -> dict:
+        """
+        Resolve each filter of a filter state to the bitset of the rows it lets through.
+
+        Arguments follow `select`.
+
+        Returns:
+            dict: Bitset per filter - languages, parameters, input_price, output_price,
+            modalities, context, model_types, licenses and dates
+        """
+        masks = {}
+        # One stage per mask, timed as filter.<mask name>
+        with timed('filter.languages'):
+            masks['languages'] = self.all_of(self.languages, language_list)
+
+        ranges = {
+            'parameters': (tc.DUMMY_PARAMS, parameters),
+            'input_price': (tc.INPUT, input_price),
+            'output_price': (tc.OUTPUT, output_price),
+            'context': (tc.CONTEXT, context),
+        }
+        for name, (column, (low, high)) in ranges.items():
+            with timed(f'filter.{name}'):
+                masks[name] = self.ranges[column].between(low, high, self.n_rows)
+
+        with timed('filter.modalities'):
+            masks['modalities'] = self.all_of(self.modalities, multimodal)
+
+        with timed('filter.model_types'):
+            # Both or none of the model types selected - no filter or no rows
+            if (tc.OPEN in open_weight) != (tc.COMM in open_weight):
+                masks['model_types'] = self.any_of(self.model_types, open_weight)
+            elif tc.OPEN not in open_weight:
+                masks['model_types'] = self.no_rows
+            else:
+                masks['model_types'] = self.all_rows
+
+        with timed('filter.licenses'):
+            masks['licenses'] = self.any_of(self.licenses, license)
+
+        masks['dates'] = self.all_rows
+        if date_range is not None and self.dates is not None:
+            with timed('filter.dates'):
+                masks['dates'] = self.dates.between(date_range[0], date_range[1], self.n_rows)
+        return masks
+
+    def select(self, language_list, parameters, input_price, output_price, multimodal,
+               context, open_weight, date_range, license) -> np.ndarray:
+        """
+        Resolve a filter state to the matching rows.
+
+        Arguments follow `filter_utils.filter`, with the release date given as a
+        (start, end) tuple of epoch seconds or None to skip the date filter.
+
+        Returns:
+            np.ndarray: Positions of the matching rows, in the row order of `df`
+        """
+        return self.rows_of(self.masks(language_list, parameters, input_price, output_price, multimodal,
+                                       context, open_weight, date_range, license))
+
+    def rows_of(self, masks: dict) -> np.ndarray:
+        """Return the positions of the rows matching every bitset of `masks`, see `masks`."""
+        bits = np.bitwise_and.reduce(list(masks.values()))
+
+        with timed('filter.rows') as sizes:
+            rows = np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+            sizes['rows'] = len(rows)
+        return rows
+
+    def facet_counts(self, language_list, parameters, input_price, output_price, multimodal,
+                     context, open_weight, date_range, license) -> dict:
+        """
+        Count the models each choice of the categorical filters would leave.
+
+        Languages and modalities are combined with AND, their counts are the models matching the
+        current selection with that value added. Licenses and model types are combined with OR,
+        their counts are the models with that value that match every other filter.
+        Arguments follow `select`.
+
+        Returns:
+            dict: Count per value for 'languages', 'modalities', 'licenses' and 'model_types'
+        """
+        return self.counts_of(self.masks(language_list, parameters, input_price, output_price, multimodal,
+                                         context, open_weight, date_range, license))
+
+    def counts_of(self, masks: dict) -> dict:
+        """Count the models behind each filter choice from the bitsets of `masks`, see `facet_counts`."""
+        def matching(*excluded):
+            return np.bitwise_and.reduce([bits for name, bits in masks.items() if name not in excluded])
+
+        with timed('filter.facet_counts'):
+            selected = matching()
+            return {
+                'languages': count_each(self.languages, selected),
+                'modalities': count_each(self.modalities, selected),
+                'licenses': count_each(self.licenses, matching('licenses')),
+                'model_types': count_each(self.model_types, matching('model_types')),
+            }
@@ -1,16 +1,19 @@
 # Utility functions for filtering the dataframe
 
+import numpy as np
 import pandas as pd
 import assets.text_content as tc
 import calendar
 from typing import Union, List
 from datetime import datetime
 
-current_year = str(datetime.now().year)
+from src.compact import compact_leaderboard, is_compact, release_epochs, render
+from src.filter_index import FilterIndex, SortedColumn
+from src.metrics import timed
 
-def filter_cols(df):
+current_year = str(datetime.now().year)
 
-    df = df[[
+DISPLAY_COLUMNS = [
     tc.MODEL_NAME, 
     tc.CLEMSCORE,
     tc.INPUT, 
@@ -20,23 +23,22 @@ def filter_cols(df):
     tc.PARAMS,
     tc.RELEASE_DATE, 
     tc.LICENSE
-    ]]
+    ]
+
+def filter_cols(df):
+
+    df = df[DISPLAY_COLUMNS]
     
     return df
 
 
-def convert_date_components_to_timestamp(year: str, month: str) -> int:
-    """Convert year and month strings to timestamp."""
-    # Create a datetime object for the first day of the month
-    date_str = f"{year}-{month:02d}-01"
-    return int(pd.to_datetime(date_str).timestamp())
+def convert_date_components_to_timestamp(year: int, month: int) -> int:
+    """Convert year and month to the timestamp of the first day of the month (UTC midnight)."""
+    return calendar.timegm((year, month, 1, 0, 0, 0))
 
-def filter_by_date(df: pd.DataFrame, 
-                  start_year, start_month,
-                  end_year, end_month,
-                  date_column: str = tc.RELEASE_DATE) -> pd.DataFrame:
+def get_date_range(start_year, start_month, end_year, end_month) -> tuple:
     """
-    Filter DataFrame by date range using separate year and month components.
+    Resolve the release date selection to a (start, end) tuple of epoch seconds.
     """
     # All lists are passed at once, so set default values here instead of passing them in args- Overwritten by empty lists
     if not start_year:
@@ -49,26 +51,49 @@ def filter_by_date(df: pd.DataFrame,
     if not end_month:
         end_month = "December"
 
+    # Convert string inputs to integers for date creation
+    start_timestamp = convert_date_components_to_timestamp(
+        int(start_year), 
+        int(tc.MONTH_MAP[start_month])
+    )
+    
+    end_timestamp = convert_date_components_to_timestamp(
+        int(end_year), 
+        int(tc.MONTH_MAP[end_month])
+    )
+    return start_timestamp, end_timestamp
+
+def filter_by_date(df: pd.DataFrame, 
+                  start_year, start_month,
+                  end_year, end_month,
+                  date_column: str = tc.RELEASE_DATE,
+                  index: FilterIndex = None) -> pd.DataFrame:
+    """
+    Filter DataFrame by date range using separate year and month components.
+
+    The range is resolved by a binary search over the presorted release dates of a FilterIndex,
+    pass the prebuilt index of `df` as `index` to reuse its date column. Otherwise the dates are
+    sorted once for this call - the release dates of `merge_data` from the epochs precomputed in
+    TEMP_DATE, other date columns are converted with `release_epochs` first.
+    """
     try:
-        # Convert string inputs to integers for date creation
-        start_timestamp = convert_date_components_to_timestamp(
-            int(start_year), 
-            int(tc.MONTH_MAP[start_month])
-        )
-        
-        end_timestamp = convert_date_components_to_timestamp(
-            int(end_year), 
-            int(tc.MONTH_MAP[end_month])
-        )
-        
-        # Convert the DataFrame's date column to timestamps for comparison
-        date_timestamps = pd.to_datetime(df[date_column]).apply(lambda x: int(x.timestamp()))
-        
+        start_timestamp, end_timestamp = get_date_range(start_year, start_month, end_year, end_month)
+
+        if index is not None:
+            dates = index.dates
+            if dates is None:
+                raise ValueError("Missing release date")
+        else:
+            if date_column == tc.RELEASE_DATE and tc.TEMP_DATE in df.columns:
+                date_column = tc.TEMP_DATE
+            date_timestamps = release_epochs(df[date_column])
+            if date_timestamps.isna().any():
+                raise ValueError("Missing release date")
+            dates = SortedColumn(date_timestamps.to_numpy(dtype=np.int64))
+
         # Filter the DataFrame
-        return df[
-            (date_timestamps >= start_timestamp) & 
-            (date_timestamps <= end_timestamp)
-        ]
+        bits = dates.between(start_timestamp, end_timestamp, len(df))
+        return df[np.unpackbits(bits, count=len(df)).astype(bool)]
     except (ValueError, TypeError) as e:
         print(f"Error processing dates: {e}")
         return df  # Return unfiltered DataFrame if there's an error
@@ -77,57 +102,35 @@ def filter_by_date(df: pd.DataFrame,
 def filter(df, language_list, parameters, input_price, output_price, multimodal,
            context, open_weight, 
            start_year, start_month, end_year, end_month, 
-           license ):
+           license, index: FilterIndex = None):
+    """
+    Filter the leaderboard by the current selection of the filter controls.
 
-    
-    if not df.empty:  # Check if df is non-empty
-        df = df[df[tc.LANGS].apply(lambda x: all(lang in x for lang in language_list))]
+    Resolves through a FilterIndex. Pass the prebuilt index of a snapshot as `index` to skip
+    building one for `df`, the rows are then taken from `index.df`. A `df` from `merge_data`
+    is converted to the compact representation first.
+    Languages are given as language codes (see src/languages.py), languages and licenses
+    match on the exact values listed by a model.
+    """
+    if index is None:
+        index = FilterIndex(df if is_compact(df) else compact_leaderboard(df))
 
-    if not df.empty:
-        df = df[(df[tc.DUMMY_PARAMS] >= parameters[0]) & (df[tc.DUMMY_PARAMS] <= parameters[1])]
+    try:
+        date_range = get_date_range(start_year, start_month, end_year, end_month)
+    except (ValueError, TypeError) as e:
+        print(f"Error processing dates: {e}")
+        date_range = None
 
-    if not df.empty:  # Check if df is non-empty
-        df = df[(df[tc.INPUT] >= input_price[0]) & (df[tc.INPUT] <= input_price[1])]
-    
-    if not df.empty:  # Check if df is non-empty
-        df = df[(df[tc.OUTPUT] >= output_price[0]) & (df[tc.OUTPUT] <= output_price[1])]
-
-    if not df.empty:  # Check if df is non-empty
-        if tc.TEXT in multimodal:
-            df = df[(df[tc.SINGLE_IMG] == False) & (df[tc.MULT_IMG] == False) & (df[tc.AUDIO] == False) & (df[tc.VIDEO] == False) ]
-        if tc.SINGLE_IMG in multimodal:
-            df = df[df[tc.SINGLE_IMG] == True]
-        if tc.MULT_IMG in multimodal:
-            df = df[df[tc.MULT_IMG] == True]
-        if tc.AUDIO in multimodal:
-            df = df[df[tc.AUDIO] == True]
-        if tc.VIDEO in multimodal:
-            df = df[df[tc.VIDEO] == True]
-
-    if not df.empty:  # Check if df is non-empty
-        # Convert 'Context Size (k)' to numeric, coercing errors to NaN
-        context_size = pd.to_numeric(df['Context Size (k)'], errors='coerce').fillna(0)
-        
-        # Apply the filter
-        df = df[(context_size >= context[0]) & (context_size <= context[1])]
-
-    if not df.empty:  # Check if df is non-empty
-        if tc.OPEN in open_weight and tc.COMM not in open_weight:
-            df = df[df[tc.OPEN_WEIGHT] == True]
-        elif tc.COMM in open_weight and tc.OPEN not in open_weight:
-            df = df[df[tc.OPEN_WEIGHT] == False]
-        elif tc.OPEN not in open_weight and tc.COMM not in open_weight:
-            # Return empty DataFrame with same columns
-            df = pd.DataFrame(columns=df.columns)
-        
-    if not df.empty:  # Check if df is non-empty
-        df = df[df[tc.LICENSE_NAME].apply(lambda x: any(lic in x for lic in license))]
-
-    df = filter_by_date(df, start_year, start_month, end_year, end_month, tc.TEMP_DATE)
-
-    df = filter_cols(df)
-    df = df.sort_values(by=tc.CLEMSCORE, ascending=False)
-
-    return df  # Return the filtered dataframe
-    
+    rows = index.select(language_list, parameters, input_price, output_price, multimodal,
+                        context, open_weight, date_range, license)
 
+    return get_rows(index, rows)  # Return the filtered dataframe
+
+
+def get_rows(index: FilterIndex, rows) -> pd.DataFrame:
+    """Return the display columns of the selected rows of an index, sorted by score."""
+    with timed('filter.render') as sizes:
+        df = render(index.df.iloc[rows], DISPLAY_COLUMNS)
+        df = df.sort_values(by=tc.CLEMSCORE, ascending=False)
+        sizes['rows'] = len(df)
+    return df
@@ -0,0 +1,172 @@
+"""
+Score and latency history over all clembench versions
+
+The leaderboard only uses the latest version of each benchmark. The history keeps every
+version listed in BENCHMARK_FILE in one long-format table (version x model, with the average
+score and latency of the model in that version), stored as tc.HISTORY_FILE next to the snapshot.
+
+Updates are incremental: only versions that are not stored yet are downloaded, and their
+files are parsed in parallel on a process pool. Versions that can not be fetched are retried
+on the next update.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from src.collect_data import fetch_version_names, fetch_version_files, parse_version_files, sort_versions
+from src.process_data import clean_model_name
+import assets.text_content as tc
+
+HISTORY_COLUMNS = ['version', 'benchmark', 'model', 'clemscore', 'latency']
+
+_history = None
+_history_lock = threading.Lock()
+_update_lock = threading.Lock()
+
+
+def get_history_path() -> str:
+    return os.path.join(tc.SNAPSHOT_DIR, tc.HISTORY_FILE)
+
+
+def empty_history() -> pd.DataFrame:
+    return pd.DataFrame({
+        'version': pd.Series(dtype=object),
+        'benchmark': pd.Series(dtype=object),
+        'model': pd.Series(dtype=object),
+        'clemscore': pd.Series(dtype=float),
+        'latency': pd.Series(dtype=float),
+    })
+
+
+def parse_version_history(version: str, results: bytes, latency: bytes) -> pd.DataFrame:
+    """
+    Parse the raw files of a version into history rows.
+
+    Runs in a worker process, so it only takes and returns picklable values.
+
+    Returns:
+        pd.DataFrame: One row per model with HISTORY_COLUMNS, None if the files can not be parsed
+    """
+    results_df, latency_df = parse_version_files(version, results, latency)
+    if results_df is None:
+        return None
+
+    # Average over the temperatures of a model, as merge_data does
+    results_df['model'] = clean_model_name(results_df[tc.DEFAULT_MODEL_NAME])
+    scores = results_df.groupby('model')[tc.DEFAULT_CLEMSCORE].mean()
+    latencies = latency_df.groupby('model')['latency'].mean()
+
+    df = pd.concat({'clemscore': scores, 'latency': latencies}, axis=1)
+    df = df.rename_axis('model').reset_index()
+    df.insert(0, 'version', version)
+    df.insert(1, 'benchmark', 'multimodal' if 'multimodal' in version else 'text')
+    return df[HISTORY_COLUMNS]
+
+
+def load_history(path: str = None) -> pd.DataFrame:
+    """Load the stored history, an empty one if there is none."""
+    path = path or get_history_path()
+    if not os.path.exists(path):
+        return empty_history()
+    try:
+        return pd.read_parquet(path)
+    except (OSError, ValueError) as e:
+        print(f"Error reading history - {path}: {e}")
+        return empty_history()
+
+
+def save_history(df: pd.DataFrame, path: str = None) -> None:
+    """Write the history next to its target and move it into place."""
+    path = path or get_history_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def update_history(path: str = None, workers: int = tc.PARSE_WORKERS) -> list:
+    """
+    Add the versions that are not stored yet to the history.
+
+    New versions are downloaded concurrently and parsed on a process pool. Concurrent calls
+    are skipped while an update is running.
+
+    Args:
+        path (str): Path of the history file, defaults to the configured one
+        workers (int): Number of parsing processes
+
+    Returns:
+        list: The versions that were added.
+        Returns None if the version index can not be fetched or an update is already running.
+    """
+    if not _update_lock.acquire(blocking=False):
+        return None
+
+    try:
+        history = get_history(path)
+        version_names = fetch_version_names()
+        if version_names is None:
+            return None
+
+        stored = set(history['version'])
+        missing = [v for v in version_names if v not in stored]
+        if not missing:
+            return []
+
+        with ThreadPoolExecutor(max_workers=tc.FETCH_WORKERS) as executor:
+            files = dict(zip(missing, executor.map(fetch_version_files, missing)))
+        files = {v: f for v, f in files.items() if f[0] is not None}
+
+        if len(files) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+                frames = list(executor.map(parse_version_history, files, *zip(*files.values())))
+        else:
+            frames = [parse_version_history(v, *f) for v, f in files.items()]
+
+        frames = [f for f in frames if f is not None]
+        if not frames:
+            return []
+
+        history = pd.concat([history, *frames], ignore_index=True)
+        save_history(history, path)
+        set_history(history)
+        return sorted(set(pd.concat(frames)['version']))
+
+    finally:
+        _update_lock.release()
+
+
+def get_history(path: str = None) -> pd.DataFrame:
+    """Return the history, loaded from disk on first use."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = load_history(path)
+        return _history
+
+
+def set_history(df: pd.DataFrame) -> None:
+    global _history
+    with _history_lock:
+        _history = df
+
+
+def get_trends(models: list, metric: str = 'clemscore') -> tuple:
+    """
+    Return the history of some models for plotting.
+
+    Args:
+        models (list): Model names
+        metric (str): 'clemscore' or 'latency'
+
+    Returns:
+        tuple[pd.DataFrame, list]: Rows with version, model and the metric, and the versions
+        in release order (oldest first)
+    """
+    history = get_history()
+    df = history.loc[history['model'].isin(models) & history[metric].notna(), ['version', 'model', metric]]
+    versions = sort_versions(list(df['version'].unique()))[::-1]
+    return df, versions
@@ -0,0 +1,78 @@
+"""
+Prebuilt language code table replacing per-call pycountry lookups
+
+The table maps every ISO 639 language to its display name, keyed by its alpha_2 code or,
+for languages without one, its alpha_3 code. It is generated once from pycountry with
+`python -m src.languages` and loaded lazily on first use.
+"""
+
+import json
+import os
+from functools import lru_cache
+
+LANGUAGE_TABLE_PATH = os.path.join('assets', 'languages.json')
+
+
+def build_language_table(path: str = LANGUAGE_TABLE_PATH) -> dict:
+    """
+    Generate the code -> name table from pycountry and write it to `path`.
+
+    Returns:
+        dict: The generated table
+    """
+    import pycountry
+
+    table = {}
+    for language in pycountry.languages:
+        code = getattr(language, 'alpha_2', None) or language.alpha_3
+        table[code] = language.name
+
+    with open(path, 'w') as f:
+        json.dump(table, f, separators=(',', ':'), ensure_ascii=False)
+    return table
+
+
+@lru_cache(maxsize=None)
+def get_language_table() -> tuple:
+    """
+    Load the language table.
+
+    Returns:
+        tuple[dict, dict]: code -> name, and lowercase name -> code
+    """
+    with open(LANGUAGE_TABLE_PATH, encoding='utf-8') as f:
+        names = json.load(f)
+
+    # Like pycountry, the first language listed under a name wins
+    codes = {}
+    for code, name in names.items():
+        codes.setdefault(name.lower(), code)
+    return names, codes
+
+
+@lru_cache(maxsize=None)
+def normalize_language(lang: str) -> str:
+    """
+    Normalize a language code or name to its code.
+
+    Follows the previous pycountry lookups: first as alpha_2 code (en, fr, etc.), then
+    as language name (English, French, etc.). Unknown languages are kept as given,
+    stripped and lowercased.
+    """
+    lang = str(lang).strip().lower()
+    names, codes = get_language_table()
+
+    if len(lang) == 2 and lang in names:
+        return lang
+    return codes.get(lang, lang)
+
+
+def language_name(code: str) -> str:
+    """Return the display name of a language code, unknown codes are returned as is."""
+    names, _ = get_language_table()
+    return names.get(code, code)
+
+
+if __name__ == "__main__":
+    table = build_language_table()
+    print(f"Wrote {len(table)} languages to {LANGUAGE_TABLE_PATH}")
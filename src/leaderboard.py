@@ -0,0 +1,480 @@
+"""
+Live leaderboard state shared by all sessions of the app
+
+The compact leaderboard and everything derived from it (facet choices, slider bounds, filter
+index and Pareto index) are bundled in an immutable LeaderboardState. A refresh builds the
+new state off the request path and publishes it with a single reference swap, so readers
+always see either the old or the new state, never a partially built one. When a refresh only
+changes prices, scores or other numeric values, the new state reuses the filter index and the
+cached results of the old one where the changed models can not affect them.
+"""
+
+import bisect
+import functools
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.changelog import append_changelog, diff_leaderboards, is_empty
+from src.filter_cache import filter_cache, normalize_filter_state
+from src.filter_index import FilterIndex, bits_at
+from src.compact import COMPACT_ATTR, compact_leaderboard, language_matrix
+from src.facets import get_facets, load_facets
+from src.filter_utils import get_rows
+from src.pareto import ParetoIndex
+from src.ranking import normalize_weights, rank
+from src.snapshot import load_leaderboard
+import assets.text_content as tc
+
+
+@dataclass(frozen=True)
+class LeaderboardState:
+    snapshot_id: str
+    leaderboard: pd.DataFrame
+    facets: dict
+    index: FilterIndex
+    pareto: ParetoIndex
+
+
+# Share of added or moved rows above which a refresh indexes the leaderboard from scratch, see `update_state`
+MAX_SPLICED_SHARE = 0.5
+
+_lock = threading.Lock()
+_states = OrderedDict()
+_current = None
+
+
+def prepare_leaderboard(df: pd.DataFrame) -> tuple:
+    """
+    Sort and round a merged leaderboard for display, convert it to its compact representation
+    and derive its facets.
+
+    Returns:
+        tuple[str, dict, pd.DataFrame]: Snapshot id, facets and the compact leaderboard
+    """
+    meta = df.attrs.get('snapshot', {})
+    snapshot_id = meta.get('snapshot_id') or uuid.uuid4().hex[:12]
+
+    df = df.copy()
+
+    # When displaying latency values
+    df[tc.LATENCY] = df[tc.LATENCY].round(1)
+    df[tc.CLEMSCORE] = df[tc.CLEMSCORE].round(1)
+
+    # Models with the same score by name, the row order does not depend on the order of the sources
+    df = df.sort_values(by=[tc.CLEMSCORE, tc.MODEL_NAME], ascending=[False, True], kind='stable')
+
+    # Facets are taken from the full precision values, before the conversion to float32
+    facets = load_facets(meta) or get_facets(df)
+    return snapshot_id, facets, compact_leaderboard(df)
+
+
+def build_state(df: pd.DataFrame) -> LeaderboardState:
+    """
+    Convert a merged leaderboard to its compact representation and derive its facets.
+
+    Args:
+        df (pd.DataFrame): Output of `merge_data` or `load_leaderboard`
+
+    Returns:
+        LeaderboardState: The new state, not yet visible to readers
+    """
+    snapshot_id, facets, df = prepare_leaderboard(df)
+
+    return LeaderboardState(
+        snapshot_id=snapshot_id,
+        leaderboard=df,
+        facets=facets,
+        index=FilterIndex(df),
+        pareto=ParetoIndex(df),
+    )
+
+
+def increasing_rows(positions: np.ndarray) -> np.ndarray:
+    """
+    Find a longest strictly increasing subsequence.
+
+    Returns:
+        np.ndarray: Boolean mask over `positions`, True for the elements of the subsequence
+    """
+    # Patience sorting - tails[i] is the smallest last element of an increasing run of length i + 1
+    tails, tail_at, previous = [], [], []
+    for i, value in enumerate(positions.tolist()):
+        length = bisect.bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[length] = value
+            tail_at[length] = i
+        previous.append(tail_at[length - 1] if length else -1)
+
+    mask = np.zeros(len(positions), dtype=bool)
+    i = tail_at[-1] if tail_at else -1
+    while i >= 0:
+        mask[i] = True
+        i = previous[i]
+    return mask
+
+
+def match_rows(old: pd.DataFrame, new: pd.DataFrame) -> np.ndarray:
+    """
+    Match the rows of a refreshed compact leaderboard to the rows of the previous one by model name.
+
+    Returns:
+        np.ndarray: Position in `old` of every row of `new`, -1 for added models and for models
+        that moved against the others - matched rows keep their relative order. Returns None if
+        the columns differ or model names are not unique
+    """
+    if old.attrs[COMPACT_ATTR]['columns'] != new.attrs[COMPACT_ATTR]['columns']:
+        return None
+
+    # Model names are compared as objects, a leaderboard mapped from a shared segment holds Arrow strings
+    old_names = pd.Index(old[tc.MODEL_NAME].to_numpy(dtype=object))
+    new_names = pd.Index(new[tc.MODEL_NAME].to_numpy(dtype=object))
+    if not (old_names.is_unique and new_names.is_unique):
+        return None
+
+    old_rows = old_names.get_indexer(new_names)
+    matched = np.flatnonzero(old_rows >= 0)
+    positions = old_rows[matched]
+    if (np.diff(positions) <= 0).any():
+        # A changed score moves a model within the sorted leaderboard, the fewest rows are taken as moved
+        old_rows[matched[~increasing_rows(positions)]] = -1
+    return old_rows
+
+
+def row_changes(old: pd.DataFrame, new: pd.DataFrame, old_rows: np.ndarray) -> dict:
+    """
+    Compare the matched rows of two compact leaderboards, see `match_rows`.
+
+    Returns:
+        dict: Boolean mask over the rows of `new` per column, True where the value differs from
+        the matched row of `old`. False for rows without a match
+    """
+    matched = np.flatnonzero(old_rows >= 0)
+    source = old_rows[matched]
+
+    # Matched rows have the same model name
+    changed = {tc.MODEL_NAME: np.zeros(len(new), dtype=bool)}
+    for column in new.columns.drop(tc.MODEL_NAME):
+        if column == tc.LANGS and old.attrs[COMPACT_ATTR]['languages'] != new.attrs[COMPACT_ATTR]['languages']:
+            # The bitsets of two snapshots refer to different codes, the unpacked languages are compared instead
+            codes = sorted(set(old.attrs[COMPACT_ATTR]['languages']) | set(new.attrs[COMPACT_ATTR]['languages']))
+            old_langs, new_langs = language_matrix(old, codes)[1][source], language_matrix(new, codes)[1][matched]
+            differs = (old_langs != new_langs).any(axis=1) | (pd.isna(old[column].to_numpy()[source]) !=
+                                                              pd.isna(new[column].to_numpy()[matched]))
+        else:
+            a, b = old[column].to_numpy()[source], new[column].to_numpy()[matched]
+            differs = (a != b) & ~(pd.isna(a) & pd.isna(b))
+
+        mask = np.zeros(len(new), dtype=bool)
+        mask[matched] = differs
+        changed[column] = mask
+    return changed
+
+
+def unaffected_by(old: FilterIndex, new: FilterIndex, old_rows: np.ndarray, changed: dict):
+    """
+    Return a check whether a cached result is the same on both indexes.
+
+    Rows of `new` that were added, moved or changed and rows of `old` without an unchanged
+    counterpart are affected. A result is unchanged if each affected row fails at least two
+    filters, so it is neither selected nor counted for any filter choice. A changed row also
+    passes if every filter lets it through in both indexes or in neither and it is not selected -
+    for facet counts only if its license and model type are unchanged as well, a row failing just
+    the license or model type filter is counted under its license or model type. Facet counts are
+    also dropped if the language codes or licenses differ, and results filtered by release date if
+    the date filter was enabled or disabled.
+    """
+    unchanged = (old_rows >= 0) & ~np.logical_or.reduce(list(changed.values()))
+    new_rows = np.flatnonzero(~unchanged)
+    old_mask = np.ones(old.n_rows, dtype=bool)
+    old_mask[old_rows[unchanged]] = False
+    old_affected = np.flatnonzero(old_mask)
+    if not len(new_rows) and not len(old_affected):
+        return lambda filter_state, *extra: True
+
+    # Changed rows, in both indexes
+    both = np.flatnonzero((old_rows >= 0) & ~unchanged)
+    same_values = list(old.languages) == list(new.languages) and list(old.licenses) == list(new.licenses)
+    # Changed rows counted under the same license and model type in both indexes
+    same_counted = ~(changed[tc.LICENSE_NAME] | changed[tc.OPEN_WEIGHT])[both]
+
+    def passes(masks, rows):
+        return np.stack([bits_at(bits, rows) for bits in masks.values()])
+
+    # Cached results of one filter state share the check
+    @functools.lru_cache(maxsize=None)
+    def check(filter_state) -> tuple:
+        """Whether the results and whether the facet counts of a filter state are unchanged."""
+        old_masks, new_masks = old.masks(*filter_state), new.masks(*filter_state)
+        old_passes, new_passes = passes(old_masks, old_affected), passes(new_masks, new_rows)
+        old_ok, new_ok = (~old_passes).sum(axis=0) >= 2, (~new_passes).sum(axis=0) >= 2
+
+        # Changed rows filtered the same way in both indexes, and not selected
+        old_same, new_same = passes(old_masks, old_rows[both]), passes(new_masks, both)
+        same = (old_same == new_same).all(axis=0) & ~new_same.all(axis=0)
+        old_at, new_at = np.searchsorted(old_affected, old_rows[both]), np.searchsorted(new_rows, both)
+
+        def unchanged(same):
+            old_rows_ok, new_rows_ok = old_ok.copy(), new_ok.copy()
+            old_rows_ok[old_at] |= same
+            new_rows_ok[new_at] |= same
+            return bool(old_rows_ok.all() and new_rows_ok.all())
+        return unchanged(same), unchanged(same & same_counted)
+
+    def keep(filter_state, *extra) -> bool:
+        if extra == ('facet_counts',) and not same_values:
+            return False
+        # A missing release date disables the date filter for every row
+        if filter_state[7] is not None and (old.dates is None) != (new.dates is None):
+            return False
+        results, counts = check(filter_state)
+        return counts if extra == ('facet_counts',) else results
+    return keep
+
+
+def relabel_rows(old: pd.DataFrame, new: pd.DataFrame, old_rows: np.ndarray):
+    """
+    Return a conversion of cached results to the index labels of `new`, None if the labels of the matched rows are the same.
+
+    Cached results hold rendered rows under the index labels of their leaderboard, which locate
+    the rows of the full leaderboard, e.g. in `api.query_leaderboard`.
+    """
+    matched = np.flatnonzero(old_rows >= 0)
+    old_labels, new_labels = old.index.to_numpy()[old_rows[matched]], new.index.to_numpy()[matched]
+    if np.array_equal(old_labels, new_labels):
+        return None
+    labels = pd.Series(new_labels, index=old_labels)
+
+    def relabel(value):
+        if isinstance(value, pd.DataFrame):
+            return value.set_axis(labels.loc[value.index].to_numpy())
+        return value
+    return relabel
+
+
+def update_state(current: LeaderboardState, df: pd.DataFrame) -> LeaderboardState:
+    """
+    Build the state of a refreshed leaderboard, reusing what did not change since `current`.
+
+    Rows are matched to the current leaderboard by model name. The filter and Pareto indexes
+    are spliced - matched rows keep their bits and sorted positions, only added rows and changed
+    values are indexed again, see `FilterIndex.splice`. Cached results the added, removed and
+    changed rows can not affect are carried over to the new snapshot. If the model names are
+    not unique, the columns differ or more than MAX_SPLICED_SHARE of the rows were added or
+    moved, the state is built from scratch like `build_state`.
+
+    Args:
+        current (LeaderboardState): The published state
+        df (pd.DataFrame): Output of `merge_data` or `load_leaderboard`
+
+    Returns:
+        LeaderboardState: The new state, not yet visible to readers
+    """
+    snapshot_id, facets, df = prepare_leaderboard(df)
+
+    old_rows = match_rows(current.leaderboard, df)
+    if old_rows is None or (old_rows < 0).mean() > MAX_SPLICED_SHARE:
+        return LeaderboardState(snapshot_id=snapshot_id, leaderboard=df, facets=facets,
+                                index=FilterIndex(df), pareto=ParetoIndex(df))
+
+    changed = row_changes(current.leaderboard, df, old_rows)
+    state = LeaderboardState(
+        snapshot_id=snapshot_id,
+        leaderboard=df,
+        facets=facets,
+        index=current.index.splice(df, old_rows, changed),
+        pareto=current.pareto.splice(df, old_rows, changed),
+    )
+    if state.snapshot_id != current.snapshot_id:
+        filter_cache.carry_over(current.snapshot_id, state.snapshot_id,
+                                unaffected_by(current.index, state.index, old_rows, changed),
+                                relabel_rows(current.leaderboard, df, old_rows))
+    return state
+
+
+def publish_state(state: LeaderboardState) -> None:
+    """Make `state` the current leaderboard, keeping the last few states for lagging sessions."""
+    global _current
+    with _lock:
+        _states[state.snapshot_id] = state
+        _states.move_to_end(state.snapshot_id)
+        while len(_states) > tc.MAX_LIVE_SNAPSHOTS:
+            evicted_id, _ = _states.popitem(last=False)
+            filter_cache.invalidate(evicted_id)
+        _current = state
+
+
+def get_state(snapshot_id: str = None) -> LeaderboardState:
+    """
+    Return the current leaderboard state, or a recent one by its snapshot id.
+
+    Falls back to the current state if `snapshot_id` is unknown or was evicted.
+    """
+    with _lock:
+        if snapshot_id is not None and snapshot_id in _states:
+            return _states[snapshot_id]
+        return _current
+
+
+def filter_leaderboard(snapshot_id: str, *filters) -> pd.DataFrame:
+    """
+    Filter a snapshot through the result cache.
+
+    Args:
+        snapshot_id (str): Snapshot the session renders, see `get_state`
+        *filters: The filter arguments of `filter_utils.filter`, without the DataFrame
+
+    Returns:
+        pd.DataFrame: The filtered display table
+    """
+    state = get_state(snapshot_id)
+    filter_state = normalize_filter_state(*filters)
+    key = (state.snapshot_id, filter_state)
+
+    result = filter_cache.get(key)
+    if result is None:
+        result = get_rows(state.index, state.index.select(*filter_state))
+        filter_cache.put(key, result)
+    return result
+
+
+def pareto_leaderboard(snapshot_id: str, objectives, *filters) -> pd.DataFrame:
+    """
+    Return the Pareto-optimal models of the filtered leaderboard, through the result cache.
+
+    Args:
+        snapshot_id (str): Snapshot the session renders, see `get_state`
+        objectives: Two or three columns of tc.PARETO_OBJECTIVES
+        *filters: The filter arguments of `filter_utils.filter`, without the DataFrame
+
+    Returns:
+        pd.DataFrame: The frontier as display table
+    """
+    state = get_state(snapshot_id)
+    filter_state = normalize_filter_state(*filters)
+    objectives = tuple(o for o in tc.PARETO_OBJECTIVES if o in objectives)
+    key = (state.snapshot_id, filter_state, objectives)
+
+    result = filter_cache.get(key)
+    if result is None:
+        rows = state.index.select(*filter_state)
+        result = get_rows(state.index, state.pareto.frontier(objectives, rows))
+        filter_cache.put(key, result)
+    return result
+
+
+def ranked_leaderboard(snapshot_id: str, weights: dict, k: int, *filters) -> pd.DataFrame:
+    """
+    Return the top k models of the filtered leaderboard by a weighted composite score, through the result cache.
+
+    Args:
+        snapshot_id (str): Snapshot the session renders, see `get_state`
+        weights (dict): Weight per criterion of tc.RANKING_CRITERIA, missing criteria count 0
+        k (int): Number of models to return
+        *filters: The filter arguments of `filter_utils.filter`, without the DataFrame
+
+    Returns:
+        pd.DataFrame: The top k as display table with tc.RANK_SCORE, best first
+    """
+    state = get_state(snapshot_id)
+    filter_state = normalize_filter_state(*filters)
+    weights = normalize_weights(weights)
+    key = (state.snapshot_id, filter_state, 'rank', weights, int(k))
+
+    result = filter_cache.get(key)
+    if result is None:
+        result = rank(state.index, state.index.select(*filter_state), weights, int(k))
+        filter_cache.put(key, result)
+    return result
+
+
+def facet_counts(snapshot_id: str, *filters) -> dict:
+    """
+    Count the models behind each choice of the categorical filters, through the result cache.
+
+    Args:
+        snapshot_id (str): Snapshot the session renders, see `get_state`
+        *filters: The filter arguments of `filter_utils.filter`, without the DataFrame
+
+    Returns:
+        dict: Count per value for 'languages', 'modalities', 'licenses' and 'model_types',
+        see `FilterIndex.facet_counts`
+    """
+    state = get_state(snapshot_id)
+    filter_state = normalize_filter_state(*filters)
+    key = (state.snapshot_id, filter_state, 'facet_counts')
+
+    result = filter_cache.get(key)
+    if result is None:
+        result = state.index.facet_counts(*filter_state)
+        filter_cache.put(key, result)
+    return result
+
+
+def filter_with_counts(snapshot_id: str, *filters) -> tuple:
+    """
+    Filter a snapshot and count the models behind each filter choice, through the result cache.
+
+    Shares the cache entries of `filter_leaderboard` and `facet_counts`, the filter state is
+    normalized and resolved to bitsets once for both.
+
+    Returns:
+        tuple[pd.DataFrame, dict]: The filtered display table and the counts of `facet_counts`
+    """
+    state = get_state(snapshot_id)
+    filter_state = normalize_filter_state(*filters)
+    table_key = (state.snapshot_id, filter_state)
+    counts_key = (state.snapshot_id, filter_state, 'facet_counts')
+
+    table, counts = filter_cache.get(table_key), filter_cache.get(counts_key)
+    if table is None or counts is None:
+        masks = state.index.masks(*filter_state)
+        if table is None:
+            table = get_rows(state.index, state.index.rows_of(masks))
+            filter_cache.put(table_key, table)
+        if counts is None:
+            counts = state.index.counts_of(masks)
+            filter_cache.put(counts_key, counts)
+    return table, counts
+
+
+def refresh_leaderboard(loader=load_leaderboard, rebuild: bool = False) -> bool:
+    """
+    Rebuild the leaderboard in the calling thread and swap it in if it changed.
+
+    Args:
+        loader (Callable): Returns the merged leaderboard, accepts a `rebuild` flag
+        rebuild (bool): Force a rebuild of the snapshot
+
+    Returns:
+        bool: True if a new leaderboard was published
+    """
+    try:
+        df = loader(rebuild=rebuild)
+    except Exception as e:
+        print(f"Error refreshing the leaderboard, keeping the current one: {e}")
+        return False
+
+    current = get_state()
+    if current is None:
+        publish_state(build_state(df))
+        return True
+    if current.snapshot_id == df.attrs.get('snapshot', {}).get('snapshot_id'):
+        return False
+
+    state = update_state(current, df)
+    changes = diff_leaderboards(current.leaderboard, state.leaderboard)
+    if not is_empty(changes):
+        append_changelog(current.snapshot_id, state.snapshot_id, changes)
+        print(f"Leaderboard changed: {len(changes['added'])} added, {len(changes['removed'])} removed, "
+              f"{len(changes['changed'])} values changed")
+
+    publish_state(state)
+    return True
@@ -0,0 +1,131 @@
+"""
+Per-stage timing instrumentation of the build and query paths
+
+Stages (fetches, merge_data steps, filter masks, UI handlers) are timed with `timed` or
+`instrument`, together with the number of rows and bytes they produced. Timings are
+aggregated per stage for the Prometheus text endpoint (GET /metrics) and written as one
+JSON line per measurement to the structured log.
+
+Disabled by default, set LLM_CALC_METRICS=1 to enable - `timed` then costs one function
+call per stage. The log goes to stdout, or to LLM_CALC_METRICS_LOG if set.
+"""
+
+import contextlib
+import functools
+import json
+import sys
+import threading
+import time
+
+import pandas as pd
+
+import assets.text_content as tc
+
+enabled = tc.METRICS_ENABLED
+
+_stages = {}
+_lock = threading.Lock()
+
+# Handed out by `timed` while disabled, writes to it are discarded
+_DISABLED = {}
+
+
+def set_enabled(value: bool) -> None:
+    global enabled
+    enabled = value
+
+
+def record(stage: str, seconds: float, rows: int = None, bytes: int = None, **labels) -> None:
+    """Aggregate one measurement of a stage and write it to the structured log."""
+    with _lock:
+        stats = _stages.setdefault(stage, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': None, 'bytes': 0})
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        if rows is not None:
+            stats['rows'] = rows
+        if bytes is not None:
+            stats['bytes'] += bytes
+
+    entry = {'ts': time.time(), 'stage': stage, 'seconds': round(seconds, 6), 'rows': rows, 'bytes': bytes, **labels}
+    line = json.dumps(entry, default=str) + '\n'
+    with _lock:
+        if tc.METRICS_LOG:
+            with open(tc.METRICS_LOG, 'a') as f:
+                f.write(line)
+        else:
+            sys.stdout.write(line)
+
+
+@contextlib.contextmanager
+def timed(stage: str, **labels):
+    """
+    Time the enclosed block as `stage`.
+
+    Yields a dict, set its 'rows' and 'bytes' keys to record the size of what the stage produced.
+    Extra keyword arguments are written to the log only, they do not split the aggregate.
+    """
+    if not enabled:
+        yield _DISABLED
+        _DISABLED.clear()
+        return
+
+    sizes = {}
+    start = time.perf_counter()
+    try:
+        yield sizes
+    finally:
+        record(stage, time.perf_counter() - start, sizes.get('rows'), sizes.get('bytes'), **labels)
+
+
+def instrument(stage: str):
+    """Decorator timing every call of a function as `stage`, counting the rows of a returned DataFrame."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with timed(stage) as sizes:
+                result = fn(*args, **kwargs)
+                if isinstance(result, pd.DataFrame):
+                    sizes['rows'] = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def get_stages() -> dict:
+    """Return a copy of the aggregated timings per stage."""
+    with _lock:
+        return {stage: dict(stats) for stage, stats in _stages.items()}
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+
+
+def format_metric(name: str, kind: str, help: str, samples: list) -> list:
+    """Format one Prometheus metric, `samples` holds (labels dict, value) pairs."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+
+def render_prometheus() -> str:
+    """Render the aggregated timings in the Prometheus text exposition format."""
+    stages = sorted(get_stages().items())
+    lines = []
+    lines += format_metric('llm_calc_stage_seconds_total', 'counter', "Total wall time per stage",
+                           [({'stage': s}, round(v['seconds'], 6)) for s, v in stages])
+    lines += format_metric('llm_calc_stage_calls_total', 'counter', "Number of runs per stage",
+                           [({'stage': s}, v['count']) for s, v in stages])
+    lines += format_metric('llm_calc_stage_seconds_max', 'gauge', "Slowest run per stage",
+                           [({'stage': s}, round(v['max_seconds'], 6)) for s, v in stages])
+    lines += format_metric('llm_calc_stage_rows', 'gauge', "Rows produced by the last run per stage",
+                           [({'stage': s}, v['rows']) for s, v in stages if v['rows'] is not None])
+    lines += format_metric('llm_calc_stage_bytes_total', 'counter', "Bytes read or sent per stage",
+                           [({'stage': s}, v['bytes']) for s, v in stages if v['bytes']])
+    return '\n'.join(lines) + '\n'
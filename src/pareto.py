@@ -0,0 +1,191 @@
+"""
+Pareto frontier (skyline) over score, price and latency
+
+A model is Pareto-optimal if no other model is at least as good in every selected objective
+and strictly better in one. Two objectives are solved with a single sweep over the models
+sorted by the first objective, three objectives with a sweep that keeps the 2D staircase of
+the models seen so far - both O(n log n).
+
+The sort order of each objective combination is computed once per snapshot. Filtering only
+masks that order, so a new filter state costs a sweep and no re-sort.
+"""
+
+import threading
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+from src.filter_index import insert_sorted, moved_rows
+import assets.text_content as tc
+
+
+def frontier_2d(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Return a mask of the non-dominated points, minimizing both objectives.
+
+    `a` and `b` must be sorted by (a, b).
+    """
+    n = len(a)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    # Points sharing the same `a` form a group, the first point of a group has its lowest `b`
+    group_start = np.r_[True, a[1:] != a[:-1]]
+    group_id = np.cumsum(group_start) - 1
+    starts = np.flatnonzero(group_start)
+    group_min = b[starts]
+
+    # Best `b` among all points with a strictly lower `a`
+    running_min = np.minimum.accumulate(b)
+    best_before = np.r_[np.inf, running_min[starts[1:] - 1]]
+
+    return (b == group_min[group_id]) & (group_min[group_id] < best_before[group_id])
+
+
+def frontier_3d(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Return a mask of the non-dominated points, minimizing all three objectives.
+
+    `a`, `b` and `c` must be sorted by (a, b, c).
+    """
+    n = len(a)
+    mask = np.zeros(n, dtype=bool)
+    a, b, c = a.tolist(), b.tolist(), c.tolist()
+
+    # Staircase of the non-dominated (b, c) pairs with a lower `a` - b ascending, c strictly descending
+    stair_b = []
+    stair_c = []
+
+    start = 0
+    while start < n:
+        end = start + 1
+        while end < n and a[end] == a[start]:
+            end += 1
+
+        # Within a group of equal `a`, only its own 2D frontier can survive
+        if end - start == 1:
+            candidates = [start]
+        else:
+            group_mask = frontier_2d(np.array(b[start:end]), np.array(c[start:end]))
+            candidates = [start + i for i in np.flatnonzero(group_mask).tolist()]
+
+        # A candidate is dominated if a step with b <= its b has c <= its c
+        survivors = []
+        for i in candidates:
+            pos = bisect_right(stair_b, b[i])
+            if pos == 0 or stair_c[pos - 1] > c[i]:
+                survivors.append(i)
+
+        for i in survivors:
+            mask[i] = True
+            pos = bisect_right(stair_b, b[i])
+            if pos > 0 and stair_c[pos - 1] <= c[i]:
+                continue
+            # Drop the steps the new point dominates in (b, c)
+            end_pos = pos
+            while end_pos < len(stair_b) and stair_c[end_pos] >= c[i]:
+                end_pos += 1
+            stair_b[pos:end_pos] = [b[i]]
+            stair_c[pos:end_pos] = [c[i]]
+
+        start = end
+
+    return mask
+
+
+class ParetoIndex:
+    """
+    Presorted objective values of a leaderboard, for frontier queries over any row subset.
+
+    Args:
+        df (pd.DataFrame): The leaderboard, rows are referenced by position
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._sorted = {}
+        self._lock = threading.Lock()
+
+    def _objective_values(self, objectives: tuple, rows=slice(None)) -> list:
+        """Values of the objectives at `rows`, negated for maximized objectives so all are minimized."""
+        values = []
+        for objective in objectives:
+            column = self.df[objective].to_numpy(dtype=float)[rows]
+            values.append(-column if tc.PARETO_OBJECTIVES[objective] == 'max' else column)
+        return values
+
+    def splice(self, df: pd.DataFrame, old_rows: np.ndarray, changed: dict) -> 'ParetoIndex':
+        """
+        Presort a refreshed leaderboard that shares rows with this one, see `FilterIndex.splice`.
+
+        Objective combinations sorted already are carried over - shared rows are moved to their
+        new positions, added rows and rows with changed objective values are inserted.
+
+        Returns:
+            ParetoIndex: The index of `df`
+        """
+        index = ParetoIndex(df)
+        with self._lock:
+            presorted = dict(self._sorted)
+
+        for objectives, (order, values) in presorted.items():
+            stale = np.logical_or.reduce([old_rows < 0, *[changed[objective] for objective in objectives]])
+            rows = moved_rows(old_rows, stale, len(self.df))[order]
+            keep = rows >= 0
+
+            fresh = np.flatnonzero(stale)
+            fresh_values = index._objective_values(objectives, fresh)
+            present = ~np.logical_or.reduce([np.isnan(v) for v in fresh_values])
+
+            merged = insert_sorted([*[v[keep] for v in values], rows[keep]],
+                                   [*[v[present] for v in fresh_values], fresh[present]])
+            index._sorted[objectives] = (merged[-1], merged[:-1])
+        return index
+
+    def _get_sorted(self, objectives: tuple) -> tuple:
+        """
+        Sort the rows lexicographically by the objectives, once per objective combination.
+
+        Returns:
+            tuple[np.ndarray, list]: Sorted row positions (rows with NaN left out), and the
+            objective values in that order, negated for maximized objectives
+        """
+        with self._lock:
+            if objectives not in self._sorted:
+                values = self._objective_values(objectives)
+                order = np.lexsort(values[::-1])
+                order = order[~np.logical_or.reduce([np.isnan(v[order]) for v in values])]
+                self._sorted[objectives] = (order, [v[order] for v in values])
+            return self._sorted[objectives]
+
+    def frontier(self, objectives, rows=None) -> np.ndarray:
+        """
+        Return the Pareto-optimal rows.
+
+        Args:
+            objectives: Two or three columns of tc.PARETO_OBJECTIVES
+            rows: Positions of the rows to consider, e.g. the result of `FilterIndex.select`.
+                All rows if not given
+
+        Returns:
+            np.ndarray: Positions of the Pareto-optimal rows, in the row order of `df`
+        """
+        objectives = tuple(objectives)
+        if len(objectives) not in (2, 3):
+            raise ValueError(f"Pareto frontier needs 2 or 3 objectives, got {len(objectives)}")
+
+        order, values = self._get_sorted(objectives)
+        if rows is not None:
+            selected = np.zeros(len(self.df), dtype=bool)
+            selected[rows] = True
+            keep = selected[order]
+            order = order[keep]
+            values = [v[keep] for v in values]
+
+        if len(objectives) == 2:
+            mask = frontier_2d(*values)
+        else:
+            mask = frontier_3d(*values)
+
+        return np.sort(order[mask])
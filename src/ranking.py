@@ -0,0 +1,109 @@
+"""
+Weighted multi-criteria top-k ranking
+
+Each criterion of tc.RANKING_CRITERIA is min-max normalized over the candidate models to 0-1,
+1 being the best value, and the composite score is the weighted mean of the normalized values.
+The k best models are picked with np.argpartition in O(n), only those k are sorted and rendered.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.compact import render
+from src.filter_index import FilterIndex
+from src.filter_utils import DISPLAY_COLUMNS
+from src.metrics import timed
+import assets.text_content as tc
+
+
+def normalize_weights(weights: dict) -> tuple:
+    """
+    Resolve weights by criterion to a tuple in the order of tc.RANKING_CRITERIA.
+
+    Missing criteria get a weight of 0.
+
+    Raises:
+        ValueError: If a weight is negative, or all weights are 0
+    """
+    unknown = [c for c in weights if c not in tc.RANKING_CRITERIA]
+    if unknown:
+        raise ValueError(f"Unknown ranking criteria: {unknown}")
+
+    normalized = tuple(float(weights.get(c) or 0) for c in tc.RANKING_CRITERIA)
+    if any(w < 0 for w in normalized):
+        raise ValueError("Ranking weights must not be negative")
+    if not any(normalized):
+        raise ValueError("Give at least one ranking criterion a weight above 0")
+    return normalized
+
+
+def composite_scores(df: pd.DataFrame, rows: np.ndarray, weights: tuple) -> np.ndarray:
+    """
+    Compute the composite score of the candidate rows.
+
+    Args:
+        df (pd.DataFrame): The compact leaderboard
+        rows (np.ndarray): Positions of the candidate rows
+        weights (tuple): Weight per criterion, see `normalize_weights`
+
+    Returns:
+        np.ndarray: Score between 0 and 1 per candidate. Missing values count as the worst value
+    """
+    scores = np.zeros(len(rows))
+    for (criterion, direction), weight in zip(tc.RANKING_CRITERIA.items(), weights):
+        if not weight or not len(rows):
+            continue
+        values = df[criterion].to_numpy()[rows].astype(float)
+        known = ~np.isnan(values)
+        if not known.any():
+            continue
+
+        low, high = values[known].min(), values[known].max()
+        span = high - low
+        normalized = np.ones(len(rows)) if span == 0 else (values - low) / span
+        if direction == 'min' and span:
+            normalized = 1 - normalized
+        scores += weight * np.where(known, normalized, 0)
+    return scores / sum(weights)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return the positions of the k highest scores, best first.
+
+    Ties are broken by position, so the order is deterministic - the leaderboard is sorted by
+    score, the model with the higher clemscore comes first.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    better = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)[:k - len(better)]
+    top = np.concatenate([better, tied])
+    return top[np.lexsort((top, -scores[top]))]
+
+
+def rank(index: FilterIndex, rows: np.ndarray, weights: tuple, k: int) -> pd.DataFrame:
+    """
+    Rank the candidate rows of an index and render the top k.
+
+    Args:
+        index (FilterIndex): Index of the compact leaderboard
+        rows (np.ndarray): Positions of the candidate rows, e.g. the result of `FilterIndex.select`
+        weights (tuple): Weight per criterion, see `normalize_weights`
+        k (int): Number of models to return
+
+    Returns:
+        pd.DataFrame: The display columns of the top k models, best first, with their composite
+        score in tc.RANK_SCORE as 0-100
+    """
+    with timed('rank.top_k') as sizes:
+        scores = composite_scores(index.df, rows, weights)
+        top = top_k(scores, k)
+        sizes['rows'] = len(rows)
+
+    df = render(index.df.iloc[rows[top]], DISPLAY_COLUMNS)
+    df.insert(1, tc.RANK_SCORE, np.round(scores[top] * 100, 1))
+    return df
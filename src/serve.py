@@ -0,0 +1,75 @@
+"""
+Serve the query API from several worker processes
+
+    python -m src.serve --workers 4
+
+The main process builds the leaderboard, publishes it as shared segment (see `shared`) and keeps
+refreshing it in the background. The uvicorn workers map the current segment read-only and
+answer queries in parallel. The Gradio UI keeps its queue and session state in one process and
+is still served by `app.py`.
+"""
+
+import argparse
+import datetime
+import os
+
+import uvicorn
+from fastapi import FastAPI
+
+from src.api import create_api
+from src.leaderboard import build_state, get_state, publish_state, refresh_leaderboard
+from src.shared import attach, follow_segments, publish_segment, read_pointer, read_segment
+from src.snapshot import load_leaderboard
+import assets.text_content as tc
+
+
+def publish_current() -> None:
+    """Publish the current state as segment and keep only its mapped copy in this process."""
+    path = publish_segment(get_state())
+    publish_state(read_segment(path))
+
+
+def refresh_segment() -> bool:
+    """Rebuild the leaderboard and publish it as new segment if it changed, see `refresh_leaderboard`."""
+    if not refresh_leaderboard():
+        return False
+    publish_current()
+    return True
+
+
+def create_worker_app() -> FastAPI:
+    """
+    App factory of the workers - Maps the current segment and follows the pointer to new ones.
+
+    With a single worker uvicorn calls the factory in the main process, which is attached to
+    the current segment already.
+    """
+    if read_pointer() is None:
+        raise RuntimeError(f"No shared leaderboard published in {tc.SHARED_DIR}")
+    attach()
+    follow_segments()
+    return create_api()
+
+
+def start_scheduler() -> None:
+    # Imported on server startup, the workers do not refresh
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    # The first run checks the remote sources right away, the segment is published from the local snapshot
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(refresh_segment, 'interval', seconds=tc.REFRESH_INTERVAL, next_run_time=datetime.datetime.now())
+    scheduler.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the query API from several processes sharing one leaderboard")
+    parser.add_argument('--workers', type=int, default=tc.API_WORKERS, help="Number of worker processes")
+    parser.add_argument('--host', default=os.environ.get("GRADIO_SERVER_NAME", "127.0.0.1"))
+    parser.add_argument('--port', type=int, default=int(os.environ.get("GRADIO_SERVER_PORT", 7860)))
+    args = parser.parse_args()
+
+    publish_state(build_state(load_leaderboard(rebuild=os.environ.get("LLM_CALC_REBUILD") == "1", check_remote=False)))
+    publish_current()
+    start_scheduler()
+
+    uvicorn.run("src.serve:create_worker_app", factory=True, workers=args.workers, host=args.host, port=args.port)
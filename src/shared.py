@@ -0,0 +1,240 @@
+"""
+Read-only leaderboard segments shared by the API worker processes
+
+A segment is a directory in tc.SHARED_DIR with three Arrow IPC files: the compact leaderboard,
+the bitsets of the filter index and its sorted range columns. Worker processes memory-map the
+files, numeric columns and index arrays are used in place, so every worker reads the same pages
+instead of holding its own copy of the frame. The pointer file tc.SHARED_POINTER names the
+current segment - a refresh writes a new segment next to the old one and replaces the pointer,
+workers pick it up on their next poll and swap their state like `leaderboard.publish_state`.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.compact import CATEGORY_COLUMNS, FLOAT_COLUMNS
+from src.facets import load_facets
+from src.filter_index import FilterIndex, SortedColumn
+from src.leaderboard import LeaderboardState, get_state, publish_state
+from src.pareto import ParetoIndex
+import assets.text_content as tc
+
+SEGMENT_META_KEY = b"llm_calculator"
+LEADERBOARD_FILE = "leaderboard.arrow"
+BITSETS_FILE = "bitsets.arrow"
+RANGES_FILE = "ranges.arrow"
+
+INDEX_COLUMN = "__index__"
+BITSET_GROUPS = ['languages', 'licenses', 'modalities', 'model_types']
+
+
+def write_table(path: str, arrays: dict, meta: dict) -> None:
+    """Write equal-length arrays as one record batch of an Arrow IPC file, `meta` in the schema metadata."""
+    table = pa.table({name: pa.array(values) for name, values in arrays.items()})
+    table = table.replace_schema_metadata({SEGMENT_META_KEY: json.dumps(meta, default=str)})
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def map_table(path: str) -> tuple:
+    """
+    Memory-map an Arrow IPC file written by `write_table`.
+
+    Returns:
+        tuple[pa.Table, dict]: The table, its buffers pointing into the mapped file, and its metadata
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table, json.loads(table.schema.metadata[SEGMENT_META_KEY])
+
+
+def column_array(table: pa.Table, name: str) -> np.ndarray:
+    """Return a column without nulls as a read-only numpy view of the mapped file."""
+    column = table.column(name)
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=True)
+    return column.to_numpy()
+
+
+def write_segment(state: LeaderboardState, path: str) -> None:
+    """
+    Write the leaderboard and filter index of a state as a segment directory.
+
+    Args:
+        state (LeaderboardState): See `leaderboard.build_state`
+        path (str): Segment directory, written next to it and renamed once complete
+    """
+    df, index = state.leaderboard, state.index
+    partial = path + '.partial'
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    # Nullable and boolean columns are stored as plain numbers, so they can be mapped without conversion
+    arrays = {
+        INDEX_COLUMN: df.index.to_numpy(dtype=np.int64),
+        tc.MODEL_NAME: df[tc.MODEL_NAME].astype(str).to_numpy(),
+        **{col: df[col].to_numpy(dtype=np.float32) for col in FLOAT_COLUMNS},
+        tc.RELEASE_DATE: df[tc.RELEASE_DATE].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        tc.OPEN_WEIGHT: df[tc.OPEN_WEIGHT].to_numpy(dtype=bool).view(np.uint8),
+        tc.LANGS: pa.array(list(df[tc.LANGS]), type=pa.binary()),
+        tc.CONTEXT: df[tc.CONTEXT].to_numpy(dtype=np.int32),
+        **{col: df[col].cat.codes.to_numpy() for col in CATEGORY_COLUMNS},
+        tc.MODALITIES: df[tc.MODALITIES].to_numpy(dtype=np.uint8),
+    }
+    meta = {
+        'snapshot_id': state.snapshot_id,
+        'facets': state.facets,
+        'attrs': df.attrs,
+        'categories': {col: list(df[col].cat.categories) for col in CATEGORY_COLUMNS},
+    }
+    write_table(os.path.join(partial, LEADERBOARD_FILE), arrays, meta)
+
+    # One column per bitset, all bitsets have the same number of bytes
+    bitsets = [(group, value, bits) for group in BITSET_GROUPS for value, bits in getattr(index, group).items()]
+    write_table(os.path.join(partial, BITSETS_FILE),
+                {str(i): bits for i, (_, _, bits) in enumerate(bitsets)},
+                {'bitsets': [[group, value] for group, value, _ in bitsets], 'bytes': len(index.all_rows)})
+
+    # Sorted values and rows padded to the number of rows, NaN rows are left out of a SortedColumn
+    columns = {**index.ranges, **({'dates': index.dates} if index.dates is not None else {})}
+    ranges = {}
+    for name, column in columns.items():
+        for part in ['values', 'rows']:
+            padded = np.zeros(index.n_rows, dtype=getattr(column, part).dtype)
+            padded[:len(column.values)] = getattr(column, part)
+            ranges[f'{name}.{part}'] = padded
+    write_table(os.path.join(partial, RANGES_FILE), ranges,
+                {'ranges': {name: len(column.values) for name, column in columns.items()}})
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(partial, path)
+
+
+def read_segment(path: str) -> LeaderboardState:
+    """
+    Map a segment directory written by `write_segment`.
+
+    Returns:
+        LeaderboardState: The state, its numeric columns and filter index backed by the mapped files
+    """
+    table, meta = map_table(os.path.join(path, LEADERBOARD_FILE))
+
+    columns = {
+        tc.MODEL_NAME: pd.arrays.ArrowExtensionArray(table.column(tc.MODEL_NAME)),
+        **{col: column_array(table, col) for col in FLOAT_COLUMNS},
+        tc.RELEASE_DATE: column_array(table, tc.RELEASE_DATE).view('datetime64[ns]'),
+        tc.OPEN_WEIGHT: column_array(table, tc.OPEN_WEIGHT).view(bool),
+        tc.CONTEXT: column_array(table, tc.CONTEXT),
+        **{col: pd.Categorical.from_codes(column_array(table, col), meta['categories'][col])
+           for col in CATEGORY_COLUMNS},
+        tc.MODALITIES: column_array(table, tc.MODALITIES),
+    }
+
+    # Rows with the same languages share one bytes object, as in `compact.pack_languages`
+    interned = {}
+    langs = [interned.setdefault(bits, bits) if bits is not None else None
+             for bits in table.column(tc.LANGS).to_pylist()]
+    columns[tc.LANGS] = np.array(langs + [None], dtype=object)[:-1]
+
+    order = [tc.MODEL_NAME, *FLOAT_COLUMNS, tc.RELEASE_DATE, tc.OPEN_WEIGHT, tc.LANGS, tc.CONTEXT,
+             *CATEGORY_COLUMNS, tc.MODALITIES]
+    df = pd.DataFrame({col: columns[col] for col in order}, index=pd.Index(column_array(table, INDEX_COLUMN)),
+                      copy=False)
+    df.attrs = meta['attrs']
+
+    bitset_table, bitset_meta = map_table(os.path.join(path, BITSETS_FILE))
+    bitsets = {group: {} for group in BITSET_GROUPS}
+    for i, (group, value) in enumerate(bitset_meta['bitsets']):
+        bitsets[group][value] = column_array(bitset_table, str(i))
+
+    range_table, range_meta = map_table(os.path.join(path, RANGES_FILE))
+    ranges = {
+        name: SortedColumn.from_sorted(column_array(range_table, f'{name}.values')[:count],
+                                       column_array(range_table, f'{name}.rows')[:count])
+        for name, count in range_meta['ranges'].items()
+    }
+    dates = ranges.pop('dates', None)
+
+    return LeaderboardState(
+        snapshot_id=meta['snapshot_id'],
+        leaderboard=df,
+        facets=load_facets(meta),
+        index=FilterIndex.restore(df, bitsets, ranges, dates),
+        pareto=ParetoIndex(df),
+    )
+
+
+def read_pointer(directory: str = None) -> str:
+    """Return the name of the current segment, None if no segment was published yet."""
+    try:
+        with open(os.path.join(directory or tc.SHARED_DIR, tc.SHARED_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_segment(state: LeaderboardState, directory: str = None) -> str:
+    """
+    Write a state as segment and make it the current one.
+
+    The pointer file is replaced atomically, workers see either the old or the new segment.
+    Segments older than the last tc.MAX_LIVE_SNAPSHOTS are removed - workers still mapping one
+    keep reading it until they unmap it.
+
+    Returns:
+        str: Path of the segment directory
+    """
+    directory = directory or tc.SHARED_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, state.snapshot_id)
+    if read_pointer(directory) != state.snapshot_id:
+        write_segment(state, path)
+
+    pointer = os.path.join(directory, tc.SHARED_POINTER)
+    with open(pointer + '.partial', 'w') as f:
+        f.write(state.snapshot_id)
+    os.replace(pointer + '.partial', pointer)
+
+    segments = [entry for entry in os.scandir(directory) if entry.is_dir() and not entry.name.endswith('.partial')]
+    segments.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in segments[tc.MAX_LIVE_SNAPSHOTS:]:
+        if entry.name != state.snapshot_id:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return path
+
+
+def attach(directory: str = None) -> bool:
+    """
+    Publish the current segment as the leaderboard state of this process, if it is not already.
+
+    Returns:
+        bool: True if a new segment was mapped, False if there is none or it is mapped already
+    """
+    directory = directory or tc.SHARED_DIR
+    snapshot_id = read_pointer(directory)
+    current = get_state()
+    if snapshot_id is None or (current is not None and current.snapshot_id == snapshot_id):
+        return False
+    publish_state(read_segment(os.path.join(directory, snapshot_id)))
+    return True
+
+
+def follow_segments(directory: str = None, interval: float = tc.SHARED_POLL) -> threading.Thread:
+    """Map new segments in a background thread, checking the pointer file every `interval` seconds."""
+    def poll():
+        while True:
+            time.sleep(interval)
+            try:
+                attach(directory)
+            except Exception as e:
+                print(f"Error mapping the shared leaderboard, keeping the current one: {e}")
+
+    thread = threading.Thread(target=poll, name='follow-segments', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,178 @@
+"""
+Versioned on-disk snapshot of the merged leaderboard
+
+The output of `merge_data` is stored as a Parquet file in tc.SNAPSHOT_DIR together with the
+fingerprints of the sources it was built from and the facets of the leaderboard. Later starts
+load the snapshot instead of downloading every source again, a rebuild only happens when a
+source changes or when forced.
+"""
+
+import hashlib
+import json
+import os
+import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.collect_data import fetch_source_fingerprints
+from src.facets import get_facets
+from src.process_data import merge_data, PRICING_PATH
+import assets.text_content as tc
+
+SNAPSHOT_META_KEY = b"llm_calculator"
+
+
+def get_snapshot_path() -> str:
+    return os.path.join(tc.SNAPSHOT_DIR, tc.SNAPSHOT_FILE)
+
+
+def get_local_fingerprints() -> dict:
+    """
+    Fingerprint the local sources of `merge_data`.
+
+    Returns:
+        dict: Mapping of source path to the sha256 of its content
+    """
+    with open(PRICING_PATH, 'rb') as f:
+        return {PRICING_PATH: hashlib.sha256(f.read()).hexdigest()}
+
+
+def read_snapshot_meta(path: str = None) -> dict:
+    """
+    Read the metadata of a snapshot without loading the table.
+
+    Args:
+        path (str): Path of the snapshot file, defaults to the configured snapshot
+
+    Returns:
+        dict: Snapshot metadata with keys `snapshot_id`, `version`, `created_at`, `rows`, `fingerprints`
+        and `facets` (see `facets.get_facets`).
+        Returns None if there is no readable snapshot.
+    """
+    path = path or get_snapshot_path()
+    if not os.path.exists(path):
+        return None
+
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        return json.loads(metadata[SNAPSHOT_META_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowException) as e:
+        print(f"Error reading snapshot metadata - {path}: {e}")
+        return None
+
+
+def save_snapshot(df: pd.DataFrame, fingerprints: dict, path: str = None) -> dict:
+    """
+    Write the merged leaderboard and its source fingerprints to disk.
+
+    The file is written next to the target and moved into place, so a concurrent reader
+    either sees the previous snapshot or the new one.
+
+    Args:
+        df (pd.DataFrame): Output of `merge_data`
+        fingerprints (dict): Source fingerprints the frame was built from
+        path (str): Path of the snapshot file, defaults to the configured snapshot
+
+    Returns:
+        dict: Metadata stored with the snapshot
+    """
+    path = path or get_snapshot_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    created_at = datetime.datetime.now().isoformat()
+    snapshot_id = hashlib.sha256((json.dumps(fingerprints, sort_keys=True) + created_at).encode()).hexdigest()[:12]
+    meta = {
+        'snapshot_id': snapshot_id,
+        'version': tc.SNAPSHOT_VERSION,
+        'created_at': created_at,
+        'rows': len(df),
+        'fingerprints': fingerprints,
+        'facets': get_facets(df),
+    }
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[SNAPSHOT_META_KEY] = json.dumps(meta).encode()
+    table = table.replace_schema_metadata(schema_metadata)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+    return meta
+
+
+def load_snapshot(path: str = None) -> pd.DataFrame:
+    """
+    Load a snapshot written by `save_snapshot`.
+
+    Args:
+        path (str): Path of the snapshot file, defaults to the configured snapshot
+
+    Returns:
+        pd.DataFrame: The merged leaderboard, with the snapshot metadata in `df.attrs['snapshot']`
+    """
+    path = path or get_snapshot_path()
+    table = pq.read_table(path, memory_map=True)
+    df = table.to_pandas()
+    df.attrs['snapshot'] = json.loads(table.schema.metadata[SNAPSHOT_META_KEY])
+    return df
+
+
+def is_snapshot_current(meta: dict, fingerprints: dict) -> bool:
+    """Check if a snapshot was built by this code version from the given sources."""
+    if meta is None or meta.get('version') != tc.SNAPSHOT_VERSION:
+        return False
+    return all(meta['fingerprints'].get(source) == fp for source, fp in fingerprints.items())
+
+
+def load_leaderboard(rebuild: bool = False, check_remote: bool = True) -> pd.DataFrame:
+    """
+    Return the merged leaderboard, rebuilding the snapshot only if needed.
+
+    The snapshot is reused as long as its format version and the local pricing file match.
+    With `check_remote`, the remote sources are fingerprinted as well (HEAD requests only).
+    If they can not be reached the existing snapshot is used, so a slow or unavailable
+    GitHub does not keep the app from starting.
+
+    Args:
+        rebuild (bool): Rebuild the snapshot regardless of the fingerprints
+        check_remote (bool): Compare the fingerprints of the remote sources
+
+    Returns:
+        pd.DataFrame: The merged leaderboard, with the snapshot metadata in `df.attrs['snapshot']`
+    """
+    meta = read_snapshot_meta()
+    fingerprints = get_local_fingerprints()
+
+    if not rebuild and is_snapshot_current(meta, fingerprints):
+        if not check_remote:
+            return load_snapshot()
+
+        remote_fingerprints = fetch_source_fingerprints()
+        if remote_fingerprints is None:
+            print("Sources unreachable, using the existing snapshot")
+            return load_snapshot()
+        if is_snapshot_current(meta, remote_fingerprints):
+            return load_snapshot()
+        fingerprints.update(remote_fingerprints)
+    else:
+        fingerprints.update(fetch_source_fingerprints() or {})
+
+    try:
+        df = merge_data()
+    except Exception as e:
+        if meta is None or meta.get('version') != tc.SNAPSHOT_VERSION:
+            raise
+        print(f"Error rebuilding the leaderboard, using the existing snapshot: {e}")
+        return load_snapshot()
+
+    df.attrs['snapshot'] = save_snapshot(df, fingerprints)
+    return df
+
+
+if __name__ == "__main__":
+    load_leaderboard(rebuild=True)
+    print(f"Snapshot written to {get_snapshot_path()}")
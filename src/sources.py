@@ -0,0 +1,223 @@
+"""
+Pluggable backends for the data sources of collect_data
+
+Every source file is addressed by its path within the clembench-runs repository (the version
+index, results and latency files), the model registry by tc.REGISTRY_FILE. The backend is
+chosen with tc.SOURCE_BACKEND:
+    - remote: GitHub raw, at CLEMBENCH_RUNS_REPO and REGISTRY_URL
+    - local: a mirror directory with the same layout, see `collect_data.sync_mirror`
+    - fixture: the mirror directory served over HTTP on a local port, for exercising the
+      HTTP path without network access
+"""
+
+import functools
+import hashlib
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from assets.text_content import CLEMBENCH_RUNS_REPO, REGISTRY_URL, REGISTRY_FILE, SOURCE_BACKEND, MIRROR_DIR, FINGERPRINT_TIMEOUT, REQUEST_TIMEOUT, FETCH_WORKERS
+
+_session = None
+_session_lock = threading.Lock()
+
+_source = None
+_source_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the shared HTTP session, created on first use.
+
+    The connection pool is sized for FETCH_WORKERS, so concurrent requests to the same
+    host reuse open connections instead of opening a new one per request.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def validate_request(url: str, response) -> bool:
+    """
+    Validate if an HTTP request was successful.
+
+    Args:
+        url (str): The URL that was requested
+        response (requests.Response): The response object from the request
+
+    Returns:
+        bool: True if request was successful (status code 200), False otherwise
+    """
+
+    if response.status_code != 200:
+        print(f"Failed to read file - {url}. Status Code: {response.status_code}")
+        return False
+    return True
+
+
+class HTTPSource:
+    """
+    Sources served over HTTP, GitHub raw by default.
+
+    Args:
+        runs_url (str): Base URL of the clembench-runs repository, with a trailing slash
+        registry_url (str): URL of the model registry
+    """
+
+    def __init__(self, runs_url: str = CLEMBENCH_RUNS_REPO, registry_url: str = REGISTRY_URL):
+        self.runs_url = runs_url
+        self.registry_url = registry_url
+
+    def location(self, path: str) -> str:
+        """Return the URL of a source file."""
+        if path == REGISTRY_FILE:
+            return self.registry_url
+        return self.runs_url + path.replace(os.sep, '/')
+
+    def read(self, path: str, timeout: float = REQUEST_TIMEOUT) -> bytes:
+        """
+        Download a source file.
+
+        Returns:
+            bytes: The file content.
+            Returns None if the request fails.
+        """
+        url = self.location(path)
+        try:
+            response = get_session().get(url, timeout=timeout)
+            if not validate_request(url, response):
+                return None
+            return response.content
+        except requests.RequestException as e:
+            print(f"Error fetching {url}: {e}")
+        return None
+
+    def fingerprint(self, path: str, timeout: float = FINGERPRINT_TIMEOUT) -> str:
+        """
+        Fetch a cheap fingerprint of a source file without downloading it.
+
+        Uses the ETag (or Last-Modified) header of a HEAD request, which GitHub raw
+        serves for every file. Falls back to hashing the body if neither header is set.
+
+        Returns:
+            str: Fingerprint of the source.
+            Returns None if the source can not be reached.
+        """
+        url = self.location(path)
+        try:
+            response = get_session().head(url, timeout=timeout, allow_redirects=True)
+            if not validate_request(url, response):
+                return None
+
+            fingerprint = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            if fingerprint:
+                return fingerprint
+        except requests.RequestException as e:
+            print(f"Error fetching fingerprint for {url}: {e}")
+            return None
+
+        content = self.read(path, timeout=timeout)
+        return hashlib.sha256(content).hexdigest() if content is not None else None
+
+
+class LocalSource:
+    """
+    Sources read from a mirror directory.
+
+    Args:
+        directory (str): Root of the mirror, laid out like the clembench-runs repository
+    """
+
+    def __init__(self, directory: str = MIRROR_DIR):
+        self.directory = directory
+
+    def location(self, path: str) -> str:
+        """Return the path of a source file in the mirror."""
+        return os.path.join(self.directory, path)
+
+    def read(self, path: str) -> bytes:
+        """
+        Read a source file.
+
+        Returns:
+            bytes: The file content.
+            Returns None if the file is missing or can not be read.
+        """
+        try:
+            with open(self.location(path), 'rb') as f:
+                return f.read()
+        except OSError as e:
+            print(f"Failed to read file - {self.location(path)}: {e}")
+        return None
+
+    def fingerprint(self, path: str) -> str:
+        """Return the sha256 of a source file, None if it can not be read."""
+        content = self.read(path)
+        return hashlib.sha256(content).hexdigest() if content is not None else None
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureSource(HTTPSource):
+    """
+    A mirror directory served over HTTP on a free local port, read through the HTTP backend.
+
+    Args:
+        directory (str): Root of the mirror, laid out like the clembench-runs repository
+    """
+
+    def __init__(self, directory: str = MIRROR_DIR):
+        handler = functools.partial(QuietHandler, directory=directory)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        super().__init__(base_url, base_url + REGISTRY_FILE)
+
+    def close(self) -> None:
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def create_source(backend: str = SOURCE_BACKEND, directory: str = MIRROR_DIR):
+    """
+    Create the source backend named `backend`, see the module docstring.
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == 'remote':
+        return HTTPSource()
+    if backend == 'local':
+        return LocalSource(directory)
+    if backend == 'fixture':
+        return FixtureSource(directory)
+    raise ValueError(f"Unknown source backend: {backend}, expected 'remote', 'local' or 'fixture'")
+
+
+def get_source():
+    """Return the configured source backend, created on first use."""
+    global _source
+    with _source_lock:
+        if _source is None:
+            _source = create_source()
+        return _source
+
+
+def set_source(source) -> None:
+    """Replace the source backend, e.g. with a mirror in benchmarks."""
+    global _source
+    with _source_lock:
+        _source = source
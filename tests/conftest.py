@@ -0,0 +1,29 @@
+"""
+Shared fixtures - merged leaderboards built from generated sources, see `benchmarks.synthetic`
+"""
+
+import pytest
+
+from benchmarks.synthetic import generate_fixtures
+import src.process_data as process_data
+from src.sources import LocalSource, get_source, set_source
+
+
+def merge_generated(directory: str, n_models: int):
+    """Run `merge_data` on generated sources of `n_models` models."""
+    paths = generate_fixtures(directory, n_models)
+
+    saved = get_source()
+    set_source(LocalSource(paths['runs']))
+    try:
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(process_data, 'PRICING_PATH', paths['pricing'])
+            return process_data.merge_data()
+    finally:
+        set_source(saved)
+
+
+@pytest.fixture(scope='session')
+def merged(tmp_path_factory):
+    """The merged leaderboard of 400 generated models."""
+    return merge_generated(str(tmp_path_factory.mktemp('merged')), 400)
@@ -0,0 +1,49 @@
+"""
+Validation of the query parameters of the query API
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import create_api
+from src.filter_utils import current_year
+from src.leaderboard import build_state, publish_state
+
+ROUTES = ['/api/leaderboard', '/api/ranking', '/api/facets']
+
+
+@pytest.fixture(scope='module')
+def client(merged):
+    publish_state(build_state(merged))
+    return TestClient(create_api())
+
+
+@pytest.mark.parametrize('route', ROUTES)
+@pytest.mark.parametrize('params', [
+    {'start_year': 'abc'},
+    {'end_year': '20x4'},
+    {'start_year': '0'},
+    {'end_year': '99999'},
+    {'end_year': str(int(current_year) + 1)},
+    {'start_month': 'Foo'},
+    {'parameters_min': 'nan'},
+    {'input_price_max': 'inf'},
+    {'context_min': '-inf'},
+])
+def test_invalid_params_are_rejected(client, route, params):
+    assert client.get(route, params=params).status_code == 400
+
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_valid_dates_are_accepted(client, route):
+    params = {'start_year': '2023', 'start_month': 'March', 'end_year': current_year, 'end_month': 'May'}
+    assert client.get(route, params=params).status_code == 200
+
+
+def test_date_filter_is_applied(client):
+    everything = client.get('/api/leaderboard').json()['total']
+    assert client.get('/api/leaderboard', params={'start_year': current_year}).json()['total'] < everything
@@ -0,0 +1,27 @@
+"""
+Round trip of the leaderboard through `export_leaderboard` and `import_leaderboard`
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import pandas as pd
+import pytest
+
+from src.export import export_leaderboard, import_leaderboard
+import assets.text_content as tc
+
+
+@pytest.mark.parametrize('extension', ['arrow', 'parquet'])
+def test_import_returns_the_exported_leaderboard(merged, tmp_path, extension):
+    df = merged.reset_index(drop=True)
+    df.attrs = {'snapshot': {'snapshot_id': 'exported'}}
+    path = str(tmp_path / f'leaderboard.{extension}')
+
+    export_leaderboard(df, path)
+    imported = import_leaderboard(path)
+
+    assert imported.attrs['snapshot']['snapshot_id'] == 'exported'
+    assert all(isinstance(langs, list) for langs in imported[tc.LANGS] if langs is not None)
+    pd.testing.assert_frame_equal(imported, df)
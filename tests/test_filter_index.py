@@ -0,0 +1,165 @@
+"""
+Equivalence of the bitset filter index with the DataFrame mask chain it replaced
+
+`reference_filter` is `filter_utils.filter` as it was before the index, applied to the output of
+`merge_data`. The release dates are read from TEMP_DATE, which holds epoch seconds now (see
+`compact.release_epochs`) instead of dates. The mask chain matches licenses by substring, the
+index by exact name - the same thing for the generated licenses, none contains another.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import random
+
+import pandas as pd
+import pytest
+
+from src.filter_utils import current_year, filter_by_date, get_date_range
+from src.leaderboard import build_state
+import assets.text_content as tc
+
+MODALITIES = [tc.TEXT, tc.SINGLE_IMG, tc.MULT_IMG, tc.AUDIO, tc.VIDEO]
+
+
+def reference_filter_by_date(df, start_year, start_month, end_year, end_month):
+    try:
+        start_timestamp, end_timestamp = get_date_range(start_year, start_month, end_year, end_month)
+        date_timestamps = df[tc.TEMP_DATE].astype(int)
+        return df[(date_timestamps >= start_timestamp) & (date_timestamps <= end_timestamp)]
+    except (ValueError, TypeError):
+        return df
+
+
+def reference_filter(df, language_list, parameters, input_price, output_price, multimodal,
+                     context, open_weight, start_year, start_month, end_year, end_month, license):
+    if not df.empty:
+        df = df[df[tc.LANGS].apply(lambda x: all(lang in x for lang in language_list))]
+
+    if not df.empty:
+        df = df[(df[tc.DUMMY_PARAMS] >= parameters[0]) & (df[tc.DUMMY_PARAMS] <= parameters[1])]
+
+    if not df.empty:
+        df = df[(df[tc.INPUT] >= input_price[0]) & (df[tc.INPUT] <= input_price[1])]
+
+    if not df.empty:
+        df = df[(df[tc.OUTPUT] >= output_price[0]) & (df[tc.OUTPUT] <= output_price[1])]
+
+    if not df.empty:
+        if tc.TEXT in multimodal:
+            df = df[(df[tc.SINGLE_IMG] == False) & (df[tc.MULT_IMG] == False) & (df[tc.AUDIO] == False) & (df[tc.VIDEO] == False)]
+        if tc.SINGLE_IMG in multimodal:
+            df = df[df[tc.SINGLE_IMG] == True]
+        if tc.MULT_IMG in multimodal:
+            df = df[df[tc.MULT_IMG] == True]
+        if tc.AUDIO in multimodal:
+            df = df[df[tc.AUDIO] == True]
+        if tc.VIDEO in multimodal:
+            df = df[df[tc.VIDEO] == True]
+
+    if not df.empty:
+        context_size = pd.to_numeric(df[tc.CONTEXT], errors='coerce').fillna(0)
+        df = df[(context_size >= context[0]) & (context_size <= context[1])]
+
+    if not df.empty:
+        if tc.OPEN in open_weight and tc.COMM not in open_weight:
+            df = df[df[tc.OPEN_WEIGHT] == True]
+        elif tc.COMM in open_weight and tc.OPEN not in open_weight:
+            df = df[df[tc.OPEN_WEIGHT] == False]
+        elif tc.OPEN not in open_weight and tc.COMM not in open_weight:
+            df = df.iloc[:0]
+
+    if not df.empty:
+        df = df[df[tc.LICENSE_NAME].apply(lambda x: any(lic in x for lic in license))]
+
+    return reference_filter_by_date(df, start_year, start_month, end_year, end_month)
+
+
+def reference_facet_counts(df, language_list, parameters, input_price, output_price, multimodal,
+                           context, open_weight, start_year, start_month, end_year, end_month, license,
+                           facets) -> dict:
+    """Counts of `FilterIndex.facet_counts` - the number of models left with each choice added or chosen alone."""
+    def count(**changes):
+        filters = dict(language_list=language_list, parameters=parameters, input_price=input_price,
+                       output_price=output_price, multimodal=multimodal, context=context,
+                       open_weight=open_weight, start_year=start_year, start_month=start_month,
+                       end_year=end_year, end_month=end_month, license=license)
+        return len(reference_filter(df, **{**filters, **changes}))
+
+    return {
+        'languages': {code: count(language_list=[*language_list, code]) for code in facets['languages']},
+        'modalities': {value: count(multimodal=[*multimodal, value]) for value in facets['modalities']},
+        'licenses': {value: count(license=[value]) for value in facets['licenses']},
+        'model_types': {value: count(open_weight=[value]) for value in facets['model_types']},
+    }
+
+
+def random_filters(state, rng: random.Random) -> list:
+    """A random selection of the filter controls, each control left at its widest setting or changed."""
+    facets = state.facets
+    codes = [code for _, code in facets['langs']]
+    years = [str(year) for year in range(int(tc.START_YEAR), int(current_year) + 1)]
+
+    def changed(value, default, share=0.3):
+        return value() if rng.random() < share else default
+
+    def value_range(high):
+        return changed(lambda: sorted(rng.uniform(0, high) for _ in range(2)), (0, high))
+
+    start_year = changed(lambda: rng.choice(years), [])
+    end_year = changed(lambda: rng.choice([year for year in years if year >= (start_year or years[0])]), [])
+    return [
+        changed(lambda: rng.sample(codes, rng.randint(1, 2)), []),
+        value_range(facets['max_parameter']),
+        value_range(facets['max_input_price']),
+        value_range(facets['max_output_price']),
+        changed(lambda: [rng.choice(MODALITIES)], []),
+        changed(lambda: sorted(rng.choice([0, 4, 8, 32, 128, 1000]) for _ in range(2)), (0, facets['max_context'])),
+        changed(lambda: rng.choice([[tc.OPEN], [tc.COMM], []]), [tc.OPEN, tc.COMM]),
+        start_year, changed(lambda: rng.choice(list(tc.MONTH_MAP)), []),
+        end_year, changed(lambda: rng.choice(list(tc.MONTH_MAP)), []),
+        changed(lambda: rng.sample(facets['licenses'], rng.randint(1, len(facets['licenses']))), facets['licenses']),
+    ]
+
+
+@pytest.fixture(scope='module')
+def state(merged):
+    return build_state(merged)
+
+
+def test_select_matches_mask_chain(state, merged):
+    rng = random.Random(0)
+    names = state.leaderboard[tc.MODEL_NAME].to_numpy(dtype=object)
+    for _ in range(300):
+        filters = random_filters(state, rng)
+        date_range = get_date_range(*filters[7:11])
+        rows = state.index.select(*filters[:7], date_range, filters[11])
+        expected = reference_filter(merged, *filters)
+        assert sorted(names[rows]) == sorted(expected[tc.MODEL_NAME]), filters
+
+
+def test_facet_counts_match_mask_chain(state, merged):
+    rng = random.Random(1)
+    facets = {
+        'languages': list(state.index.languages),
+        'modalities': list(state.index.modalities),
+        'licenses': list(state.index.licenses),
+        'model_types': list(state.index.model_types),
+    }
+    for _ in range(15):
+        filters = random_filters(state, rng)
+        date_range = get_date_range(*filters[7:11])
+        counts = state.index.facet_counts(*filters[:7], date_range, filters[11])
+        assert counts == reference_facet_counts(merged, *filters, facets=facets), filters
+
+
+def test_filter_by_date_matches_mask_chain(state, merged):
+    rng = random.Random(2)
+    for _ in range(100):
+        dates = random_filters(state, rng)[7:11]
+        expected = reference_filter_by_date(merged, *dates)
+        pd.testing.assert_frame_equal(filter_by_date(merged, *dates), expected)
+
+        by_index = filter_by_date(state.leaderboard, *dates, index=state.index)
+        assert sorted(by_index[tc.MODEL_NAME]) == sorted(expected[tc.MODEL_NAME])
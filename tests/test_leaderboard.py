@@ -0,0 +1,280 @@
+"""
+Refreshes of the live leaderboard state
+
+`update_state` splices the filter and Pareto indexes of the previous state and carries cached
+results over, both must be indistinguishable from a state built from scratch with `build_state`.
+`refresh_leaderboard` is run with a stub loader in place of `snapshot.load_leaderboard`, so no
+source is fetched.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import leaderboard
+from src.changelog import read_changelog
+from src.api import default_filters
+from src.filter_cache import filter_cache
+from src.filter_utils import filter, get_rows
+from src.ranking import rank
+import assets.text_content as tc
+
+PARETO_COMBINATIONS = [(tc.CLEMSCORE, tc.INPUT), (tc.CLEMSCORE, tc.LATENCY), (tc.CLEMSCORE, tc.INPUT, tc.LATENCY)]
+
+
+def filter_states(state: leaderboard.LeaderboardState, n: int, seed: int = 0) -> list:
+    """Filter selections that change one or two filters of the widest selection, as sessions mostly do."""
+    rng = random.Random(seed)
+    licenses = list(state.facets['licenses'])
+    languages = list(state.index.languages)
+
+    def change(filters):
+        choice = rng.randrange(6)
+        if choice == 0:
+            filters['license'] = rng.sample(licenses, rng.randint(1, len(licenses) - 1))
+        elif choice == 1:
+            filters['open_weight'] = [rng.choice([tc.OPEN, tc.COMM])]
+        elif choice == 2:
+            filters['language_list'] = rng.sample(languages, rng.randint(1, 2))
+        elif choice == 3:
+            filters['input_price'] = (0, round(rng.uniform(0, filters['input_price'][1]), 2))
+        elif choice == 4:
+            filters['multimodal'] = [rng.choice([tc.TEXT, tc.SINGLE_IMG])]
+        else:
+            filters['start_year'], filters['start_month'] = str(rng.randint(2021, 2025)), 'March'
+
+    states = []
+    for _ in range(n):
+        filters = default_filters(state)
+        for _ in range(rng.randint(1, 2)):
+            change(filters)
+        states.append(list(filters.values()))
+    return states
+
+
+def fill_cache(state: leaderboard.LeaderboardState, states: list) -> None:
+    for filters in states:
+        leaderboard.filter_with_counts(state.snapshot_id, *filters)
+        leaderboard.ranked_leaderboard(state.snapshot_id, tc.DEFAULT_RANKING_WEIGHTS, 10, *filters)
+        leaderboard.pareto_leaderboard(state.snapshot_id, tc.DEFAULT_PARETO_OBJECTIVES, *filters)
+
+
+def assert_same_index(spliced, fresh) -> None:
+    for group in ['languages', 'licenses', 'modalities', 'model_types']:
+        bitsets, expected = getattr(spliced, group), getattr(fresh, group)
+        assert list(bitsets) == list(expected), group
+        for value in expected:
+            np.testing.assert_array_equal(bitsets[value], expected[value], err_msg=f"{group} {value}")
+
+    columns = {**spliced.ranges, 'dates': spliced.dates}
+    expected_columns = {**fresh.ranges, 'dates': fresh.dates}
+    for name, column in expected_columns.items():
+        if column is None:
+            assert columns[name] is None, name
+            continue
+        np.testing.assert_array_equal(columns[name].values, column.values, err_msg=name)
+        np.testing.assert_array_equal(columns[name].rows, column.rows, err_msg=name)
+
+
+def recompute(state: leaderboard.LeaderboardState, filter_state: tuple, *extra):
+    """Compute a cache entry of `state` without the cache."""
+    rows = state.index.select(*filter_state)
+    if not extra:
+        return get_rows(state.index, rows)
+    if extra == ('facet_counts',):
+        return state.index.facet_counts(*filter_state)
+    if extra[0] == 'rank':
+        return rank(state.index, rows, extra[1], extra[2])
+    return get_rows(state.index, state.pareto.frontier(extra[0], rows))
+
+
+def with_sample(df: pd.DataFrame, rng: random.Random, n: int, update) -> pd.DataFrame:
+    """Copy of `df` with `update(df, row label)` applied to `n` random rows."""
+    df = df.copy()
+    for label in rng.sample(list(df.index), n):
+        update(df, label)
+    return df
+
+
+def setting(column, value):
+    """Row update of `with_sample` that sets `column` to `value(current value)`."""
+    def update(df, label):
+        df.at[label, column] = value(df.at[label, column])
+    return update
+
+
+def switch_license(df, label):
+    licenses = [l for l in pd.unique(df[tc.LICENSE_NAME]) if l != df.at[label, tc.LICENSE_NAME]]
+    df.at[label, tc.LICENSE_NAME] = licenses[label % len(licenses)]
+
+
+def languages(df, label):
+    df.at[label, tc.LANGS] = ['de', 'ww']
+
+
+def added_models(df, rng):
+    extra = df.loc[rng.sample(list(df.index), 4)].copy()
+    extra[tc.MODEL_NAME] = [f'added-model-{i}' for i in range(len(extra))]
+    extra[tc.LANGS] = [['en', 'zz'], ['yy'], None, ['de']]
+    return pd.concat([df, extra], ignore_index=True)
+
+
+SCENARIOS = {
+    'prices': lambda df, rng: with_sample(df, rng, 5, setting(tc.INPUT, lambda price: price + 7.5)),
+    'unchanged': lambda df, rng: df.copy(),
+    'shuffled': lambda df, rng: df.sample(frac=1, random_state=1).reset_index(drop=True),
+    'scores move': lambda df, rng: with_sample(df, rng, 5, setting(tc.CLEMSCORE, lambda score: rng.uniform(0, 100))),
+    'removed': lambda df, rng: df.drop(index=rng.sample(list(df.index), 3)).reset_index(drop=True),
+    'added': added_models,
+    'licenses switched': lambda df, rng: with_sample(df, rng, 15, switch_license),
+    'model types switched': lambda df, rng: with_sample(df, rng, 15, setting(tc.OPEN_WEIGHT, lambda open_weight: not open_weight)),
+    'languages changed': lambda df, rng: with_sample(df, rng, 4, languages),
+    'missing date': lambda df, rng: with_sample(df, rng, 1, setting(tc.RELEASE_DATE, lambda date: 'unknown')),
+}
+
+
+@pytest.fixture
+def published(merged):
+    """The state of the generated leaderboard, published with a filled result cache."""
+    df = merged.copy()
+    df.attrs = {'snapshot': {'snapshot_id': 'before'}}
+    filter_cache.invalidate()
+    state = leaderboard.build_state(df)
+    leaderboard.publish_state(state)
+    fill_cache(state, filter_states(state, 40))
+    for objectives in PARETO_COMBINATIONS:
+        state.pareto.frontier(objectives)
+    yield state
+    filter_cache.invalidate()
+
+
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+def test_update_state_matches_build_state(published, merged, scenario):
+    df = SCENARIOS[scenario](merged, random.Random(scenario))
+    df[tc.LANGS] = df[tc.LANGS].astype(object)
+    df.attrs = {'snapshot': {'snapshot_id': 'after'}}
+
+    cached = len(filter_cache)
+    state = leaderboard.update_state(published, df)
+    fresh = leaderboard.build_state(df)
+
+    assert_same_index(state.index, fresh.index)
+    for objectives in PARETO_COMBINATIONS:
+        order, values = state.pareto._get_sorted(objectives)
+        expected_order, expected_values = fresh.pareto._get_sorted(objectives)
+        np.testing.assert_array_equal(order, expected_order)
+        for spliced, expected in zip(values, expected_values):
+            np.testing.assert_array_equal(spliced, expected)
+
+    carried = [(key, value) for key, value in filter_cache._entries.items() if key[0] == 'after']
+    for key, value in carried:
+        expected = recompute(fresh, *key[1:])
+        if isinstance(value, dict):
+            assert value == expected, key
+        else:
+            pd.testing.assert_frame_equal(value, expected)
+    if scenario in ('unchanged', 'shuffled'):
+        assert len(carried) == cached
+
+
+def test_filter_leaderboard_matches_filter(published):
+    """The cached path filters on the exact slider bounds, also between slider steps."""
+    rng = random.Random(1)
+    prices = np.unique(published.index.ranges[tc.INPUT].values)
+    for _ in range(100):
+        filters = default_filters(published)
+        price = rng.choice(prices[1:])
+        filters['input_price'] = (0, price - rng.choice([0.005, 0.0005, 0]))
+        filters['parameters'] = (rng.uniform(0, 10), rng.uniform(10, 500))
+        expected = filter(published.leaderboard, *filters.values(), index=published.index)
+        pd.testing.assert_frame_equal(leaderboard.filter_leaderboard('before', *filters.values()), expected)
+
+
+class StubLoader:
+    """Stand-in for `snapshot.load_leaderboard` that returns the given leaderboards in turn."""
+
+    def __init__(self, *leaderboards):
+        self.leaderboards = list(leaderboards)
+        self.calls = []
+
+    def __call__(self, rebuild: bool = False):
+        self.calls.append(rebuild)
+        result = self.leaderboards.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def snapshot(df: pd.DataFrame, snapshot_id: str) -> pd.DataFrame:
+    df = df.copy()
+    df.attrs = {'snapshot': {'snapshot_id': snapshot_id}}
+    return df
+
+
+@pytest.fixture
+def no_state(monkeypatch, tmp_path):
+    """No published leaderboard, and a changelog under `tmp_path`."""
+    monkeypatch.setattr(leaderboard, '_states', leaderboard.OrderedDict())
+    monkeypatch.setattr(leaderboard, '_current', None)
+    monkeypatch.setattr(tc, 'SNAPSHOT_DIR', str(tmp_path))
+    filter_cache.invalidate()
+    yield
+    filter_cache.invalidate()
+
+
+def test_refresh_publishes_the_first_leaderboard(no_state, merged):
+    loader = StubLoader(snapshot(merged, 'first'))
+    assert leaderboard.refresh_leaderboard(loader=loader, rebuild=True)
+    assert loader.calls == [True]
+    assert leaderboard.get_state().snapshot_id == 'first'
+    assert read_changelog() == []
+
+
+def test_refresh_keeps_an_unchanged_snapshot(no_state, merged):
+    leaderboard.refresh_leaderboard(loader=StubLoader(snapshot(merged, 'first')))
+    state = leaderboard.get_state()
+
+    assert not leaderboard.refresh_leaderboard(loader=StubLoader(snapshot(merged, 'first')))
+    assert leaderboard.get_state() is state
+    assert read_changelog() == []
+
+
+def test_refresh_swaps_in_a_changed_snapshot(no_state, merged):
+    leaderboard.refresh_leaderboard(loader=StubLoader(snapshot(merged, 'first')))
+    before = leaderboard.get_state()
+    scores = before.leaderboard[tc.CLEMSCORE].copy()
+
+    changed = snapshot(merged, 'second')
+    model = changed.iloc[0][tc.MODEL_NAME]
+    changed.loc[changed.index[0], tc.INPUT] += 1.25
+
+    def loader(rebuild=False):
+        # The new state is only published once it is complete
+        assert leaderboard.get_state() is before
+        return changed
+
+    assert leaderboard.refresh_leaderboard(loader=loader)
+    after = leaderboard.get_state()
+    assert after.snapshot_id == 'second' and after is not before
+
+    # Sessions still rendering the previous snapshot get its unchanged state
+    assert leaderboard.get_state('first') is before
+    pd.testing.assert_series_equal(before.leaderboard[tc.CLEMSCORE], scores)
+
+    entries = read_changelog()
+    assert [(e['from_snapshot'], e['to_snapshot']) for e in entries] == [('first', 'second')]
+    assert [(c['model'], c['column']) for c in entries[0]['changed']] == [(model, tc.INPUT)]
+
+
+def test_refresh_keeps_the_state_if_loading_fails(no_state, merged):
+    leaderboard.refresh_leaderboard(loader=StubLoader(snapshot(merged, 'first')))
+    state = leaderboard.get_state()
+
+    assert not leaderboard.refresh_leaderboard(loader=StubLoader(OSError("source unavailable")))
+    assert leaderboard.get_state() is state
@@ -0,0 +1,212 @@
+"""
+Equivalence of the vectorized `merge_data` with the row-wise implementation it replaced
+
+`reference_merge_data` is the row-wise implementation as it was before the vectorization, with
+the two output changes made since applied the same way row by row: languages are lists of codes
+(see `languages.normalize_language`) and TEMP_DATE holds epoch seconds (see `compact.release_epochs`).
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import copy
+import json
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_fixtures
+import src.process_data as process_data
+from src.collect_data import fetch_all_data
+from src.compact import release_epochs
+from src.languages import normalize_language
+from src.sources import LocalSource, get_source, set_source
+import assets.text_content as tc
+
+
+def reference_convert_parameters(param):
+    if pd.isna(param) or param == '':
+        return None
+    param = str(param)
+    if 'T' in param:
+        return float(param.replace('T', '')) * 1000
+    return float(param.replace('B', ''))
+
+
+def reference_clean_price(price):
+    if pd.isna(price) or price == '':
+        return None
+    return float(price.replace('$', ''))
+
+
+def reference_map_languages(languages):
+    if isinstance(languages, float) and pd.isna(languages):
+        return None
+
+    if isinstance(languages, list):
+        lang_list = languages
+    elif isinstance(languages, str):
+        lang_list = [l.strip() for l in languages.split(',')]
+    else:
+        try:
+            lang_list = list(languages)
+        except:
+            return str(languages)
+
+    return list(dict.fromkeys(normalize_language(lang) for lang in lang_list))
+
+
+def reference_get_multimodality_field(model_data, field):
+    try:
+        return model_data.get('model_config', {}).get('multimodality', {}).get(field, False)
+    except:
+        return False
+
+
+def reference_clean_model_name(model_name: str) -> str:
+    pattern = r'-t[0-1]\.[0-9]--'
+    return re.split(pattern, model_name)[0]
+
+
+def reference_merge_data(mm_latency_df, mm_result_df, text_latency_df, text_result_df, registry_data, pricing_data):
+    mm_result_df.rename(columns={tc.DEFAULT_MODEL_NAME: 'model', tc.DEFAULT_CLEMSCORE: 'clemscore'}, inplace=True)
+    text_result_df.rename(columns={tc.DEFAULT_MODEL_NAME: 'model', tc.DEFAULT_CLEMSCORE: 'clemscore'}, inplace=True)
+    mm_result_df['model'] = mm_result_df['model'].apply(reference_clean_model_name)
+    text_result_df['model'] = text_result_df['model'].apply(reference_clean_model_name)
+
+    avg_latency_df = pd.concat([mm_latency_df, text_latency_df], axis=0).groupby('model')['latency'].mean().reset_index()
+    avg_clemscore_df = pd.concat([mm_result_df, text_result_df], axis=0).groupby('model')['clemscore'].mean().reset_index()
+    lat_clem_df = pd.merge(avg_latency_df, avg_clemscore_df, on='model', how='outer')
+
+    registry_df = pd.DataFrame(registry_data)
+    registry_df['license_name'] = registry_df['license'].apply(lambda x: x['name'])
+    registry_df['license_url'] = registry_df['license'].apply(lambda x: x['url'])
+    registry_df['single_image'] = registry_df.apply(lambda x: reference_get_multimodality_field(x, 'single_image'), axis=1)
+    registry_df['multiple_images'] = registry_df.apply(lambda x: reference_get_multimodality_field(x, 'multiple_images'), axis=1)
+    registry_df['audio'] = registry_df.apply(lambda x: reference_get_multimodality_field(x, 'audio'), axis=1)
+    registry_df['video'] = registry_df.apply(lambda x: reference_get_multimodality_field(x, 'video'), axis=1)
+    registry_df = registry_df[[
+        'model_name', 'parameters', 'release_date', 'open_weight',
+        'languages', 'context_size', 'license_name', 'license_url',
+        'single_image', 'multiple_images', 'audio', 'video'
+    ]]
+
+    merged_df = pd.merge(lat_clem_df, registry_df, left_on='model', right_on='model_name', how='inner')
+    merged_df = merged_df.rename(columns={
+        'model': tc.MODEL_NAME,
+        'latency': tc.LATENCY,
+        'clemscore': tc.CLEMSCORE,
+        'parameters': tc.PARAMS,
+        'release_date': tc.RELEASE_DATE,
+        'open_weight': tc.OPEN_WEIGHT,
+        'languages': tc.LANGS,
+        'context_size': tc.CONTEXT,
+        'license_name': tc.LICENSE_NAME,
+        'license_url': tc.LICENSE_URL,
+        'single_image': tc.SINGLE_IMG,
+        'multiple_images': tc.MULT_IMG,
+        'audio': tc.AUDIO,
+        'video': tc.VIDEO
+    })
+
+    pricing_df = pd.DataFrame(pricing_data)
+    pricing_df['input'] = pricing_df['input'].apply(reference_clean_price)
+    pricing_df['output'] = pricing_df['output'].apply(reference_clean_price)
+    merged_df = pd.merge(merged_df, pricing_df, left_on='Model Name', right_on='model_id', how='left')
+    merged_df = merged_df.drop('model_id', axis=1)
+    merged_df = merged_df.rename(columns={'input': tc.INPUT, 'output': tc.OUTPUT})
+    merged_df[tc.INPUT] = merged_df[tc.INPUT].fillna(0.0)
+    merged_df[tc.OUTPUT] = merged_df[tc.OUTPUT].fillna(0.0)
+
+    merged_df[tc.PARAMS] = merged_df.apply(
+        lambda row: None if not row[tc.OPEN_WEIGHT] else reference_convert_parameters(row[tc.PARAMS]),
+        axis=1
+    )
+    merged_df[tc.LICENSE] = merged_df.apply(
+        lambda row: f'[{row[tc.LICENSE_NAME]}]({row[tc.LICENSE_URL]})', axis=1
+    )
+    merged_df[tc.TEMP_DATE] = release_epochs(merged_df[tc.RELEASE_DATE])
+    merged_df[tc.LANGS] = merged_df[tc.LANGS].apply(reference_map_languages)
+
+    merged_df = merged_df.sort_values(by=tc.CLEMSCORE, ascending=False)
+    merged_df.drop(columns=['model_name'], inplace=True)
+    merged_df[tc.CONTEXT] = merged_df[tc.CONTEXT].astype(str).str.replace('k', '', regex=False)
+    merged_df[tc.CONTEXT] = pd.to_numeric(merged_df[tc.CONTEXT], errors='coerce').fillna(0).astype(int)
+
+    max_params_value = merged_df.loc[merged_df[tc.OPEN_WEIGHT], tc.PARAMS].max()
+    merged_df[tc.DUMMY_PARAMS] = merged_df.apply(
+        lambda row: max_params_value if not row[tc.OPEN_WEIGHT] else row[tc.PARAMS],
+        axis=1
+    )
+    return merged_df
+
+
+def edit_registry(path: str) -> None:
+    """Add the irregular registry entries the generator does not produce."""
+    with open(path) as f:
+        registry = json.load(f)
+
+    registry[0]['languages'] = None
+    del registry[1]['languages']
+    registry[2]['languages'] = "en, German,fr"
+    registry[3]['languages'] = []
+    registry[4]['languages'] = ['de', 'German', 'xx']
+    registry[5]['model_config'] = {}
+    registry[6]['model_config'] = {'multimodality': {'audio': True}}
+    registry[7]['parameters'] = '1.5T'
+    registry[7]['open_weight'] = True
+
+    with open(path, 'w') as f:
+        json.dump(registry, f)
+
+
+@pytest.fixture(scope='module', params=[300, 3000])
+def sources(request, tmp_path_factory):
+    """The fetched inputs of `merge_data` for generated fixtures of 300 and 3000 models."""
+    paths = generate_fixtures(str(tmp_path_factory.mktemp('fixtures')), request.param)
+    edit_registry(paths['registry'])
+
+    saved = get_source()
+    set_source(LocalSource(paths['runs']))
+    try:
+        frames = fetch_all_data()
+    finally:
+        set_source(saved)
+
+    with open(paths['pricing']) as f:
+        pricing = json.load(f)
+    return frames, pricing, paths['pricing']
+
+
+def merge_both(sources, monkeypatch) -> tuple:
+    """Run `merge_data` and the reference on their own copies of the same inputs."""
+    frames, pricing, pricing_path = sources
+    monkeypatch.setattr(process_data, 'fetch_all_data', lambda: copy.deepcopy(frames))
+    monkeypatch.setattr(process_data, 'PRICING_PATH', pricing_path)
+    return process_data.merge_data(), reference_merge_data(*copy.deepcopy(frames), copy.deepcopy(pricing))
+
+
+def test_merge_data_matches_row_wise_reference(sources, monkeypatch):
+    merged, reference = merge_both(sources, monkeypatch)
+
+    # Known divergence - a registry entry with "languages": null. The row-wise version failed on
+    # list(None) and kept the string 'None' as language, it is None now like a missing field
+    null_languages = reference[tc.LANGS].map(lambda langs: langs == 'None')
+    assert null_languages.sum() == 1
+    assert merged.loc[null_languages, tc.LANGS].isna().all()
+    reference.loc[null_languages, tc.LANGS] = None
+
+    pd.testing.assert_frame_equal(merged, reference)
+
+
+@pytest.mark.parametrize('params, expected', [
+    (['7B', '1.5T', '', None, '0.5B'], [7.0, 1500.0, np.nan, np.nan, 0.5]),
+])
+def test_convert_parameters(params, expected):
+    result = process_data.convert_parameters(pd.Series(params, dtype=object))
+    reference = [reference_convert_parameters(param) for param in params]
+    np.testing.assert_array_equal(result.to_numpy(), np.array(expected))
+    np.testing.assert_array_equal(result.to_numpy(), np.array(reference, dtype=float))